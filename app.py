@@ -1,12 +1,21 @@
+import time
+from queue import Queue
+from datetime import datetime
 import customtkinter as ctk
 from ui_controls import ControlPanel
 from ui_center import CenterPanel
 from ui_log import LogPanel
 from instrument import InstrumentManager
+from fleet import Fleet
+from diagnostics import Diagnostics, app_gauges
+
+# Appearance
+ctk.set_appearance_mode("light")
+ctk.set_default_color_theme("blue")
 
 class ATEKeithleyApp(ctk.CTk):
 
-    def __init__(self):
+    def __init__(self, simulate=False):
         super().__init__()
         self.title("ATE Keithley DMM6500 — Debug Tool")
         self.geometry("1400x900")
@@ -24,10 +33,22 @@ class ATEKeithleyApp(ctk.CTk):
         self.log_frame.grid(row=0, column=2, sticky="nsew")
 
         # Modules
-        self.instrument = InstrumentManager(self)
+        # metrics registry: VISA latency, stage timing, gauges (Diagnostics tab)
+        self.diagnostics = Diagnostics(gauges=lambda: app_gauges(self))
+        # log lines from worker threads, shown by the control panel's update loop
+        self.log_queue = Queue()
+        self.instrument = InstrumentManager(self, simulate=simulate, log=self._log_threadsafe)
         self.controls = ControlPanel(self)
+        self.fleet = Fleet(self, self.pipeline, log=self.controls._log, simulate=simulate)
         self.center = CenterPanel(self)
         self.log = LogPanel(self)
 
+    def _log_threadsafe(self, msg, level="info"):
+        self.log_queue.put(f"[{datetime.now().strftime('%H:%M:%S')}] {level.upper()}: {msg}")
+
     def _log(self, msg, level="info"):
         self.log.add(msg, level)
+        journal = getattr(self, "journal", None)
+        if journal is not None:
+            # with the readings on the pipeline's writer thread, stamped now
+            self.pipeline.in_writer(journal.event, msg, level, time.time())
@@ -0,0 +1,545 @@
+# bench.py
+"""
+Performance benchmarks against the simulated DMM6500.
+
+    python bench.py                       # full run, writes bench_results.json
+    python bench.py --quick --only worker,plot
+    python bench.py --baseline old.json   # exit code 1 on regressions
+
+Metric names carry their direction: "*_per_s" is higher-is-better,
+"*_ms", "*_us" and "*_bytes" are lower-is-better; other values are
+informational and never flagged.
+"""
+import os
+import sys
+import json
+import time
+import types
+import queue
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+import numpy as np
+
+from stats import RunningStats
+from store import MeasurementStore
+from pipeline import ReadingPipeline
+from recorder import StreamRecorder
+from journal import SessionJournal, JournalReader
+from limits import LimitTester, normalize_limits
+from instrument import InstrumentManager
+from sequence import SequenceRunner, normalize_sequence
+from fleet import Fleet
+from diagnostics import Diagnostics
+from constants import SIM_RESOURCE
+
+BENCHMARKS = ("worker", "fleet", "latency", "digitize", "cards", "plot", "export", "journal", "limits", "memory", "startup")
+DEFAULT_OUT = "bench_results.json"
+DEFAULT_TOLERANCE = 0.2
+
+
+class _Var:
+    # stands in for the Tk variables read by the center panel
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+def _sim_app(**sim_options):
+    app = types.SimpleNamespace(
+        stop_event=threading.Event(), resume_event=threading.Event(),
+        pause_event=threading.Event(), log_queue=queue.Queue(),
+        store=MeasurementStore(), stats={"VOLTAGE": RunningStats(), "CURRENT": RunningStats()},
+        recorder=None, schedule_stats={}, running=True, _log=lambda msg, level="info": None,
+        # instrumented like the GUI, so results include the metrics overhead
+        diagnostics=Diagnostics(),
+    )
+    app.pipeline = ReadingPipeline(app)
+    inst = InstrumentManager(app, simulate=True, sim_options=sim_options)
+    inst.connect(SIM_RESOURCE)
+    app.instrument, app.dmm, app.connected = inst, inst.dmm, True
+    return app
+
+
+def _sequence(order="V only", duration=2.0, interval=0.0, buffered=False,
+              burst=1000, timestamps=False):
+    phase = {"duration": duration, "interval": interval, "profile": "Fast"}
+    return normalize_sequence({
+        "order": order, "buffered": buffered, "burst": burst, "timestamps": timestamps,
+        "phases": {"VOLTAGE": phase, "CURRENT": phase},
+    })
+
+
+def _percentiles_ms(samples):
+    a = np.asarray(samples) * 1e3
+    return {
+        "p50_ms": float(np.percentile(a, 50)),
+        "p95_ms": float(np.percentile(a, 95)),
+        "p99_ms": float(np.percentile(a, 99)),
+        "max_ms": float(a.max()),
+    }
+
+
+# -------------------------
+# Benchmarks
+# -------------------------
+def bench_worker(quick=False):
+    """
+    End-to-end readings/s through SequenceRunner, with the pipeline
+    drained on a 50 ms timer like the GUI and the CLI do.
+    """
+    duration = 1.0 if quick else 3.0
+    cases = {
+        "interval_ascii": dict(),
+        "interval_timestamps": dict(timestamps=True),
+        "buffered_ascii": dict(buffered=True, transfer="ASCII"),
+        "buffered_real64": dict(buffered=True, transfer="REAL64"),
+        "buffered_real32_ts": dict(buffered=True, transfer="REAL32", timestamps=True),
+        "alternating": dict(order="Alternating"),
+    }
+    out = {}
+    for name, opts in cases.items():
+        app = _sim_app(realtime=False)
+        transfer = opts.pop("transfer", "ASCII")
+        app.instrument.set_transfer_format(transfer)
+        runner = SequenceRunner(app.instrument, app.pipeline, _sequence(duration=duration, **opts),
+                                app.stop_event, app.resume_event)
+        app.resume_event.set()
+        worker = threading.Thread(target=runner.run, daemon=True)
+        t0 = time.perf_counter()
+        worker.start()
+        while worker.is_alive():
+            time.sleep(0.05)
+            app.pipeline.drain()
+        app.pipeline.drain()
+        elapsed = time.perf_counter() - t0
+        n = len(app.store)
+        out[name] = {"readings": n, "readings_per_s": n / elapsed}
+        app.instrument.disconnect()
+    return out
+
+
+def bench_fleet(quick=False):
+    """
+    Aggregate readings/s with 1, 2 and 4 simulated instruments acquiring
+    concurrently (interval mode, real-time integration and bus latency),
+    against the single-instrument rate times N.
+    """
+    duration = 1.0 if quick else 3.0
+    out = {}
+    single = None
+    for n in (1, 2, 4):
+        app = _sim_app(realtime=True)
+        app.instrument.disconnect()
+        app.source_stats = {}
+        fleet = Fleet(app, app.pipeline, simulate=True, sim_options={"realtime": True})
+        for _ in range(n):
+            fleet.add(SIM_RESOURCE)
+        fleet.start(_sequence(duration=duration, timestamps=False))
+        t0 = time.perf_counter()
+        while fleet.running:
+            time.sleep(0.05)
+            app.pipeline.drain()
+        app.pipeline.drain()
+        elapsed = time.perf_counter() - t0
+        rate = len(app.store) / elapsed
+        single = single or rate
+        out[f"instruments_{n}"] = {"readings": len(app.store), "readings_per_s": rate,
+                                   "scaling": rate / (single * n)}
+        fleet.close()
+    return out
+
+
+def bench_latency(quick=False):
+    """
+    Round-trip time of one reading (host overhead + 0.5 ms simulated bus
+    latency each way), and deadline lateness of a 10 ms interval loop.
+    """
+    from scheduler import DeadlineScheduler
+    n = 300 if quick else 2000
+    app = _sim_app(realtime=False)
+    inst = app.instrument
+    out = {}
+    for name, fn in (("query_read", lambda: float(inst.dmm.query("print(dmm.measure.read())"))),
+                     ("read_single_ts", lambda: inst.read_single())):
+        samples = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t0)
+        out[name] = _percentiles_ms(samples)
+
+    stop, resume = threading.Event(), threading.Event()
+    resume.set()
+    sched = DeadlineScheduler(0.01, 1.0 if quick else 3.0, stop, resume)
+    while sched.wait():
+        inst.dmm.query("print(dmm.measure.read())")
+    s = sched.summary()
+    out["scheduler_10ms"] = {
+        "lateness_mean_ms": s["lateness_mean_ms"], "lateness_max_ms": s["lateness_max_ms"],
+        "jitter_ms": s["jitter_ms"], "skipped": s["skipped"],
+    }
+    inst.disconnect()
+    return out
+
+
+def bench_digitize(quick=False):
+    count = 200000 if quick else 1000000
+    app = _sim_app(realtime=False, bandwidth=None)
+    t0 = time.perf_counter()
+    vals = app.instrument.digitize_capture("VOLTAGE", 1000000, count)
+    elapsed = time.perf_counter() - t0
+    app.instrument.disconnect()
+    return {"capture": {"samples": int(vals.size), "samples_per_s": vals.size / elapsed}}
+
+
+def _headless_center(app):
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from ui_center import CenterPanel
+    from plotting import MinMaxEnvelope
+
+    cp = CenterPanel.__new__(CenterPanel)
+    cp.app = app
+    cp.fig = Figure(figsize=(10, 4), dpi=100)
+    cp.ax = cp.fig.add_subplot()
+    cp.line, = cp.ax.plot([], [], animated=True)
+    cp.ax.set_autoscale_on(False)
+    cp.canvas = FigureCanvasAgg(cp.fig)
+    # Agg has no blit; the restore/draw_artist work is still measured
+    cp.canvas.blit = lambda bbox=None: None
+    cp.canvas.draw_idle = cp.canvas.draw
+    cp.envelope = MinMaxEnvelope()
+    cp.follow, cp._bg, cp._auto_limits, cp._force_limits = True, None, False, False
+    cp.view_var, cp.xaxis_var = _Var("All"), _Var("Samples")
+    # live view, no metrics registry, no gap markers yet
+    cp.replay, cp._diag, cp._gap_artists = None, None, []
+    cp.canvas.mpl_connect("draw_event", cp._on_draw)
+    cp.ax.callbacks.connect("xlim_changed", cp._on_xlim_changed)
+    # the GUI has drawn the empty axes once before data arrives
+    cp.canvas.draw()
+    return cp
+
+
+def _sizes(quick):
+    return (1000, 100000, 1000000) if quick else (1000, 100000, 1000000, 5000000)
+
+
+def bench_cards(quick=False):
+    """
+    Cost of folding a 1000-reading chunk into the running stats plus one
+    update_cards() call, as the store grows.
+    """
+    from ui_center import CenterPanel
+
+    class _Label:
+        def configure(self, **kw):
+            pass
+
+    out = {}
+    for n in _sizes(quick):
+        app = types.SimpleNamespace(stats={"VOLTAGE": RunningStats(), "CURRENT": RunningStats()})
+        app.stats["VOLTAGE"].update_many(np.random.randn(n))
+        cp = CenterPanel.__new__(CenterPanel)
+        cp.app = app
+        cp.lbls_voltage = {k: _Label() for k in ("min", "max", "avg", "std", "rms")}
+        chunk = np.random.randn(1000)
+        reps = 200
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            app.stats["VOLTAGE"].update_many(chunk)
+            cp.update_cards("VOLTAGE")
+        out[f"n_{n}"] = {"frame_us": (time.perf_counter() - t0) / reps * 1e6}
+    return out
+
+
+def bench_plot(quick=False):
+    """
+    Per-frame cost of _plot_update_loop (decimation + limits + draw) for
+    the "All" envelope and a rolling window, as the store grows. Both the
+    first (full) frame and the steady-state frame after 1000 new readings
+    are reported.
+    """
+    from ui_center import PLOT_VIEWS
+    window_view = [k for k, v in PLOT_VIEWS.items() if v][-1]
+    out = {}
+    for view in ("All", window_view):
+        for n in _sizes(quick):
+            store = MeasurementStore()
+            store.extend(time.time(), "VOLTAGE", np.random.randn(n))
+            cp = _headless_center(types.SimpleNamespace(store=store))
+            cp.view_var.set(view)
+            t0 = time.perf_counter()
+            cp._plot_update_loop()
+            first = time.perf_counter() - t0
+            reps = 20
+            t0 = time.perf_counter()
+            for _ in range(reps):
+                store.extend(time.time(), "VOLTAGE", np.random.randn(1000))
+                cp._plot_update_loop()
+            steady = (time.perf_counter() - t0) / reps
+            drawn = int(len(cp.line.get_xdata()))
+            if drawn == 0:
+                # _plot_update_loop swallows errors; an empty line means nothing was timed
+                raise RuntimeError(f"plot benchmark drew no points ({view}, n={n})")
+            out[f"{view.replace(' ', '_').lower()}_n_{n}"] = {
+                "first_frame_ms": first * 1e3, "frame_ms": steady * 1e3,
+                "points_drawn": drawn,
+            }
+    return out
+
+
+def bench_export(quick=False):
+    """
+    Throughput of the full-store CSV export and of the streaming recorder
+    (CSV and binary) fed in 1000-reading chunks.
+    """
+    n = 200000 if quick else 1000000
+    vals = np.random.randn(n)
+    t = time.time() + np.arange(n) * 1e-3
+    store = MeasurementStore()
+    store.extend(t, "VOLTAGE", vals)
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export.csv")
+        t0 = time.perf_counter()
+        store.to_csv(path)
+        elapsed = time.perf_counter() - t0
+        out["store_to_csv"] = {"rows_per_s": n / elapsed,
+                               "mb_per_s": os.path.getsize(path) / elapsed / 1e6}
+        for fmt in ("CSV", "Binary"):
+            path = os.path.join(tmp, f"record.{fmt.lower()}")
+            rec = StreamRecorder(path, fmt)
+            t0 = time.perf_counter()
+            for start in range(0, n, 1000):
+                rec.write(t[start:start + 1000], "VOLTAGE", vals[start:start + 1000])
+            rec.close()
+            elapsed = time.perf_counter() - t0
+            out[f"recorder_{fmt.lower()}"] = {"rows_per_s": n / elapsed,
+                                              "mb_per_s": os.path.getsize(path) / elapsed / 1e6}
+    return out
+
+
+def bench_journal(quick=False):
+    """
+    Session journal: append rate in 1000-reading chunks, then opening the
+    file, whole-session statistics and loading a 1 s window from it.
+    """
+    n = 1000000 if quick else 10000000
+    chunk = 1000
+    vals = np.random.randn(n)
+    t = time.time() + np.arange(n) * 1e-4
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.dmmjrn")
+        jr = SessionJournal(path, {"bench": True})
+        t0 = time.perf_counter()
+        for start in range(0, n, chunk):
+            jr.write(t[start:start + chunk], "VOLTAGE", vals[start:start + chunk])
+        jr.close()
+        elapsed = time.perf_counter() - t0
+        out = {"write": {"rows_per_s": n / elapsed, "mb_per_s": os.path.getsize(path) / elapsed / 1e6}}
+        t0 = time.perf_counter()
+        reader = JournalReader(path)
+        open_ms = (time.perf_counter() - t0) * 1e3
+        t0 = time.perf_counter()
+        reader.stats("VOLTAGE")
+        stats_ms = (time.perf_counter() - t0) * 1e3
+        mid = t[n // 2]
+        t0 = time.perf_counter()
+        reader.window(mid, mid + 1.0)
+        window_ms = (time.perf_counter() - t0) * 1e3
+        reader.close()
+        out["read"] = {"rows": n, "open_ms": open_ms, "stats_ms": stats_ms, "window_1s_ms": window_ms}
+    return out
+
+
+def bench_limits(quick=False):
+    """
+    Limit checks per drained chunk: bounds, nominal/tolerance and std
+    tests on 1000-reading chunks, and on single readings (interval mode).
+    """
+    n = 1000000 if quick else 10000000
+    spec = normalize_limits({"low": -4.0, "high": 4.0, "nominal": 0.0, "tolerance": 4.5,
+                             "max_std": 2.0, "max_excursions": n})
+    vals = np.random.randn(n)
+    t = time.time() + np.arange(n) * 1e-4
+    out = {}
+    for chunk in (1000, 1):
+        tester = LimitTester({"VOLTAGE": spec})
+        m = n if chunk > 1 else n // 100
+        t0 = time.perf_counter()
+        for start in range(0, m, chunk):
+            tester.check(t[start:start + chunk], "VOLTAGE", vals[start:start + chunk])
+        elapsed = time.perf_counter() - t0
+        out[f"chunk_{chunk}"] = {"rows_per_s": m / elapsed, "verdict": tester.verdict(final=True)}
+    return out
+
+
+def bench_memory(quick=False):
+    """
+    Bytes per million readings held in the store, and peak allocation
+    while appending them in 1000-reading chunks.
+    """
+    n = 1000000
+    chunk = np.random.randn(1000)
+    tracemalloc.start()
+    store = MeasurementStore()
+    for _ in range(n // chunk.size):
+        store.extend(time.time(), "VOLTAGE", chunk)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    used = sum(col[:store.n].nbytes for col in (store._t, store._p, store._s, store._v))
+    return {"store_1m": {"used_bytes": used, "allocated_bytes": store.nbytes, "peak_bytes": peak}}
+
+
+# time to the first window and to the live plot being ready, in a fresh interpreter
+_WINDOW_PROBE = """
+import time
+t0 = time.perf_counter()
+from app import ATEKeithleyApp
+app = ATEKeithleyApp()
+app.update()
+t1 = time.perf_counter()
+while app.center.ax is None:
+    app.update()
+t2 = time.perf_counter()
+app.destroy()
+print(t1 - t0, t2 - t0)
+"""
+
+
+def _subprocess_ms(code, runs):
+    # median wall time of `python -c code`, or of what the code prints itself
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=here)
+        elapsed = time.perf_counter() - t0
+        if res.returncode != 0:
+            raise RuntimeError(res.stderr.strip().splitlines()[-1])
+        samples.append([float(x) for x in res.stdout.split()] or [elapsed])
+    return [float(np.median(col)) * 1e3 for col in zip(*samples)]
+
+
+def bench_startup(quick=False):
+    """
+    Cold-start cost in fresh interpreters: bare interpreter, module imports
+    of the GUI and of the headless runner, and (with a display) time until
+    the window is shown and until the live plot is built.
+    """
+    runs = 5 if quick else 15
+    out = {
+        "interpreter": {"wall_ms": _subprocess_ms("pass", runs)[0]},
+        "import_gui": {"wall_ms": _subprocess_ms("import app", runs)[0]},
+        "import_cli": {"wall_ms": _subprocess_ms("import cli", runs)[0]},
+    }
+    if sys.platform != "linux" or os.environ.get("DISPLAY"):
+        window, plot = _subprocess_ms(_WINDOW_PROBE, runs)
+        out["gui_window"] = {"window_ms": window, "plot_ready_ms": plot}
+    return out
+
+
+# -------------------------
+# Results
+# -------------------------
+def _metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        commit = ""
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def _direction(metric):
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith(("_ms", "_us", "_bytes")):
+        return -1
+    return 0
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Lists metrics that got worse than `baseline` by more than `tolerance`
+    (relative). Returns [(path, old, new, change)], change > 0 = worse.
+    """
+    worse = []
+    for bench, cases in results.items():
+        for case, metrics in cases.items():
+            old_metrics = baseline.get(bench, {}).get(case, {})
+            for metric, new in metrics.items():
+                old = old_metrics.get(metric)
+                sign = _direction(metric)
+                if not sign or not old or not isinstance(old, (int, float)):
+                    continue
+                change = (old - new) / old if sign > 0 else (new - old) / old
+                if change > tolerance:
+                    worse.append((f"{bench}.{case}.{metric}", old, new, change))
+    return worse
+
+
+def run(names, quick=False, log=print):
+    results = {}
+    for name in names:
+        log(f"-- {name}")
+        t0 = time.perf_counter()
+        results[name] = globals()[f"bench_{name}"](quick)
+        for case, metrics in results[name].items():
+            log(f"   {case}: " + ", ".join(
+                f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in metrics.items()))
+        log(f"   ({time.perf_counter() - t0:.1f} s)")
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--only", help="comma separated subset of: " + ",".join(BENCHMARKS))
+    ap.add_argument("--quick", action="store_true", help="smaller sizes and shorter runs")
+    ap.add_argument("--out", default=DEFAULT_OUT, help="results JSON file")
+    ap.add_argument("--baseline", help="previous results JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                    help="allowed relative regression (default 0.2)")
+    args = ap.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        ap.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    results = run(names, args.quick)
+    with open(args.out, "w") as f:
+        json.dump({"meta": _metadata(), "quick": args.quick, "results": results}, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        worse = compare(results, baseline, args.tolerance)
+        for path, old, new, change in worse:
+            print(f"REGRESSION {path}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+        if worse:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
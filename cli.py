@@ -0,0 +1,279 @@
+# cli.py
+"""
+Headless sequence runner: runs a JSON sequence file on an instrument
+without the GUI, streams every reading to disk and exits with the verdict.
+
+    python cli.py sequence.json --resource TCPIP0::192.168.0.10::inst0::INSTR --out run.csv
+    python cli.py sequence.json --sim --out run.dmmrec --summary run.json
+    python cli.py sequence.json --resource <addr1> --resource <addr2> --out rails.csv
+    python cli.py sequence.json --sim --metrics-port 9108   # curl localhost:9108/metrics
+    python cli.py sequence.json --sim --journal run.dmmjrn  # replay in the GUI
+
+With several --resource options the instruments run the sequence
+concurrently (one worker thread each) and readings are tagged by
+instrument (DMM1, DMM2, ... in resource order).
+
+Phase limits in the sequence file ("limits", see limits.py) are checked
+as readings arrive; with "stop_on_fail" an instrument stops at its first
+hard failure. The verdict ends up in the summary, at the end of CSV
+output and in the session journal.
+
+Exit status: 0 pass, 1 fail (stopped, no/invalid readings, limit failure,
+write errors), 2 usage, sequence file or connection error.
+"""
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+from diagnostics import Diagnostics, DiagnosticsServer, app_gauges
+from fleet import Fleet
+from journal import SessionJournal
+from limits import LimitTester, FAIL
+from pipeline import ReadingPipeline
+from recorder import StreamRecorder, RECORD_FORMATS
+from constants import SIM_RESOURCE
+from sequence import load_sequence, sequence_phases, limit_specs
+from stats import RunningStats
+from store import MeasurementStore, PHASES, DEFAULT_SOURCE
+
+EXIT_PASS, EXIT_FAIL, EXIT_ERROR = 0, 1, 2
+
+# seconds between pipeline drains (the GUI uses its update timer)
+DRAIN_PERIOD = 0.05
+# readings kept in memory; the output file holds the full run
+WINDOW_ROWS = 10_000
+
+
+class HeadlessApp:
+    """
+    Stands in for ATEKeithleyApp: the sinks ReadingPipeline writes to, the
+    metrics registry and the `_log` InstrumentManager reports through. Log
+    lines go to stderr.
+    """
+
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self.store = MeasurementStore(max_rows=WINDOW_ROWS)
+        self.stats = {phase: RunningStats() for phase in PHASES}
+        self.source_stats = {}
+        self.recorder = self.journal = self.limits = None
+        self.pipeline = self.fleet = None
+        self.diagnostics = Diagnostics(gauges=lambda: app_gauges(self))
+
+    def _log(self, msg, level="info"):
+        if self.journal is not None:
+            self.journal.event(msg, level)
+        if self.quiet and level == "info":
+            return
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {level.upper()}: {msg}",
+              file=sys.stderr, flush=True)
+
+
+def _parse_args(argv):
+    ap = argparse.ArgumentParser(description="Run a DMM6500 measurement sequence without the GUI.")
+    ap.add_argument("sequence", help="JSON sequence file")
+    ap.add_argument("--resource", action="append",
+                    help="VISA resource string of an instrument (repeat for several)")
+    ap.add_argument("--sim", action="store_true",
+                    help=f"allow simulated instruments; uses {SIM_RESOURCE} unless --resource is given")
+    ap.add_argument("--out", help="stream readings to this file (.csv or .dmmrec)")
+    ap.add_argument("--format", choices=RECORD_FORMATS,
+                    help="output format (default: from the --out extension)")
+    ap.add_argument("--summary", help="write the run summary as JSON to this file")
+    ap.add_argument("--journal", help="write a session journal (.dmmjrn) with readings, gaps and log events")
+    ap.add_argument("--metrics-port", type=int,
+                    help="serve live metrics on 127.0.0.1:PORT (/metrics, /metrics.json) during the run")
+    ap.add_argument("--quiet", action="store_true", help="only log warnings and errors")
+    args = ap.parse_args(argv)
+    if not args.resource and not args.sim:
+        ap.error("one of --resource or --sim is required")
+    if not args.resource:
+        args.resource = [SIM_RESOURCE]
+    if args.format is None:
+        args.format = "Binary" if args.out and args.out.lower().endswith(".dmmrec") else "CSV"
+    return args
+
+
+def _summary(app, pipeline, fleet, settings, elapsed):
+    """
+    Per-instrument, per-phase statistics and the pass/fail verdict: every
+    instrument completed the sequence, every phase it measures produced
+    readings, none of them were invalid (NaN from a failed read) and the
+    output file took every row, and no phase limit failed. Gaps from a
+    lost and re-established connection are listed; their failed reads
+    count as invalid.
+    """
+    limits = app.limits
+    names = app.store.source_names
+    instruments = {}
+    for m in fleet.members.values():
+        stats = app.source_stats.get(m.source, {})
+        phases = {}
+        for phase in sequence_phases(settings):
+            st = stats.get(phase, RunningStats())
+            phases[phase] = {"count": st.count, "mean": st.mean if st.count else None,
+                             "std": st.std if st.count >= 2 else None,
+                             "min": st.min if st.count else None, "max": st.max if st.count else None}
+        readings = pipeline.source_readings.get(m.source, 0)
+        invalid = readings - sum(st.count for st in stats.values())
+        gaps = [{"start": g.t0, "end": g.t1, "duration_s": round(g.t1 - g.t0, 3), "phase": g.phase}
+                for g in app.store.gaps if g.source == m.source]
+        verdict = limits.verdict(m.source, final=True) if limits is not None else None
+        instruments[m.name] = {
+            "resource": m.resource,
+            "idn": m.idn,
+            "completed": m.completed,
+            "passed": (m.completed and invalid == 0 and verdict != FAIL
+                       and all(p["count"] > 0 for p in phases.values())),
+            "limits": verdict,
+            "readings": readings,
+            "invalid_readings": invalid,
+            "phases": phases,
+            "schedule": m.runner.schedule_stats if m.runner else {},
+            "gaps": gaps,
+            "connection": m.inst.health.summary(),
+        }
+    passed = (bool(instruments) and pipeline.recorder_errors == 0
+              and all(i["passed"] for i in instruments.values()))
+    return {
+        "passed": passed,
+        "elapsed_s": round(elapsed, 3),
+        "readings": pipeline.readings,
+        "invalid_readings": sum(i["invalid_readings"] for i in instruments.values()),
+        "instruments": instruments,
+        "limits": limits.summary(names, final=True) if limits is not None else None,
+        "pipeline": pipeline.metrics(),
+        "diagnostics": app.diagnostics.snapshot(),
+    }
+
+
+def run(args):
+    app = HeadlessApp(args.quiet)
+    try:
+        settings = load_sequence(args.sequence)
+    except (OSError, ValueError) as e:
+        app._log(f"Sequence file error: {e}", "err")
+        return EXIT_ERROR
+
+    pipeline = app.pipeline = ReadingPipeline(app)
+    fleet = app.fleet = Fleet(app, pipeline, log=app._log, simulate=args.sim)
+    single = len(args.resource) == 1
+    for resource in args.resource:
+        # a single instrument keeps the default source, so files have no Instrument column
+        if fleet.add(resource, DEFAULT_SOURCE if single else None) is None:
+            fleet.close()
+            return EXIT_ERROR
+
+    specs = limit_specs(settings)
+    if specs:
+        def limit_failed(source, phase, reason):
+            name = app.store.source_names[source]
+            app._log(f"{'' if single else name + ' '}limit failure: {reason}", "err")
+            if settings["stop_on_fail"]:
+                app._log(f"Stopping {name} on limit failure", "warn")
+                fleet.stop([name])
+        app.limits = LimitTester(specs, settings["stop_on_fail"], on_fail=limit_failed)
+
+    if args.out:
+        try:
+            app.recorder = StreamRecorder(args.out, args.format,
+                                          sources=None if single else app.store.source_names)
+        except Exception as e:
+            app._log(f"Recorder error: {e}", "err")
+            fleet.close()
+            return EXIT_ERROR
+        app._log(f"Recording to {args.out}")
+
+    if args.journal:
+        meta = {"settings": settings, "sources": app.store.source_names,
+                "fleet": {m.name: {"resource": m.resource, "idn": m.idn} for m in fleet.members.values()}}
+        if single:
+            m = next(iter(fleet.members.values()))
+            meta.update(resource=m.resource, idn=m.idn)
+        try:
+            app.journal = SessionJournal(args.journal, meta)
+        except Exception as e:
+            app._log(f"Journal error: {e}", "err")
+            fleet.close()
+            return EXIT_ERROR
+        app._log(f"Session journal: {args.journal}")
+
+    server = None
+    if args.metrics_port is not None:
+        try:
+            server = DiagnosticsServer(app.diagnostics, args.metrics_port)
+            app._log(f"Metrics endpoint at {server.url}")
+        except OSError as e:
+            app._log(f"Metrics endpoint error: {e}", "warn")
+
+    t0 = time.monotonic()
+    fleet.start(settings)
+    try:
+        while fleet.running:
+            time.sleep(DRAIN_PERIOD)
+            pipeline.drain()
+    except KeyboardInterrupt:
+        app._log("Interrupted, stopping sequence", "warn")
+        fleet.stop()
+        while fleet.running:
+            time.sleep(DRAIN_PERIOD)
+            pipeline.drain()
+    elapsed = time.monotonic() - t0
+    pipeline.drain()
+    pipeline.flush_writes()
+
+    report = app.limits.report(app.store.source_names) if app.limits is not None else []
+    if app.recorder is not None:
+        try:
+            app.recorder.close(footer=report)
+            app._log(f"Recording closed: {app.recorder.rows_written} readings in {app.recorder.path}")
+        except Exception as e:
+            pipeline.recorder_errors += 1
+            app._log(f"Recorder close error: {e}", "err")
+    if pipeline.last_error:
+        app._log(pipeline.last_error, "err")
+
+    summary = _summary(app, pipeline, fleet, settings, elapsed)
+    summary.update(sequence=args.sequence, output=args.out)
+    if app.journal is not None:
+        journal, app.journal = app.journal, None
+        try:
+            journal.meta(passed=summary["passed"], elapsed_s=summary["elapsed_s"], limits=summary["limits"])
+            journal.close()
+            app._log(f"Session journal closed: {journal.rows_written} readings in {journal.path}")
+        except Exception as e:
+            summary["passed"] = False
+            app._log(f"Journal close error: {e}", "err")
+        summary["journal"] = args.journal
+    fleet.close()
+    if server is not None:
+        server.close()
+    for name, inst in summary["instruments"].items():
+        prefix = "" if single else f"{name} "
+        for phase, p in inst["phases"].items():
+            if p["count"]:
+                print(f"{prefix}{phase}: {p['count']} readings, mean {p['mean']:.6g}, "
+                      f"min {p['min']:.6g}, max {p['max']:.6g}")
+            else:
+                print(f"{prefix}{phase}: no readings")
+        for g in inst["gaps"]:
+            print(f"{prefix}gap in {g['phase']}: {g['duration_s']:.1f} s "
+                  f"from {datetime.fromtimestamp(g['start']).strftime('%H:%M:%S')}")
+    for line in report:
+        print(line)
+    print(f"{summary['readings']} readings in {elapsed:.2f} s, "
+          f"{summary['invalid_readings']} invalid -> {'PASS' if summary['passed'] else 'FAIL'}")
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+    return EXIT_PASS if summary["passed"] else EXIT_FAIL
+
+
+def main(argv=None):
+    return run(_parse_args(sys.argv[1:] if argv is None else argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
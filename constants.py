@@ -1,12 +1,58 @@
-import customtkinter as ctk
-
-# Appearance
-ctk.set_appearance_mode("light")
-ctk.set_default_color_theme("blue")
-
 # LUA Commands
 LUA_SET_FUNC      = "dmm.measure.func = dmm.{func}"
 LUA_SET_RANGE     = "dmm.measure.range = {rng}"
 LUA_AUTORANGE_ON  = "dmm.measure.autorange = dmm.ON"
 LUA_AUTORANGE_OFF = "dmm.measure.autorange = dmm.OFF"
 LUA_MEAS_READ     = "print(dmm.measure.read())"
+LUA_SET_NPLC      = "dmm.measure.nplc = {nplc}"
+LUA_AUTOZERO      = "dmm.measure.autozero.enable = dmm.{state}"
+LUA_FILTER_OFF    = "dmm.measure.filter.enable = dmm.OFF"
+LUA_FILTER_ON     = ("dmm.measure.filter.count = {count} dmm.measure.filter.type = dmm.FILTER_REPEAT_AVG "
+                     "dmm.measure.filter.enable = dmm.ON")
+MEASURE_FUNCS     = {"VOLTAGE": "FUNC_DC_VOLTAGE", "CURRENT": "FUNC_DC_CURRENT"}
+
+# Buffered (burst) acquisition
+LUA_MEAS_COUNT    = "dmm.measure.count = {count}"
+LUA_BUFFER_MAKE   = "{buf} = buffer.make({capacity})"
+LUA_BUFFER_DELETE = "buffer.delete({buf})"
+LUA_BUFFER_CLEAR  = "{buf}.clear()"
+LUA_MEAS_READ_BUF = "dmm.measure.read({buf})"
+LUA_PRINTBUFFER   = "printbuffer(1, {buf}.n, {buf}.readings)"
+LUA_PRINTBUFFER_RANGE = "printbuffer({start}, {end}, {buf}.readings)"
+LUA_BUFFER_CAPACITY   = "{buf}.capacity = {capacity}"
+
+# Instrument-side timestamps: reading, whole seconds and fraction per entry
+LUA_PRINTBUFFER_TS = "printbuffer({start}, {end}, {buf}.readings, {buf}.seconds, {buf}.fractionalseconds)"
+LUA_MEAS_READ_TS   = "dmm.measure.read({buf}) " + LUA_PRINTBUFFER_TS.format(start="{buf}.n", end="{buf}.n", buf="{buf}")
+DEFAULT_BUFFERS   = ("defbuffer1", "defbuffer2")
+DEFAULT_BUFFER_CAPACITY = 100000   # readings per default buffer after a reset
+
+# Data transfer format (affects printbuffer/printnumber output only)
+LUA_FORMAT_DATA      = "format.data = format.{fmt}"
+LUA_FORMAT_BYTEORDER = "format.byteorder = format.LITTLEENDIAN"
+TRANSFER_FORMATS     = ("ASCII", "REAL32", "REAL64")
+
+# Digitize (high-speed waveform capture)
+LUA_DIGITIZE_FUNC     = "dmm.digitize.func = dmm.{func}"
+LUA_DIGITIZE_RATE     = "dmm.digitize.samplerate = {rate}"
+LUA_DIGITIZE_COUNT    = "dmm.digitize.count = {count}"
+LUA_DIGITIZE_RANGE    = "dmm.digitize.range = {rng}"
+LUA_DIGITIZE_READ_BUF = "dmm.digitize.read({buf})"
+DIGITIZE_FUNCS        = {"VOLTAGE": "FUNC_DIGITIZE_VOLTAGE", "CURRENT": "FUNC_DIGITIZE_CURRENT"}
+DIGITIZE_MAX_RATE     = 1000000
+
+# On-instrument sequence scripts
+LUA_LOADSCRIPT = "loadscript {name}"
+LUA_ENDSCRIPT  = "endscript"
+LUA_RUNSCRIPT  = "{name}()"
+
+# Measure configuration lists (fast V/I switching)
+CONFIGLIST_NAMES      = {"VOLTAGE": "ATE_V", "CURRENT": "ATE_I"}
+LUA_CONFIGLIST_CREATE = 'dmm.measure.configlist.create("{name}")'
+LUA_CONFIGLIST_DELETE = 'pcall(dmm.measure.configlist.delete, "{name}")'
+LUA_CONFIGLIST_STORE  = 'dmm.measure.configlist.store("{name}")'
+LUA_CONFIGLIST_RECALL = 'dmm.measure.configlist.recall("{name}")'
+
+# In-process simulator resources (simulator.py, loaded only when one is opened)
+SIM_RESOURCE_PREFIX = "SIM::"
+SIM_RESOURCE        = "SIM::DMM6500::INSTR"
@@ -0,0 +1,317 @@
+# diagnostics.py
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# histogram bucket upper bounds (s): 50 us .. 30 s
+LATENCY_BUCKETS = (
+    50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3, 50e-3,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+# prefix of every exported metric name
+METRIC_PREFIX = "dmm_"
+# local diagnostics endpoint (loopback only)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram (Prometheus style: count, sum and
+    per-bucket counts, plus the maximum). Percentiles are estimated from
+    the buckets by linear interpolation.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # last slot counts everything above the largest bound
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.sum = 0.0
+            self.max = 0.0
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = self.bounds[i - 1] if i else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lo + (hi - lo) * (rank - seen) / c, self.max)
+            seen += c
+        return self.max
+
+    def summary(self):
+        def ms(v):
+            return None if v is None else v * 1e3
+        return {
+            "count": self.count,
+            "total_s": self.sum,
+            "mean_ms": ms(self.sum / self.count) if self.count else None,
+            "p50_ms": ms(self.percentile(50)),
+            "p90_ms": ms(self.percentile(90)),
+            "p99_ms": ms(self.percentile(99)),
+            "max_ms": ms(self.max) if self.count else None,
+        }
+
+
+class Diagnostics:
+    """
+    Metrics registry shared by the instrument sessions, the pipeline and
+    the GUI: latency histograms and counters, both keyed by metric name
+    and one label value, plus gauges pulled from `gauges()` (any callable
+    returning {name: value}) at export time.
+
+        visa_seconds{op}         VISA call latency: write, query, read, binary
+        visa_bytes_total{dir}    bytes sent ("out") and received ("in")
+        visa_errors_total{op}    failed VISA calls
+        stage_seconds{stage}     host-side stages: parse, drain, limits,
+                                 record, journal, backpressure, gui_cards,
+                                 gui_plot
+    """
+
+    # label name of each metric
+    LABELS = {"visa_seconds": "op", "visa_bytes_total": "dir",
+              "visa_errors_total": "op", "stage_seconds": "stage"}
+
+    def __init__(self, gauges=None):
+        self.gauges = gauges
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.t_start = time.time()
+
+    def histogram(self, name, label):
+        h = self.histograms.get((name, label))
+        if h is None:
+            with self._lock:
+                h = self.histograms.setdefault((name, label), LatencyHistogram())
+        return h
+
+    def observe(self, name, label, seconds):
+        self.histogram(name, label).observe(seconds)
+
+    def add(self, name, label, n=1):
+        with self._lock:
+            self.counters[(name, label)] = self.counters.get((name, label), 0) + n
+
+    @contextmanager
+    def time(self, name, label):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, label, time.perf_counter() - t0)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.t_start = time.time()
+
+    def _gauge_values(self):
+        if self.gauges is None:
+            return {}
+        try:
+            return dict(self.gauges())
+        except Exception:
+            return {}
+
+    def snapshot(self):
+        """
+        All metrics as a JSON-friendly dict.
+        """
+        hist, counters = {}, {}
+        for (name, label), h in sorted(self.histograms.items()):
+            hist.setdefault(name, {})[label] = h.summary()
+        for (name, label), v in sorted(self.counters.items()):
+            counters.setdefault(name, {})[label] = v
+        return {"since": self.t_start, "uptime_s": time.time() - self.t_start,
+                "histograms": hist, "counters": counters, "gauges": self._gauge_values()}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """
+        All metrics in the Prometheus text exposition format (0.0.4).
+        """
+        out = []
+        by_name = {}
+        for (name, label), h in sorted(self.histograms.items()):
+            by_name.setdefault(name, []).append((label, h))
+        for name, series in by_name.items():
+            full = METRIC_PREFIX + name
+            key = self.LABELS.get(name, "label")
+            out.append(f"# TYPE {full} histogram")
+            for label, h in series:
+                with h._lock:
+                    counts, total, n = list(h.counts), h.sum, h.count
+                cum = 0
+                for bound, c in zip(h.bounds, counts):
+                    cum += c
+                    out.append(f'{full}_bucket{{{key}="{label}",le="{bound:g}"}} {cum}')
+                out.append(f'{full}_bucket{{{key}="{label}",le="+Inf"}} {n}')
+                out.append(f'{full}_sum{{{key}="{label}"}} {total:.9g}')
+                out.append(f'{full}_count{{{key}="{label}"}} {n}')
+        by_name = {}
+        for (name, label), v in sorted(self.counters.items()):
+            by_name.setdefault(name, []).append((label, v))
+        for name, series in by_name.items():
+            full = METRIC_PREFIX + name
+            key = self.LABELS.get(name, "label")
+            out.append(f"# TYPE {full} counter")
+            out.extend(f'{full}{{{key}="{label}"}} {v}' for label, v in series)
+        for name, v in sorted(self._gauge_values().items()):
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                out.append(f"# TYPE {METRIC_PREFIX}{name} gauge")
+                out.append(f"{METRIC_PREFIX}{name} {v:.9g}")
+        return "\n".join(out) + "\n"
+
+
+class InstrumentedSession:
+    """
+    Wraps a pyvisa resource (or the simulator) and times every I/O call
+    into `diag`: latency per operation, bytes in/out and failures. Every
+    other attribute (timeout, close, ...) passes through to the session.
+    """
+
+    def __init__(self, session, diag):
+        object.__setattr__(self, "_session", session)
+        object.__setattr__(self, "_diag", diag)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._session, name, value)
+
+    def _call(self, op, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            out = fn(*args, **kwargs)
+        except Exception:
+            self._diag.add("visa_errors_total", op)
+            raise
+        finally:
+            self._diag.observe("visa_seconds", op, time.perf_counter() - t0)
+        return out
+
+    def write(self, cmd):
+        n = self._call("write", self._session.write, cmd)
+        self._diag.add("visa_bytes_total", "out", len(cmd) + 1)
+        return n
+
+    def read(self):
+        resp = self._call("read", self._session.read)
+        self._diag.add("visa_bytes_total", "in", len(resp))
+        return resp
+
+    def query(self, cmd):
+        resp = self._call("query", self._session.query, cmd)
+        self._diag.add("visa_bytes_total", "out", len(cmd) + 1)
+        self._diag.add("visa_bytes_total", "in", len(resp))
+        return resp
+
+    def query_binary_values(self, cmd, *args, **kwargs):
+        vals = self._call("binary", self._session.query_binary_values, cmd, *args, **kwargs)
+        self._diag.add("visa_bytes_total", "out", len(cmd) + 1)
+        # payload only; the IEEE block header adds a few bytes
+        size = getattr(vals, "nbytes", None)
+        if size is None:
+            size = len(vals) * (8 if kwargs.get("datatype", "f") == "d" else 4)
+        self._diag.add("visa_bytes_total", "in", size)
+        return vals
+
+    def clear(self):
+        return self._call("clear", self._session.clear)
+
+
+class DiagnosticsServer:
+    """
+    Minimal HTTP endpoint for a Diagnostics registry on a background
+    thread, bound to the loopback interface:
+
+        GET /metrics        Prometheus text format
+        GET /metrics.json   JSON snapshot
+    """
+
+    def __init__(self, diag, port=METRICS_PORT, host=METRICS_HOST):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path in ("/metrics.json", "/json"):
+                    body, ctype = diag.to_json(), "application/json"
+                elif path in ("/metrics", "/"):
+                    body, ctype = diag.to_prometheus(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.url = f"http://{host}:{self.port}/metrics"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def app_gauges(app):
+    """
+    Gauges of an app-like object: pipeline metrics (rate, queue depth,
+    backpressure, dropped frames), store size and, per connected session,
+    the adaptive VISA timeout and reconnect count.
+    """
+    g = {}
+    pipe = getattr(app, "pipeline", None)
+    if pipe is not None:
+        g.update(pipe.metrics())
+    store = getattr(app, "store", None)
+    if store is not None:
+        g["store_rows"] = len(store)
+        g["store_bytes"] = store.nbytes
+    sessions = []
+    inst = getattr(app, "instrument", None)
+    if inst is not None and inst.connected:
+        sessions.append(inst)
+    fleet = getattr(app, "fleet", None)
+    if fleet is not None:
+        sessions.extend(m.inst for m in list(fleet.members.values()) if m.inst.connected)
+    if sessions:
+        g["visa_timeout_ms"] = max(s.health.timeout_ms() for s in sessions)
+        g["reconnects"] = sum(s.health.reconnects for s in sessions)
+        g["sessions"] = len(sessions)
+    return g
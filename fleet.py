@@ -0,0 +1,197 @@
+# fleet.py
+import time
+import threading
+
+from instrument import InstrumentManager
+from sequence import SequenceRunner
+
+
+class FleetMember:
+    """
+    One instrument of a fleet: its own InstrumentManager (session), its own
+    stop/resume events and worker thread, and the store source code its
+    readings are tagged with.
+    """
+
+    def __init__(self, fleet, name, resource, source):
+        self.fleet = fleet
+        self.name = name
+        self.resource = resource
+        self.source = source
+        self.inst = InstrumentManager(fleet.app, simulate=fleet.simulate, sim_options=fleet.sim_options,
+                                      log=self.log)
+        self.idn = None
+        self.stop_event = threading.Event()
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+        self.thread = None
+        self.runner = None
+        self.status = "idle"
+        self.completed = False
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def connect(self):
+        self.idn = self.inst.connect(self.resource)
+        self.status = "connected" if self.idn else "error"
+        return self.idn
+
+    def start(self, settings):
+        """
+        Runs `settings` (see sequence.normalize_sequence) on a worker
+        thread. Returns False if this member is already running or not
+        connected.
+        """
+        if self.running or not self.inst.connected:
+            return False
+        try:
+            self.inst.set_transfer_format(settings["transfer"])
+        except Exception as e:
+            self.log(f"Transfer format error: {e}", "warn")
+        self.stop_event.clear()
+        self.resume_event.set()
+        self.completed = False
+        self.runner = SequenceRunner(self.inst, self.fleet.pipeline, settings,
+                                     self.stop_event, self.resume_event,
+                                     log=self.log, source=self.source)
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"fleet-{self.name}")
+        self.status = "running"
+        self.thread.start()
+        return True
+
+    def _run(self):
+        try:
+            self.completed = self.runner.run()
+        except Exception as e:
+            self.log(f"Sequence error: {e}", "err")
+        self.status = "done" if self.completed else "stopped"
+
+    def stop(self):
+        self.stop_event.set()
+        # wake a paused worker so it sees the stop
+        self.resume_event.set()
+
+    def pause(self, paused=True):
+        if paused:
+            self.resume_event.clear()
+        else:
+            self.resume_event.set()
+
+    def disconnect(self, timeout=5.0):
+        self.stop()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.inst.disconnect()
+        self.status = "idle"
+
+    def log(self, msg, level="info"):
+        self.fleet.log(f"[{self.name}] {msg}", level)
+
+
+class Fleet:
+    """
+    Several instruments acquiring concurrently, one worker thread per
+    session, all feeding one shared ReadingPipeline. Each member's readings
+    are tagged with its own store source code, so the shared store,
+    per-instrument stats and recordings keep them apart.
+
+    The consumer side stays with the caller: drain `pipeline` on a timer
+    as for a single instrument.
+    """
+
+    def __init__(self, app, pipeline, log=None, simulate=False, sim_options=None):
+        self.app = app
+        self.pipeline = pipeline
+        self.log = log or (lambda msg, level="info": None)
+        self.simulate = simulate
+        self.sim_options = sim_options or {}
+        self.members = {}
+        self._lock = threading.Lock()
+
+    def add(self, resource, name=None):
+        """
+        Connects `resource` as a new member. Returns the member, or None
+        if the connection failed (the error is logged).
+        """
+        with self._lock:
+            if name is None:
+                k = len(self.members) + 1
+                while f"DMM{k}" in self.members:
+                    k += 1
+                name = f"DMM{k}"
+            if name in self.members:
+                raise ValueError(f"Instrument name already in use: {name}")
+            # the name is reserved while connecting; the store source only
+            # once connected, so a failed add leaves the store single-source
+            member = FleetMember(self, name, resource, None)
+            self.members[name] = member
+        if not member.connect():
+            self.log(f"[{name}] Connection failed: {member.inst.last_error}", "err")
+            with self._lock:
+                del self.members[name]
+            return None
+        try:
+            member.source = self.app.store.add_source(name)
+        except ValueError:
+            member.disconnect()
+            with self._lock:
+                del self.members[name]
+            raise
+        self.log(f"[{name}] Connected: {member.idn}")
+        return member
+
+    def remove(self, name):
+        with self._lock:
+            member = self.members.pop(name, None)
+        if member is not None:
+            member.disconnect()
+
+    def _select(self, names):
+        with self._lock:
+            if names is None:
+                return list(self.members.values())
+            return [self.members[n] for n in names if n in self.members]
+
+    def start(self, settings, names=None):
+        """
+        Starts the same sequence on the named members (all by default).
+        Returns the names that were started.
+        """
+        return [m.name for m in self._select(names) if m.start(settings)]
+
+    def stop(self, names=None):
+        for m in self._select(names):
+            m.stop()
+
+    def pause(self, paused=True, names=None):
+        for m in self._select(names):
+            m.pause(paused)
+
+    def wait(self, timeout=None):
+        """
+        Waits for all running members; returns True if none is left running.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for m in self._select(None):
+            if m.thread is not None:
+                m.thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        return not self.running
+
+    @property
+    def running(self):
+        return any(m.running for m in self._select(None))
+
+    def readings(self):
+        """
+        Readings drained so far per member name.
+        """
+        counts = self.pipeline.source_readings
+        return {m.name: counts.get(m.source, 0) for m in self._select(None)}
+
+    def close(self):
+        for m in self._select(None):
+            m.disconnect()
+        with self._lock:
+            self.members.clear()
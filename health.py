@@ -0,0 +1,89 @@
+# health.py
+import time
+
+# VISA timeout before any latency has been observed (ms)
+DEFAULT_TIMEOUT_MS = 5000
+# bounds for the adaptive timeout (ms)
+MIN_TIMEOUT_MS = 1000
+MAX_TIMEOUT_MS = 60000
+# adaptive timeout = TIMEOUT_MARGIN x (smoothed latency + 4 x latency deviation)
+TIMEOUT_MARGIN = 4.0
+# round trips observed before the adaptive timeout replaces the default
+MIN_SAMPLES = 8
+# failed operations in a row after which the link counts as lost
+MAX_CONSECUTIVE_ERRORS = 3
+
+
+class ConnectionHealth:
+    """
+    I/O health of one instrument session.
+
+    Every operation reports its round trip (ok) or its failure (error).
+    A run of MAX_CONSECUTIVE_ERRORS failures marks the link as lost, so a
+    single glitch stays a single invalid reading while a dropped cable
+    leads to a reconnect instead of hours of timeouts.
+
+    The VISA timeout follows the observed latency the way TCP sizes its
+    retransmission timeout: smoothed latency plus four times its mean
+    deviation, with a safety margin and clamped to
+    [MIN_TIMEOUT_MS, MAX_TIMEOUT_MS]. Call reset_latency() when the
+    workload changes (new phase, different burst size).
+    """
+
+    def __init__(self):
+        self.ok_count = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.reset()
+
+    def reset(self):
+        self.consecutive_errors = 0
+        self.failing_since = None
+        self.last_error = None
+        self.reset_latency()
+
+    def reset_latency(self):
+        self.samples = 0
+        self.srtt = 0.0
+        self.rttvar = 0.0
+
+    def ok(self, latency):
+        self.ok_count += 1
+        self.consecutive_errors = 0
+        self.failing_since = None
+        if self.samples == 0:
+            self.srtt = latency
+            self.rttvar = latency / 2
+        else:
+            # RFC 6298 gains
+            self.rttvar += 0.25 * (abs(self.srtt - latency) - self.rttvar)
+            self.srtt += 0.125 * (latency - self.srtt)
+        self.samples += 1
+
+    def error(self, exc):
+        self.errors += 1
+        self.consecutive_errors += 1
+        self.last_error = str(exc) or type(exc).__name__
+        if self.failing_since is None:
+            # epoch seconds, the start of the gap if the link turns out lost
+            self.failing_since = time.time()
+
+    @property
+    def failed(self):
+        return self.consecutive_errors >= MAX_CONSECUTIVE_ERRORS
+
+    def timeout_ms(self):
+        if self.samples < MIN_SAMPLES:
+            return DEFAULT_TIMEOUT_MS
+        ms = TIMEOUT_MARGIN * (self.srtt + 4 * self.rttvar) * 1000
+        return int(min(max(ms, MIN_TIMEOUT_MS), MAX_TIMEOUT_MS))
+
+    def summary(self):
+        return {
+            "ok": self.ok_count,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "latency_ms": self.srtt * 1e3 if self.samples else None,
+            "timeout_ms": self.timeout_ms(),
+            "last_error": self.last_error,
+        }
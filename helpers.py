@@ -7,6 +7,11 @@ def parse_float_safe(s: str):
         return float("nan")
 
 
+def parse_reading_list(raw: str):
+    # printbuffer returns comma separated values
+    return [parse_float_safe(tok) for tok in raw.split(",") if tok.strip()]
+
+
 def format_reading(val, phase):
     if math.isnan(val):
         return "---"
@@ -44,3 +49,14 @@ def parse_range(range_str, phase):
         "100mA": 0.1, "1A": 1, "3A": 3
     }
     return mapping.get(range_str, 1)
+
+
+def phase_order(order):
+    # sequence option -> phases measured in each cycle
+    if order == "V only":
+        return ["VOLTAGE"]
+    if order == "I only":
+        return ["CURRENT"]
+    if order == "I->V":
+        return ["CURRENT", "VOLTAGE"]
+    return ["VOLTAGE", "CURRENT"]
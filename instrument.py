@@ -1,28 +1,167 @@
-import pyvisa
-from tkinter import messagebox
+import time
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import (
+    LUA_FORMAT_DATA, LUA_FORMAT_BYTEORDER, LUA_PRINTBUFFER, LUA_PRINTBUFFER_RANGE,
+    LUA_BUFFER_CLEAR, LUA_BUFFER_CAPACITY, TRANSFER_FORMATS,
+    LUA_PRINTBUFFER_TS, LUA_MEAS_READ_TS,
+    LUA_DIGITIZE_FUNC, LUA_DIGITIZE_RATE, LUA_DIGITIZE_COUNT, LUA_DIGITIZE_RANGE,
+    LUA_DIGITIZE_READ_BUF, DIGITIZE_FUNCS, DIGITIZE_MAX_RATE,
+    LUA_LOADSCRIPT, LUA_ENDSCRIPT, LUA_RUNSCRIPT, SIM_RESOURCE_PREFIX, SIM_RESOURCE,
+    LUA_SET_FUNC, LUA_SET_RANGE, LUA_AUTORANGE_ON, LUA_AUTORANGE_OFF,
+    LUA_SET_NPLC, LUA_AUTOZERO, LUA_FILTER_ON, LUA_FILTER_OFF, MEASURE_FUNCS,
+)
+from diagnostics import InstrumentedSession
+from health import ConnectionHealth, DEFAULT_TIMEOUT_MS
+from helpers import parse_reading_list
+from tsp_script import configlist_lines, alternating_read_lines
+
+# pyvisa datatype codes for the binary formats
+_BINARY_DTYPES = {"REAL32": "f", "REAL64": "d"}
+
+# Discovery: VISA resource query, *IDN? substring kept when identifying,
+# how long a scan result stays valid and the per-device *IDN? timeout
+SCAN_QUERY = "?*::INSTR"
+IDN_FILTER = "DMM6500"
+SCAN_CACHE_S = 30.0
+IDN_TIMEOUT_MS = 1000
+SCAN_WORKERS = 8
+
+# Reconnect: first retry delay, doubled per failed attempt up to the maximum (s)
+RECONNECT_BACKOFF_S = 0.5
+RECONNECT_BACKOFF_MAX_S = 30.0
+
+_rm_lock = threading.Lock()
+_visa_rm = None
+
+
+def shared_resource_manager():
+    """
+    Process-wide pyvisa ResourceManager, created (and the VISA backend
+    loaded) on first use and kept open; sessions are opened from it.
+    """
+    global _visa_rm
+    with _rm_lock:
+        if _visa_rm is None:
+            import pyvisa
+            _visa_rm = pyvisa.ResourceManager()
+        return _visa_rm
+
 
 class InstrumentManager:
-    def __init__(self, app):
+    def __init__(self, app, simulate=False, sim_options=None, log=None):
         self.app = app
+        # log(msg, level): reconnect, resync and script abort run on worker
+        # threads, so in the GUI this must not touch Tk directly
+        self.log = log or app._log
+        # optional metrics registry (diagnostics.Diagnostics) shared with the app
+        self.diag = getattr(app, "diagnostics", None)
+        # offer the simulated DMM6500 in scan(); options go to SimulatedDMM
+        self.simulate = simulate
+        self.sim_options = sim_options or {}
         self.rm = None
         self.dmm = None
+        self.resource = None
+        self.idn = None
         self.connected = False
+        self.last_error = None
+        self.transfer_format = "ASCII"
+        self.timestamps = False
+        # instrument clock minus host clock (s), see estimate_clock_offset
+        self.clock_offset = 0.0
+        self.clock_uncertainty = None
+        self.config_writes = 0
+        self.config_skipped = 0
+        self.invalidate_config()
+        # consecutive errors and adaptive timeout, see io() and reconnect()
+        self.health = ConnectionHealth()
+        self._timeout_ms = DEFAULT_TIMEOUT_MS
+        # lower bound on the timeout for the current workload, see set_min_timeout()
+        self.min_timeout_ms = 0
+        # discovery: {(query, identify): (monotonic time, resources)}, {resource: idn}
+        self._scan_lock = threading.Lock()
+        self._scan_cache = {}
+        self._scan_thread = None
+        self.idn_cache = {}
+        self.scan_error = None
 
-    def scan(self):
+    def _resource_manager(self, resource=None):
+        # SIM:: resources go to the in-process simulator, everything else to
+        # the shared VISA manager. Both load on first use.
+        if resource is not None and resource.startswith(SIM_RESOURCE_PREFIX):
+            from simulator import SimResourceManager
+            return SimResourceManager(**self.sim_options)
+        return shared_resource_manager()
+
+    def scan(self, query=SCAN_QUERY, identify=True, max_age=SCAN_CACHE_S):
+        """
+        Lists resources matching the VISA `query`. With `identify` every
+        candidate is asked *IDN? (in parallel, short timeout) and only those
+        answering with IDN_FILTER are kept; answers go to `idn_cache`.
+        Results are reused for `max_age` seconds (0 forces a fresh scan).
+        Never raises: a listing failure is left in `scan_error`. Safe to
+        call from any thread; concurrent calls wait for the running scan.
+        """
+        key = (query, identify)
+        with self._scan_lock:
+            cached = self._scan_cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < max_age:
+                return list(cached[1])
+            self.scan_error = None
+            res = []
+            try:
+                res = list(shared_resource_manager().list_resources(query))
+            except Exception as e:
+                self.scan_error = str(e)
+            if self.simulate:
+                res.append(SIM_RESOURCE)
+            if identify and res:
+                with ThreadPoolExecutor(min(SCAN_WORKERS, len(res))) as pool:
+                    idns = list(pool.map(self._identify, res))
+                res = [r for r, idn in zip(res, idns) if idn and IDN_FILTER in idn]
+            self._scan_cache[key] = (time.monotonic(), res)
+            return list(res)
+
+    def scan_async(self, callback, **kwargs):
+        """
+        Runs scan(**kwargs) on a background thread and calls
+        `callback(resources)` from that thread when done. Returns False if
+        a background scan is already running.
+        """
+        if self._scan_thread is not None and self._scan_thread.is_alive():
+            return False
+        self._scan_thread = threading.Thread(
+            target=lambda: callback(self.scan(**kwargs)), daemon=True)
+        self._scan_thread.start()
+        return True
+
+    def _identify(self, resource):
+        # the open session already knows its IDN; a second session could disturb it
+        if self.connected and resource == self.resource:
+            return self.idn
         try:
-            rm_local = pyvisa.ResourceManager()
-            res = list(rm_local.list_resources())
-            rm_local.close()
-            return res
-        except Exception as e:
-            self.app._log(f"Scan Error: {e}", "err")
-            return []
+            dev = self._resource_manager(resource).open_resource(resource, open_timeout=IDN_TIMEOUT_MS)
+            try:
+                dev.timeout = IDN_TIMEOUT_MS
+                idn = dev.query("*IDN?").strip()
+            finally:
+                dev.close()
+        except Exception:
+            return None
+        self.idn_cache[resource] = idn
+        return idn
 
-    def connect(self, resource):
+    def connect(self, resource, quiet=False):
         try:
-            self.rm = pyvisa.ResourceManager()
+            self.rm = self._resource_manager(resource)
             self.dmm = self.rm.open_resource(resource)
-            self.dmm.timeout = 5000
+            if self.diag is not None:
+                # time every VISA call of this session
+                self.dmm = InstrumentedSession(self.dmm, self.diag)
+            self.dmm.timeout = self._timeout_ms = max(DEFAULT_TIMEOUT_MS, self.min_timeout_ms)
+            self.health.reset()
 
             try:
                 idn = self.dmm.query("*IDN?").strip()
@@ -30,20 +169,423 @@ class InstrumentManager:
                 idn = resource
 
             self.connected = True
+            self.last_error = None
+            self.resource, self.idn = resource, idn
+            self.idn_cache[resource] = idn
+            self.invalidate_config()
+            self.apply_transfer_format()
             return idn
 
         except Exception as e:
-            try: self.rm.close()
-            except: pass
-
+            # the resource manager is shared and stays open
             self.connected = False
-            messagebox.showerror("Connection Error", str(e))
+            self.last_error = str(e)
+            if not quiet:
+                self.log(f"Connection error: {e}", "err")
             return None
 
     def disconnect(self):
         try: 
             if self.dmm: self.dmm.close()
-            if self.rm: self.rm.close()
         except: 
             pass
         self.connected = False
+        self.resource = self.idn = None
+        self.invalidate_config()
+
+    # -------------------------
+    # Session health and reconnect
+    # -------------------------
+    def io(self, fn, *args, **kwargs):
+        """
+        Runs one instrument operation `fn(*args, **kwargs)` under health
+        tracking. Its round trip feeds the adaptive timeout; a failure is
+        counted, the session is re-synchronized (device clear, so a late
+        answer to a timed-out query is not read as the next one's) and the
+        exception re-raised. Check `health.failed` to decide on reconnect().
+        """
+        t0 = time.perf_counter()
+        try:
+            out = fn(*args, **kwargs)
+        except Exception as e:
+            self.health.error(e)
+            self._resync()
+            raise
+        self.health.ok(time.perf_counter() - t0)
+        ms = max(self.health.timeout_ms(), self.min_timeout_ms)
+        # only touch the session when the timeout moved noticeably
+        if abs(ms - self._timeout_ms) > self._timeout_ms * 0.1:
+            try:
+                self.dmm.timeout = self._timeout_ms = ms
+            except Exception:
+                pass
+        return out
+
+    def set_min_timeout(self, ms):
+        """
+        Keeps the VISA timeout at `ms` or above (0 = no floor), for
+        operations that legitimately take long, like a buffered burst whose
+        printbuffer query waits for the whole acquisition. Applies at once
+        and survives reconnects.
+        """
+        self.min_timeout_ms = int(max(ms, 0))
+        ms = max(self.health.timeout_ms(), self.min_timeout_ms)
+        if self.connected and ms != self._timeout_ms:
+            try:
+                self.dmm.timeout = self._timeout_ms = ms
+            except Exception:
+                pass
+
+    def _resync(self):
+        try:
+            self.dmm.clear()
+        except Exception:
+            # the link is gone; reconnect() deals with it
+            return
+        self.apply_transfer_format()
+
+    def reconnect(self, stop_event=None, max_wait=None):
+        """
+        Re-opens the session to the current resource after a lost link,
+        retrying with exponential backoff (RECONNECT_BACKOFF_S doubling up
+        to RECONNECT_BACKOFF_MAX_S) until it answers, `stop_event` is set or
+        `max_wait` seconds have passed. Transfer format, timestamp mode and
+        the cached measurement configuration are restored on the new
+        session. Returns True once reconnected.
+        """
+        resource, saved = self.resource, self._config
+        try:
+            if self.dmm:
+                self.dmm.close()
+        except Exception:
+            pass
+        self.connected = False
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        delay = RECONNECT_BACKOFF_S
+        attempt = 0
+        while True:
+            attempt += 1
+            # connect() re-applies the transfer format and timestamp mode
+            if self.connect(resource, quiet=True):
+                self.health.reconnects += 1
+                try:
+                    self._restore_config(saved)
+                except Exception as e:
+                    self.log(f"Configuration restore error: {e}", "warn")
+                self.log(f"Reconnected to {resource} (attempt {attempt})")
+                return True
+            if deadline is not None and time.monotonic() + delay > deadline:
+                self.log(f"Reconnect to {resource} given up: {self.last_error}", "err")
+                return False
+            self.log(f"Reconnect attempt {attempt} failed ({self.last_error}), "
+                          f"retrying in {delay:.1f} s", "warn")
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_BACKOFF_MAX_S)
+
+    def _restore_config(self, saved):
+        # replay the shadow model of the old session in one write, active function last
+        cmds = []
+        for func, have in saved["funcs"].items():
+            cmds.append(LUA_SET_FUNC.format(func=func))
+            cmds.extend(self._config_cmd(key, val) for key, val in have.items())
+        if saved["func"] is not None:
+            cmds.append(LUA_SET_FUNC.format(func=saved["func"]))
+        if not cmds:
+            return
+        self.dmm.write(" ".join(cmds))
+        self._config = {"func": saved["func"],
+                        "funcs": {func: dict(have) for func, have in saved["funcs"].items()}}
+
+    # -------------------------
+    # Bulk reading transfer
+    # -------------------------
+    def set_transfer_format(self, fmt):
+        """
+        Selects how buffer contents come back: "ASCII" (default, parsed text)
+        or "REAL32"/"REAL64" (IEEE-754 blocks read with query_binary_values).
+        """
+        fmt = str(fmt).upper()
+        if fmt not in TRANSFER_FORMATS:
+            raise ValueError(f"Unknown transfer format: {fmt}")
+        self.transfer_format = fmt
+        if self.connected:
+            self.apply_transfer_format()
+
+    def set_timestamps(self, on):
+        """
+        Enables fetching instrument buffer timestamps along with readings.
+        """
+        self.timestamps = bool(on)
+        if self.connected:
+            self.apply_transfer_format()
+
+    @property
+    def wire_format(self):
+        # epoch seconds do not fit REAL32 (~2 min resolution), so timestamped
+        # transfers go out as REAL64 when REAL32 is selected
+        if self.timestamps and self.transfer_format == "REAL32":
+            return "REAL64"
+        return self.transfer_format
+
+    def apply_transfer_format(self):
+        """
+        Writes the selected transfer format (format.data, byte order) to the
+        instrument again, e.g. after a script or device clear reset it.
+        """
+        try:
+            self.dmm.write(LUA_FORMAT_DATA.format(fmt=self.wire_format))
+            if self.wire_format in _BINARY_DTYPES:
+                self.dmm.write(LUA_FORMAT_BYTEORDER)
+        except Exception as e:
+            # keep the session usable in ASCII if the instrument refuses
+            self.transfer_format = "ASCII"
+            self.log(f"Transfer format error, using ASCII: {e}", "warn")
+
+    def _query_values(self, cmd):
+        # printbuffer output follows format.data: text or an IEEE-754 block
+        dtype = _BINARY_DTYPES.get(self.wire_format)
+        if dtype is None:
+            resp = self.dmm.query(cmd)
+            t0 = time.perf_counter()
+            vals = np.asarray(parse_reading_list(resp), dtype=np.float64)
+            if self.diag is not None:
+                self.diag.observe("stage_seconds", "parse", time.perf_counter() - t0)
+            return vals
+        vals = self.dmm.query_binary_values(
+            cmd, datatype=dtype, is_big_endian=False, container=np.array
+        )
+        return vals.astype(np.float64, copy=False)
+
+    def read_buffer(self, buf="defbuffer1", start=None, end=None, timestamps=False):
+        """
+        Returns the readings currently held in `buf` as a float64 NumPy array.
+        `start`/`end` (1-based, inclusive) select a slice of the buffer.
+        With `timestamps` returns (t, readings), where t is the instrument
+        timestamp of each reading in epoch seconds (instrument clock).
+        """
+        if timestamps:
+            cmd = LUA_PRINTBUFFER_TS.format(
+                start=start or 1, end=end or f"{buf}.n", buf=buf)
+            a = self._query_values(cmd).reshape(-1, 3)
+            return a[:, 1] + a[:, 2], a[:, 0]
+        if start is None:
+            cmd = LUA_PRINTBUFFER.format(buf=buf)
+        else:
+            cmd = LUA_PRINTBUFFER_RANGE.format(start=start, end=end, buf=buf)
+        return self._query_values(cmd)
+
+    def read_single(self, buf="defbuffer1"):
+        """
+        Takes one reading into `buf` and returns (instrument timestamp, value)
+        in a single round trip.
+        """
+        a = self._query_values(LUA_MEAS_READ_TS.format(buf=buf))
+        return a[1] + a[2], a[0]
+
+    def estimate_clock_offset(self, buf="defbuffer1", samples=5):
+        """
+        Estimates instrument clock minus host clock from a few timestamped
+        single readings, keeping the one with the shortest round trip
+        (uncertainty is half of that round trip).
+        """
+        best = None
+        for _ in range(samples):
+            h0 = time.time()
+            t_inst, _ = self.read_single(buf)
+            h1 = time.time()
+            rtt = h1 - h0
+            if best is None or rtt < best[1]:
+                best = (t_inst - (h0 + h1) / 2, rtt)
+        self.clock_offset = best[0]
+        self.clock_uncertainty = best[1] / 2
+        return self.clock_offset, self.clock_uncertainty
+
+    def to_host_time(self, t_inst):
+        return t_inst - self.clock_offset
+
+    # -------------------------
+    # Digitize capture
+    # -------------------------
+    def digitize_capture(self, phase, rate, count, rng="Auto", buf="defbuffer1", chunk=50000):
+        """
+        Captures `count` digitized samples of `phase` ("VOLTAGE"/"CURRENT") at
+        `rate` S/s into `buf` and pulls them back in binary chunks.
+        Returns a float64 NumPy array.
+        """
+        rate = int(min(max(rate, 1), DIGITIZE_MAX_RATE))
+        count = int(max(count, 1))
+        dmm = self.dmm
+
+        self._config["func"] = None
+        dmm.write(LUA_DIGITIZE_FUNC.format(func=DIGITIZE_FUNCS[phase]))
+        if rng != "Auto":
+            # digitize functions have no autorange, keep instrument default otherwise
+            dmm.write(LUA_DIGITIZE_RANGE.format(rng=rng))
+        dmm.write(LUA_DIGITIZE_RATE.format(rate=rate))
+        dmm.write(LUA_DIGITIZE_COUNT.format(count=count))
+        dmm.write(LUA_BUFFER_CAPACITY.format(buf=buf, capacity=max(count, 10)))
+        dmm.write(LUA_BUFFER_CLEAR.format(buf=buf))
+
+        # captures are always moved as binary blocks; ASCII is ~3x the bytes
+        prev_fmt = self.transfer_format
+        prev_timeout = dmm.timeout
+        if prev_fmt == "ASCII":
+            self.set_transfer_format("REAL32")
+        try:
+            # the first chunk query waits for the whole capture to finish
+            dmm.timeout = max(prev_timeout, int(count / rate * 1000) + 5000)
+            dmm.write(LUA_DIGITIZE_READ_BUF.format(buf=buf))
+            parts = []
+            for start in range(1, count + 1, chunk):
+                end = min(start + chunk - 1, count)
+                parts.append(self.read_buffer(buf, start, end))
+        finally:
+            dmm.timeout = prev_timeout
+            if prev_fmt == "ASCII":
+                self.set_transfer_format("ASCII")
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    # -------------------------
+    # On-instrument scripts
+    # -------------------------
+    def load_script(self, name, body):
+        """
+        Loads `body` as TSP script `name` (loadscript/endscript), replacing
+        any previous script with the same name.
+        """
+        self.dmm.write(LUA_LOADSCRIPT.format(name=name))
+        for line in body.splitlines():
+            self.dmm.write(line)
+        self.dmm.write(LUA_ENDSCRIPT)
+
+    def run_script(self, name):
+        # scripts reconfigure the instrument behind the cache's back
+        self.invalidate_config()
+        self.dmm.write(LUA_RUNSCRIPT.format(name=name))
+
+    def read_line(self):
+        """
+        Reads one line of script output; returns None on timeout so the
+        caller can check for stop requests and keep waiting.
+        """
+        from pyvisa.errors import VisaIOError
+        from pyvisa.constants import StatusCode
+        try:
+            return self.dmm.read().strip()
+        except VisaIOError as e:
+            if e.error_code == StatusCode.error_timeout:
+                return None
+            raise
+
+    def abort_script(self):
+        # a device clear aborts the running script on TSP instruments
+        self.invalidate_config()
+        try:
+            self.dmm.clear()
+        except Exception as e:
+            self.log(f"Script abort error: {e}", "warn")
+        self.apply_transfer_format()
+
+    # -------------------------
+    # Measurement configuration cache
+    # -------------------------
+    def invalidate_config(self):
+        """
+        Forgets the shadow configuration; the next configure_measure()
+        rewrites everything. Called on (re)connect, errors and whenever
+        something else (scripts, digitize) touches the instrument.
+        """
+        self._config = {"func": None, "funcs": {}}
+
+    def configure_measure(self, phase, rng="Auto", nplc=None, autozero=None, filter_count=None):
+        """
+        Brings dmm.measure to the requested function/range/NPLC/autozero and
+        repeat-average filter (filter_count 0 turns the filter off),
+        sending only the settings that differ from the shadow model, batched
+        into a single write. Range, NPLC and autozero are per-function on
+        the DMM6500, so they are cached per function. Returns the number of
+        commands sent (0 when nothing changed).
+        """
+        func = MEASURE_FUNCS[phase]
+        want = {"autorange": rng == "Auto"}
+        if rng != "Auto":
+            want["range"] = rng
+        if nplc is not None:
+            want["nplc"] = nplc
+        if autozero is not None:
+            want["autozero"] = bool(autozero)
+        if filter_count is not None:
+            want["filter"] = int(filter_count)
+
+        cmds = []
+        if self._config["func"] != func:
+            cmds.append(LUA_SET_FUNC.format(func=func))
+        have = self._config["funcs"].get(func, {})
+        for key, val in want.items():
+            if have.get(key) != val:
+                cmds.append(self._config_cmd(key, val))
+        if not cmds:
+            self.config_skipped += 1
+            return 0
+
+        try:
+            self.dmm.write(" ".join(cmds))
+        except Exception:
+            self.invalidate_config()
+            raise
+        self.config_writes += 1
+        self._config["func"] = func
+        have = self._config["funcs"].setdefault(func, {})
+        have.update(want)
+        if want["autorange"]:
+            # the instrument picks the range itself now
+            have.pop("range", None)
+        return len(cmds)
+
+    @staticmethod
+    def _config_cmd(key, val):
+        if key == "autorange":
+            return LUA_AUTORANGE_ON if val else LUA_AUTORANGE_OFF
+        if key == "range":
+            return LUA_SET_RANGE.format(rng=val)
+        if key == "nplc":
+            return LUA_SET_NPLC.format(nplc=val)
+        if key == "filter":
+            return LUA_FILTER_ON.format(count=val) if val > 1 else LUA_FILTER_OFF
+        return LUA_AUTOZERO.format(state="ON" if val else "OFF")
+
+    # -------------------------
+    # Alternating V/I via configuration lists
+    # -------------------------
+    def create_configlists(self, settings):
+        """
+        Stores the voltage and current setups as measure configuration lists
+        (one write), so each later switch is a single recall.
+        """
+        self.dmm.write(" ".join(configlist_lines(settings)))
+        self.invalidate_config()
+
+    def read_pairs(self, buf="defbuffer1", count=1, timestamps=False):
+        """
+        Takes `count` back-to-back V/I pairs on the instrument in one round
+        trip (config recall between readings). Returns
+        (t_v, volts, t_i, amps); the t arrays are None without timestamps.
+        """
+        loop = " ".join(alternating_read_lines(buf))
+        cols = f"{buf}.readings"
+        if timestamps:
+            cols += f", {buf}.seconds, {buf}.fractionalseconds"
+        cmd = (f"{buf}.clear() for j = 1, {int(count)} do {loop} end "
+               f"printbuffer(1, {buf}.n, {cols})")
+        # recalls change the active function behind the cache
+        self.invalidate_config()
+        a = self._query_values(cmd)
+        if timestamps:
+            a = a.reshape(-1, 3)
+            t, vals = a[:, 1] + a[:, 2], a[:, 0]
+            return t[0::2], vals[0::2], t[1::2], vals[1::2]
+        return None, a[0::2], None, a[1::2]
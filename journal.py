@@ -0,0 +1,379 @@
+# journal.py
+import os
+import json
+import mmap
+import time
+import zlib
+import struct
+import threading
+from datetime import datetime
+import numpy as np
+
+from stats import RunningStats
+from store import PHASE_CODES
+
+# Session journal: an append-only file of framed records
+#   magic | META | DATA | DATA | EVNT | ... | INDX | trailer
+# Every record is a 16-byte header (kind, payload length, CRC-32 of the
+# payload, reserved) followed by the payload, zero-padded to 8 bytes so
+# reading rows can be memory-mapped in place.
+JOURNAL_MAGIC = b"DMMJRN1\n"
+JOURNAL_EXT = ".dmmjrn"
+_RECORD = struct.Struct("<4sIII")
+REC_META, REC_DATA, REC_EVENT, REC_INDEX = b"META", b"DATA", b"EVNT", b"INDX"
+# last 16 bytes of a cleanly closed journal: marker and offset of the INDX record
+_TRAILER = struct.Struct("<8sQ")
+TRAILER_MAGIC = b"DMMJIDX\n"
+
+# DATA payload: chunk header, then `n` rows of ROW_DTYPE. One chunk holds
+# readings of a single phase and source; the header carries its time
+# range and statistics, so overviews and cards never touch the rows.
+CHUNK_DTYPE = np.dtype([
+    ("t_min", "<f8"), ("t_max", "<f8"), ("mean", "<f8"), ("m2", "<f8"), ("sum_sq", "<f8"),
+    ("min", "<f8"), ("max", "<f8"), ("n", "<u4"), ("valid", "<u4"),
+    ("phase", "u1"), ("source", "u1"), ("pad", "V6"),
+])
+ROW_DTYPE = np.dtype([("t", "<f8"), ("value", "<f8")])
+# INDX payload: chunk count, other-record count, then one INDEX_DTYPE entry
+# per chunk (file offset of its rows + its header) and the file offsets of
+# the META/EVNT records
+INDEX_DTYPE = np.dtype([("offset", "<u8")] + [(name, CHUNK_DTYPE.fields[name][0])
+                                              for name in CHUNK_DTYPE.names])
+_INDEX_COUNTS = struct.Struct("<QQ")
+
+# where the GUI puts session journals
+SESSION_DIR = os.path.join(os.path.expanduser("~"), "DMM6500 Sessions")
+
+
+def session_path(directory=SESSION_DIR, when=None):
+    # one file per session, named by its start time to the millisecond;
+    # a counter keeps sessions started within the same millisecond apart
+    when = when or datetime.now()
+    stamp = f"{when.strftime('%Y%m%d_%H%M%S')}_{when.microsecond // 1000:03d}"
+    path = os.path.join(directory, f"session_{stamp}{JOURNAL_EXT}")
+    n = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"session_{stamp}_{n}{JOURNAL_EXT}")
+        n += 1
+    return path
+
+
+class SessionJournal:
+    """
+    Crash-safe, append-only record of one session: sequence settings and
+    instrument identity (META), readings (DATA chunks), event log lines
+    and connection gaps (EVNT).
+
+    Readings are buffered per (phase, source) and written as chunks of up
+    to `chunk_rows` rows, at the latest every `flush_interval` seconds;
+    the file is fsync'ed every `fsync_interval` seconds. Nothing written
+    is ever rewritten: close() appends the chunk index and a trailer, and
+    a journal cut short by a crash is still readable up to its last
+    complete record (JournalReader rebuilds the index).
+    """
+
+    def __init__(self, path, meta=None, chunk_rows=65536, flush_interval=1.0, fsync_interval=5.0):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.rows_written = 0
+        self._lock = threading.Lock()
+        # {(phase code, source): [(t, vals), ...]}
+        self._pending = {}
+        self._pending_rows = 0
+        self._index = []
+        self._others = []
+        self._last_flush = self._last_fsync = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._f = open(path, "xb")
+        self._f.write(JOURNAL_MAGIC)
+        self.meta(created=time.time(), **(meta or {}))
+
+    # -------------------------
+    # Writing
+    # -------------------------
+    def _append(self, kind, payload):
+        # returns the file offset of the payload
+        head = _RECORD.pack(kind, len(payload), zlib.crc32(payload), 0)
+        offset = self._f.tell() + _RECORD.size
+        self._f.write(head)
+        self._f.write(payload)
+        pad = -len(payload) % 8
+        if pad:
+            self._f.write(b"\0" * pad)
+        return offset
+
+    def meta(self, **fields):
+        """
+        Appends session metadata (settings, IDN, resource, sources, ...);
+        later records override earlier keys when read back.
+        """
+        payload = json.dumps(fields, default=str).encode()
+        with self._lock:
+            if self._f is not None:
+                self._others.append(self._append(REC_META, payload) - _RECORD.size)
+
+    def event(self, msg, level="info", t=None, **extra):
+        payload = json.dumps(dict(t=time.time() if t is None else t, level=level, msg=msg, **extra),
+                             default=str).encode()
+        with self._lock:
+            if self._f is not None:
+                self._others.append(self._append(REC_EVENT, payload) - _RECORD.size)
+
+    def gap(self, t0, t1, phase, source=0):
+        self.event(f"Gap in {phase}: {t1 - t0:.1f} s without readings", "warn", t=t0,
+                   kind="gap", t0=t0, t1=t1, phase=phase, source=source)
+
+    def write(self, t, phase, vals, source=0):
+        vals = np.asarray(vals, dtype=np.float64).ravel()
+        if vals.size == 0:
+            return
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64), vals.shape)
+        with self._lock:
+            if self._f is None:
+                return
+            self._pending.setdefault((PHASE_CODES[phase], source), []).append((t, vals))
+            self._pending_rows += vals.size
+            now = time.monotonic()
+            if self._pending_rows >= self.chunk_rows or now - self._last_flush >= self.flush_interval:
+                self._flush(now)
+
+    def _flush(self, now):
+        # chunks in order of their first reading, so the file stays roughly time-ordered
+        groups = sorted(self._pending.items(), key=lambda kv: float(kv[1][0][0][0]))
+        for (code, source), parts in groups:
+            t = np.concatenate([p[0] for p in parts])
+            vals = np.concatenate([p[1] for p in parts])
+            for start in range(0, vals.size, self.chunk_rows):
+                self._write_chunk(code, source, t[start:start + self.chunk_rows],
+                                  vals[start:start + self.chunk_rows])
+        self._pending = {}
+        self._pending_rows = 0
+        self._f.flush()
+        self._last_flush = now
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._f.fileno())
+            self._last_fsync = now
+
+    def _write_chunk(self, code, source, t, vals):
+        head = np.zeros(1, dtype=CHUNK_DTYPE)
+        h = head[0]
+        h["t_min"], h["t_max"] = t.min(), t.max()
+        h["n"], h["phase"], h["source"] = vals.size, code, source
+        valid = vals[~np.isnan(vals)]
+        h["valid"] = valid.size
+        if valid.size:
+            mean = valid.mean()
+            h["mean"], h["m2"] = mean, ((valid - mean) ** 2).sum()
+            h["sum_sq"], h["min"], h["max"] = np.dot(valid, valid), valid.min(), valid.max()
+        rows = np.empty(vals.size, dtype=ROW_DTYPE)
+        rows["t"], rows["value"] = t, vals
+        offset = self._append(REC_DATA, head.tobytes() + rows.tobytes())
+        self._index.append((offset + CHUNK_DTYPE.itemsize,) + tuple(h[name] for name in CHUNK_DTYPE.names))
+        self.rows_written += vals.size
+
+    def flush(self):
+        with self._lock:
+            if self._f is not None:
+                self._flush(time.monotonic())
+
+    def close(self):
+        with self._lock:
+            if self._f is None:
+                return
+            now = time.monotonic()
+            self._last_fsync = now - self.fsync_interval
+            self._flush(now)
+            index = np.array(self._index, dtype=INDEX_DTYPE)
+            others = np.array(self._others, dtype="<u8")
+            payload = (_INDEX_COUNTS.pack(index.size, others.size)
+                       + index.tobytes() + others.tobytes())
+            at = self._append(REC_INDEX, payload) - _RECORD.size
+            self._f.write(_TRAILER.pack(TRAILER_MAGIC, at))
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._f.close()
+            self._f = None
+
+
+class JournalReader:
+    """
+    Opens a session journal for replay without loading it: the file is
+    memory-mapped, the chunk index is read from the trailer (or rebuilt
+    by scanning the records if the session did not close cleanly) and
+    readings are only touched for the chunks a query overlaps.
+
+        meta        merged META records (settings, idn, ...)
+        events      event log entries, in order
+        gaps        the events marking connection gaps
+        index       one INDEX_DTYPE entry per chunk
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._f.close()
+            raise ValueError(f"Empty journal: {path}")
+        if self._mm[:len(JOURNAL_MAGIC)] != JOURNAL_MAGIC:
+            self.close()
+            raise ValueError(f"Not a session journal: {path}")
+        self.recovered = False
+        if not self._load_index():
+            self._scan()
+            self.recovered = True
+        self.meta = {}
+        self.events = []
+        for off in self._others:
+            kind, payload = self._record(int(off))
+            if kind == REC_META:
+                self.meta.update(json.loads(payload))
+            else:
+                self.events.append(json.loads(payload))
+        self.gaps = [e for e in self.events if e.get("kind") == "gap"]
+
+    def _record(self, offset):
+        kind, length, _, _ = _RECORD.unpack_from(self._mm, offset)
+        start = offset + _RECORD.size
+        return kind, bytes(self._mm[start:start + length])
+
+    def _load_index(self):
+        size = len(self._mm)
+        if size < len(JOURNAL_MAGIC) + _TRAILER.size:
+            return False
+        marker, at = _TRAILER.unpack_from(self._mm, size - _TRAILER.size)
+        if marker != TRAILER_MAGIC or at + _RECORD.size > size:
+            return False
+        kind, length, _, _ = _RECORD.unpack_from(self._mm, at)
+        if kind != REC_INDEX:
+            return False
+        start = at + _RECORD.size
+        n_chunks, n_others = _INDEX_COUNTS.unpack_from(self._mm, start)
+        start += _INDEX_COUNTS.size
+        self.index = np.frombuffer(self._mm, INDEX_DTYPE, n_chunks, start).copy()
+        start += n_chunks * INDEX_DTYPE.itemsize
+        self._others = np.frombuffer(self._mm, "<u8", n_others, start).copy()
+        return True
+
+    def _scan(self):
+        # walk the records up to the last complete one (crash recovery)
+        size = len(self._mm)
+        pos = len(JOURNAL_MAGIC)
+        index, others = [], []
+        while pos + _RECORD.size <= size:
+            kind, length, crc, _ = _RECORD.unpack_from(self._mm, pos)
+            start = pos + _RECORD.size
+            end = start + length
+            if kind not in (REC_META, REC_DATA, REC_EVENT, REC_INDEX) or end > size:
+                break
+            if zlib.crc32(self._mm[start:end]) != crc:
+                break
+            if kind == REC_DATA:
+                h = np.frombuffer(self._mm, CHUNK_DTYPE, 1, start).copy()[0]
+                index.append((start + CHUNK_DTYPE.itemsize,) + tuple(h[name] for name in CHUNK_DTYPE.names))
+            elif kind != REC_INDEX:
+                others.append(pos)
+            pos = end + (-length % 8)
+        self.index = np.array(index, dtype=INDEX_DTYPE)
+        self._others = np.array(others, dtype="<u8")
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def __len__(self):
+        return int(self.index["n"].sum())
+
+    @property
+    def t_range(self):
+        if not self.index.size:
+            return None
+        return float(self.index["t_min"].min()), float(self.index["t_max"].max())
+
+    def chunk(self, i):
+        """
+        (t, values) of chunk `i`. Copied out of the mapping: a view still
+        alive at close() would keep the mapping from being released.
+        """
+        e = self.index[i]
+        rows = np.frombuffer(self._mm, ROW_DTYPE, int(e["n"]), int(e["offset"]))
+        return rows["t"].copy(), rows["value"].copy()
+
+    def select(self, t0=None, t1=None, phase=None, source=None):
+        """
+        Indices of the chunks overlapping [t0, t1] (vectorized over the index).
+        """
+        ix = self.index
+        mask = np.ones(ix.size, dtype=bool)
+        if t0 is not None:
+            mask &= ix["t_max"] >= t0
+        if t1 is not None:
+            mask &= ix["t_min"] <= t1
+        if phase is not None:
+            mask &= ix["phase"] == PHASE_CODES[phase]
+        if source is not None:
+            mask &= ix["source"] == source
+        return np.flatnonzero(mask)
+
+    def window(self, t0=None, t1=None, phase=None, source=None):
+        """
+        Readings in [t0, t1] as (t, phase_codes, values) arrays in time
+        order; only the overlapping chunks are read.
+        """
+        sel = self.select(t0, t1, phase, source)
+        ts, ps, vs = [], [], []
+        for i in sel:
+            # views into the mapping, gone once the selection below copies them
+            e = self.index[i]
+            rows = np.frombuffer(self._mm, ROW_DTYPE, int(e["n"]), int(e["offset"]))
+            t, v = rows["t"], rows["value"]
+            keep = np.ones(t.size, dtype=bool)
+            if t0 is not None:
+                keep &= t >= t0
+            if t1 is not None:
+                keep &= t <= t1
+            ts.append(t[keep])
+            vs.append(v[keep])
+            ps.append(np.full(ts[-1].size, self.index["phase"][i], dtype=np.uint8))
+        if not ts:
+            return np.empty(0), np.empty(0, dtype=np.uint8), np.empty(0)
+        t, p, v = np.concatenate(ts), np.concatenate(ps), np.concatenate(vs)
+        if t.size > 1 and np.any(np.diff(t) < 0):
+            order = np.argsort(t, kind="stable")
+            t, p, v = t[order], p[order], v[order]
+        return t, p, v
+
+    def overview(self, t0=None, t1=None):
+        """
+        Min/max envelope from the chunk headers alone: (x, y) with each
+        chunk's minimum at its start and maximum at its end, for views too
+        wide to read every reading.
+        """
+        ix = self.index[self.select(t0, t1)]
+        ix = ix[ix["valid"] > 0]
+        ix = ix[np.argsort(ix["t_min"], kind="stable")]
+        x = np.column_stack((ix["t_min"], ix["t_max"])).ravel()
+        y = np.column_stack((ix["min"], ix["max"])).ravel()
+        return x, y
+
+    def stats(self, phase, source=None):
+        """
+        RunningStats of a phase over the whole session, merged from the
+        per-chunk statistics.
+        """
+        st = RunningStats()
+        for e in self.index[self.select(phase=phase, source=source)]:
+            st.merge(int(e["valid"]), float(e["mean"]), float(e["m2"]), float(e["sum_sq"]),
+                     float(e["min"]), float(e["max"]))
+        return st
+
+    def close(self):
+        self.index = np.empty(0, dtype=INDEX_DTYPE)
+        # BufferError here means an array still points into the mapping
+        self._mm.close()
+        self._f.close()
+
@@ -0,0 +1,262 @@
+# limits.py
+import math
+import numpy as np
+
+from stats import RunningStats
+
+# unit per phase, for failure messages
+UNITS = {"VOLTAGE": "V", "CURRENT": "A"}
+# keys of a phase's limit spec (sequence files: phases.<PHASE>.limits)
+LIMIT_KEYS = ("low", "high", "nominal", "tolerance", "tolerance_pct", "max_std", "max_excursions")
+
+PASS, FAIL, PENDING = "PASS", "FAIL", "PENDING"
+
+
+def normalize_limits(raw, phase=""):
+    """
+    Validates the limit spec of one phase, as read from a sequence file or
+    built from the control panel. Returns None when it sets no limit.
+
+        low, high       absolute bounds for every reading
+        nominal         expected value; with tolerance (absolute) and/or
+                        tolerance_pct (% of |nominal|) it bounds every
+                        reading to nominal +- tolerance
+        max_std         upper bound on the phase's standard deviation
+        max_excursions  readings allowed outside the bounds (default 0)
+
+    Both bound pairs may be given; readings must then satisfy both.
+    Raises ValueError on anything that cannot be checked.
+    """
+    if not raw:
+        return None
+    unknown = sorted(set(raw) - set(LIMIT_KEYS))
+    if unknown:
+        raise ValueError(f"Unknown limit for {phase}: {', '.join(unknown)}")
+    spec = {}
+    for key in LIMIT_KEYS[:-1]:
+        val = raw.get(key)
+        spec[key] = None if val is None or val == "" else float(val)
+        if spec[key] is not None and math.isnan(spec[key]):
+            raise ValueError(f"Limit {key} for {phase} is not a number")
+    spec["max_excursions"] = int(raw.get("max_excursions") or 0)
+    if spec["nominal"] is None and (spec["tolerance"] is not None or spec["tolerance_pct"] is not None):
+        raise ValueError(f"Tolerance for {phase} needs a nominal value")
+    for key in ("tolerance", "tolerance_pct", "max_std", "max_excursions"):
+        if spec[key] is not None and spec[key] < 0:
+            raise ValueError(f"Limit {key} for {phase} must not be negative")
+    lo, hi = limit_window(spec)
+    if lo > hi:
+        raise ValueError(f"Limits for {phase} leave no valid readings ({lo:g} > {hi:g})")
+    if math.isinf(lo) and math.isinf(hi) and spec["max_std"] is None:
+        return None
+    return spec
+
+
+def limit_window(spec):
+    """
+    (low, high) every reading must fall in: the absolute bounds intersected
+    with nominal +- tolerance; -inf/inf where unbounded.
+    """
+    lo = -math.inf if spec["low"] is None else spec["low"]
+    hi = math.inf if spec["high"] is None else spec["high"]
+    nominal = spec["nominal"]
+    for tol in (spec["tolerance"],
+                None if spec["tolerance_pct"] is None else abs(nominal) * spec["tolerance_pct"] / 100.0):
+        if tol is not None:
+            lo, hi = max(lo, nominal - tol), min(hi, nominal + tol)
+    return lo, hi
+
+
+class PhaseCheck:
+    """
+    Limit state of one phase on one instrument, updated per chunk of
+    readings with whole-array comparisons: readings outside the window
+    (excursions), the first and worst of them, invalid (NaN) readings and
+    running statistics for the standard deviation test.
+    """
+
+    def __init__(self, spec, phase):
+        self.spec = spec
+        self.phase = phase
+        self.lo, self.hi = limit_window(spec)
+        self.bounded = not (math.isinf(self.lo) and math.isinf(self.hi))
+        self.stats = RunningStats()
+        self.invalid = 0
+        self.excursions = 0
+        # (t, value) of the first excursion, value farthest outside the window
+        self.first = None
+        self.worst = None
+        self._worst_by = 0.0
+        self.hard_failed = False
+
+    def update(self, t, vals):
+        """
+        Folds in a chunk; returns True when it causes a hard failure (more
+        excursions than allowed), which no later reading can undo.
+        """
+        valid = ~np.isnan(vals)
+        self.invalid += vals.size - int(np.count_nonzero(valid))
+        self.stats.update_many(vals)
+        if not self.bounded:
+            return False
+        # NaN compares False, so invalid readings never count as excursions
+        by = np.maximum(self.lo - vals, vals - self.hi)
+        out = by > 0
+        k = int(np.count_nonzero(out))
+        if not k:
+            return False
+        if self.first is None:
+            i = int(np.argmax(out))
+            self.first = (float(np.broadcast_to(t, vals.shape)[i]), float(vals[i]))
+        i = int(np.nanargmax(by))
+        if by[i] > self._worst_by:
+            self._worst_by = float(by[i])
+            self.worst = float(vals[i])
+        self.excursions += k
+        if not self.hard_failed and self.excursions > self.spec["max_excursions"]:
+            self.hard_failed = True
+            return True
+        return False
+
+    def _fmt(self, val):
+        # enough digits to tell a reading from a tight tolerance bound
+        return f"{val:.9g} {UNITS.get(self.phase, '')}".rstrip()
+
+    def window_text(self):
+        lo = "-inf" if math.isinf(self.lo) else self._fmt(self.lo)
+        hi = "+inf" if math.isinf(self.hi) else self._fmt(self.hi)
+        return f"[{lo}, {hi}]"
+
+    def failures(self, final=False):
+        """
+        Reasons this phase fails. The standard deviation test and a phase
+        without valid readings only count as final once the run is over.
+        """
+        out = []
+        if self.excursions > self.spec["max_excursions"]:
+            out.append(f"{self.phase}: {self.excursions} reading(s) outside {self.window_text()}, "
+                       f"worst {self._fmt(self.worst)} (allowed {self.spec['max_excursions']})")
+        max_std = self.spec["max_std"]
+        if max_std is not None and self.stats.count >= 2 and self.stats.std > max_std:
+            out.append(f"{self.phase}: std {self._fmt(self.stats.std)} above {self._fmt(max_std)}")
+        if final and self.stats.count == 0:
+            out.append(f"{self.phase}: no valid readings")
+        return out
+
+    def result(self, final=False):
+        st = self.stats
+        failures = self.failures(final)
+        return {
+            "phase": self.phase,
+            "verdict": FAIL if failures else (PASS if final else PENDING),
+            "readings": st.count,
+            "invalid_readings": self.invalid,
+            "excursions": self.excursions,
+            "window": [None if math.isinf(self.lo) else self.lo, None if math.isinf(self.hi) else self.hi],
+            "mean": st.mean if st.count else None,
+            "std": st.std if st.count >= 2 else None,
+            "worst": self.worst,
+            "first_excursion": None if self.first is None else {"t": self.first[0], "value": self.first[1]},
+            "failures": failures,
+        }
+
+
+class LimitTester:
+    """
+    Pass/fail evaluation of per-phase limit specs ({phase: spec}, see
+    normalize_limits) while a run is in progress. ReadingPipeline calls
+    check() for every chunk it drains (`limits` sink attribute), so the
+    verdict is current with the store at all times and never needs a pass
+    over the stored readings.
+
+    Every hard failure (see PhaseCheck.update) is appended to `failures`
+    and reported to `on_fail(source, phase, reason)`; with `stop_on_fail`
+    the owner stops that instrument's sequence there.
+    """
+
+    def __init__(self, specs, stop_on_fail=False, on_fail=None):
+        self.specs = {phase: spec for phase, spec in specs.items() if spec}
+        self.stop_on_fail = stop_on_fail
+        self.on_fail = on_fail
+        self.reset()
+
+    def reset(self):
+        # {(source, phase): PhaseCheck}
+        self.checks = {}
+        self.failures = []
+
+    def check(self, t, phase, vals, source=0):
+        spec = self.specs.get(phase)
+        if spec is None:
+            return
+        c = self.checks.get((source, phase))
+        if c is None:
+            c = self.checks[(source, phase)] = PhaseCheck(spec, phase)
+        if c.update(t, vals):
+            reason = c.failures()[0]
+            self.failures.append((source, phase, reason))
+            if self.on_fail is not None:
+                self.on_fail(source, phase, reason)
+
+    @property
+    def stopped_early(self):
+        return self.stop_on_fail and bool(self.failures)
+
+    def _sources(self, source=None):
+        if source is not None:
+            return [source]
+        return sorted({s for s, _ in list(self.checks)})
+
+    def verdict(self, source=None, final=False):
+        """
+        FAIL as soon as any check fails; otherwise PENDING while the run is
+        in progress and PASS at the end if every limited phase of every
+        instrument (or of `source`) produced valid readings within limits.
+        """
+        checks = [c for (s, _), c in list(self.checks.items()) if source is None or s == source]
+        if any(c.failures(final) for c in checks):
+            return FAIL
+        if not final:
+            return PENDING
+        sources = self._sources(source)
+        if not sources:
+            return FAIL
+        missing = [(s, p) for s in sources for p in self.specs if (s, p) not in self.checks]
+        return FAIL if missing else PASS
+
+    def results(self, names=None, final=False):
+        out = []
+        for s in self._sources():
+            for phase in self.specs:
+                c = self.checks.get((s, phase))
+                if c is None:
+                    r = {"phase": phase, "verdict": FAIL if final else PENDING, "readings": 0,
+                         "failures": [f"{phase}: not measured"] if final else []}
+                else:
+                    r = c.result(final)
+                r["instrument"] = names[s] if names is not None else s
+                out.append(r)
+        return out
+
+    def summary(self, names=None, final=False):
+        return {"verdict": self.verdict(final=final), "stopped_early": self.stopped_early,
+                "specs": self.specs, "results": self.results(names, final)}
+
+    def report(self, names=None, final=True):
+        """
+        Human-readable verdict: one headline plus a line per instrument and
+        phase (instrument names only with more than one instrument).
+        """
+        lines = [f"Limits: {self.verdict(final=final)}"
+                 + (" (stopped on first failure)" if self.stopped_early else "")]
+        results = self.results(names, final)
+        multi = len({r["instrument"] for r in results}) > 1
+        for r in results:
+            prefix = f"{r['instrument']} " if multi else ""
+            detail = "; ".join(r["failures"]) if r["failures"] else f"{r['readings']} readings within limits"
+            if r["failures"]:
+                # reasons already start with the phase
+                lines.append(f"{prefix}{r['verdict']}: {detail}")
+            else:
+                lines.append(f"{prefix}{r['phase']}: {r['verdict']}, {detail}")
+        return lines
@@ -1,5 +1,7 @@
+import sys
 from app import ATEKeithleyApp
 
 if __name__ == "__main__":
-    app = ATEKeithleyApp()
+    # --sim adds a simulated DMM6500 (SIM::DMM6500::INSTR) to the device list
+    app = ATEKeithleyApp(simulate="--sim" in sys.argv[1:])
     app.mainloop()
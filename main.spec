@@ -10,23 +10,31 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # GUI toolkits and packages matplotlib/numpy can pull in but the app never uses;
+    # fewer modules in the archive means less to unpack and scan at launch
+    excludes=[
+        'PyQt5', 'PyQt6', 'PySide2', 'PySide6', 'wx', 'gi',
+        'IPython', 'jupyter_client', 'pandas', 'scipy', 'pytest',
+        'tkinter.test', 'lib2to3', 'pydoc_data',
+    ],
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
+# one-folder build: a one-file exe unpacks the whole bundle to a temp dir on
+# every launch, which dominated startup; binaries now sit next to the exe
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='main',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # UPX-compressed DLLs are decompressed in memory at every load
+    upx=False,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
@@ -37,3 +45,12 @@ exe = EXE(
     entitlements_file=None,
     icon=['keithley3.ico'],
 )
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='main',
+)
@@ -0,0 +1,213 @@
+# pipeline.py
+import time
+import queue
+import threading
+import numpy as np
+
+from stats import RunningStats
+from store import Gap
+
+
+class ReadingPipeline:
+    """
+    Hand-off between the acquisition thread and the consumers.
+
+    The worker only calls `put()` with raw chunks. `drain()` is called on a
+    fixed timer by the consumer (the GUI via app.after, or the headless
+    runner) and folds everything queued so far into the sinks: the
+    measurement store, the running stats, the optional stream recorder,
+    the optional session journal (`journal` attribute, see journal.py) and
+    the optional limit tester (`limits` attribute, see limits.py).
+    `sinks` is any object with `store`, `stats` and `recorder` attributes;
+    an optional `source_stats` dict additionally receives per-instrument
+    stats ({source: {phase: RunningStats}}, created on demand).
+
+    Several acquisition threads (one per instrument) may put() concurrently;
+    every chunk carries the source code of the instrument it came from.
+    mark_gap() queues a gap marker in order with the readings, so it lands
+    in the store between the readings before and after it.
+
+    The queue is bounded: if the consumer falls behind, `put()` blocks
+    (backpressure) instead of growing memory without limit.
+
+    The file sinks (recorder and journal) are written on a writer thread
+    of their own, so their flushes and fsyncs never run on the consumer's
+    (GUI) thread. `in_writer()` queues any other call on a file, such as
+    closing it, behind the writes drained so far; `flush_writes()` waits
+    for all of them.
+
+    If `sinks` has a `diagnostics` registry, drain, recorder write, limit
+    check and backpressure wait times go into its stage histograms.
+    """
+
+    def __init__(self, sinks, maxsize=4096):
+        self.sinks = sinks
+        self.q = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self.diag = getattr(sinks, "diagnostics", None)
+        # (label, fn, args) for the writer thread, started on first use
+        self._writes = queue.Queue(maxsize)
+        self._writer = None
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.max_depth = 0
+        self.backpressure_waits = 0
+        self.readings = 0
+        self.dropped_frames = 0
+        self.recorder_errors = 0
+        self.gaps = 0
+        self.last_error = None
+        # readings per source code, for per-instrument rates
+        self.source_readings = {}
+        self._rate_t0 = time.monotonic()
+        self._rate_n = 0
+        self.rate = 0.0
+
+    # -------------------------
+    # Producer side (acquisition thread)
+    # -------------------------
+    def put(self, t, phase, vals, source=0):
+        item = (t, phase, np.asarray(vals, dtype=np.float64).ravel(), source)
+        try:
+            self.q.put_nowait(item)
+        except queue.Full:
+            self.backpressure_waits += 1
+            t0 = time.perf_counter()
+            self.q.put(item)
+            if self.diag is not None:
+                self.diag.observe("stage_seconds", "backpressure", time.perf_counter() - t0)
+
+    def mark_gap(self, t0, t1, phase, source=0):
+        self.gaps += 1
+        self.q.put(Gap(None, t0, t1, phase, source))
+
+    # -------------------------
+    # Consumer side
+    # -------------------------
+    def drain(self, max_items=None):
+        """
+        Moves queued chunks into the sinks. Returns {phase: last value} for
+        the phases that received readings, for the consumer to display.
+        """
+        t0 = time.perf_counter()
+        with self._lock:
+            depth = self.q.qsize()
+            if depth > self.max_depth:
+                self.max_depth = depth
+            items = []
+            while max_items is None or len(items) < max_items:
+                try:
+                    items.append(self.q.get_nowait())
+                except queue.Empty:
+                    break
+            latest = {}
+            for item in items:
+                if isinstance(item, Gap):
+                    self.sinks.store.add_gap(*item[1:])
+                    journal = getattr(self.sinks, "journal", None)
+                    if journal is not None:
+                        self._write("journal", journal.gap, *item[1:])
+                    continue
+                t, phase, vals, source = item
+                if vals.size == 0:
+                    continue
+                self._sink(t, phase, vals, source)
+                self.source_readings[source] = self.source_readings.get(source, 0) + vals.size
+                # re-insert so the most recent phase comes last
+                latest.pop(phase, None)
+                latest[phase] = vals[-1]
+                self.readings += vals.size
+                self._rate_n += vals.size
+            self._update_rate()
+        if self.diag is not None and items:
+            self.diag.observe("stage_seconds", "drain", time.perf_counter() - t0)
+        return latest
+
+    def _sink(self, t, phase, vals, source=0):
+        s = self.sinks
+        s.store.extend(t, phase, vals, source)
+        targets = [s.stats[phase]]
+        per_source = getattr(s, "source_stats", None)
+        if per_source is not None:
+            phases = per_source.setdefault(source, {})
+            targets.append(phases.setdefault(phase, RunningStats()))
+        for st in targets:
+            if vals.size == 1:
+                st.update(vals[0])
+            else:
+                st.update_many(vals)
+        limits = getattr(s, "limits", None)
+        if limits is not None:
+            if self.diag is None:
+                limits.check(t, phase, vals, source)
+            else:
+                with self.diag.time("stage_seconds", "limits"):
+                    limits.check(t, phase, vals, source)
+        rec = getattr(s, "recorder", None)
+        if rec is not None:
+            self._write("record", rec.write, t, phase, vals, source)
+        journal = getattr(s, "journal", None)
+        if journal is not None:
+            self._write("journal", journal.write, t, phase, vals, source)
+
+    # -------------------------
+    # File writer thread
+    # -------------------------
+    def _write(self, label, fn, *args):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._writer_loop, name="pipeline-writer", daemon=True)
+            self._writer.start()
+        self._writes.put((label, fn, args))
+
+    def in_writer(self, fn, *args):
+        """
+        Runs fn(*args) on the writer thread after every write drained so
+        far; errors count as recorder errors.
+        """
+        self._write(None, fn, *args)
+
+    def flush_writes(self):
+        # blocks until the writer thread has caught up
+        if self._writer is not None:
+            self._writes.join()
+
+    def _writer_loop(self):
+        while True:
+            label, fn, args = self._writes.get()
+            try:
+                if self.diag is None or label is None:
+                    fn(*args)
+                else:
+                    with self.diag.time("stage_seconds", label):
+                        fn(*args)
+            except Exception as e:
+                self.recorder_errors += 1
+                kind = {"record": "Recorder write", "journal": "Journal write"}.get(label, "File writer")
+                self.last_error = f"{kind} error: {e}"
+            finally:
+                self._writes.task_done()
+
+    def _update_rate(self):
+        now = time.monotonic()
+        dt = now - self._rate_t0
+        if dt >= 1.0:
+            self.rate = self._rate_n / dt
+            self._rate_t0 = now
+            self._rate_n = 0
+
+    @property
+    def depth(self):
+        return self.q.qsize()
+
+    def metrics(self):
+        return {
+            "queue_depth": self.depth,
+            "queue_max_depth": self.max_depth,
+            "backpressure_waits": self.backpressure_waits,
+            "dropped_frames": self.dropped_frames,
+            "recorder_errors": self.recorder_errors,
+            "gaps": self.gaps,
+            "readings": self.readings,
+            "readings_per_sec": self.rate,
+        }
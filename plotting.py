@@ -0,0 +1,108 @@
+# plotting.py
+import numpy as np
+
+
+def _bin_minmax(blocks):
+    # NaN-safe argmin/argmax per row; all-NaN rows point at a NaN (plot gap)
+    lo = np.where(np.isnan(blocks), np.inf, blocks).argmin(axis=1)
+    hi = np.where(np.isnan(blocks), -np.inf, blocks).argmax(axis=1)
+    return lo, hi
+
+
+def minmax_indices(y, bins):
+    """
+    Indices of the min and max sample in each of `bins` equal slices of `y`,
+    in sample order. Keeps every spike visible at screen-pixel resolution
+    while bounding the number of points handed to matplotlib.
+    """
+    m = y.size
+    bins = max(int(bins), 1)
+    if m <= 2 * bins:
+        return np.arange(m)
+    per = m // bins
+    k = per * bins
+    lo, hi = _bin_minmax(y[:k].reshape(bins, per))
+    idx = np.sort(np.stack((lo, hi), axis=1), axis=1)
+    idx += (np.arange(bins) * per)[:, None]
+    idx = idx.ravel()
+    if k < m:
+        lo, hi = _bin_minmax(y[k:].reshape(1, -1))
+        idx = np.concatenate((idx, np.sort([lo[0], hi[0]]) + k))
+    return idx
+
+
+class MinMaxEnvelope:
+    """
+    Incremental min/max pyramid for the "All" live view. Each update only
+    folds in readings added since the last call; when the envelope exceeds
+    2x the target resolution adjacent blocks are merged and the block size
+    doubles, so per-frame cost stays bounded however long the run is.
+    """
+
+    def __init__(self, target_bins=2000):
+        self.target_bins = target_bins
+        self.reset()
+
+    def reset(self, base=0):
+        self.base = base
+        self.done = 0
+        self.block = 1
+        self.i_lo = np.empty(0, dtype=np.int64)
+        self.i_hi = np.empty(0, dtype=np.int64)
+        self.v_lo = np.empty(0)
+        self.v_hi = np.empty(0)
+
+    def update(self, vals, offset):
+        """
+        `vals` is the store's full value view, `offset` its row offset.
+        """
+        if offset != self.base or vals.size < self.done:
+            # store was cleared or rolled: rebuild from what is in memory
+            self.reset(offset)
+        new = vals[self.done:]
+        full = (new.size // self.block) * self.block
+        if full:
+            blocks = new[:full].reshape(-1, self.block)
+            lo, hi = _bin_minmax(blocks)
+            rows = np.arange(blocks.shape[0])
+            start = self.base + self.done + rows * self.block
+            self.i_lo = np.concatenate((self.i_lo, start + lo))
+            self.i_hi = np.concatenate((self.i_hi, start + hi))
+            self.v_lo = np.concatenate((self.v_lo, blocks[rows, lo]))
+            self.v_hi = np.concatenate((self.v_hi, blocks[rows, hi]))
+            self.done += full
+        while self.i_lo.size > 2 * self.target_bins:
+            self._merge_pairs()
+
+    def _merge_pairs(self):
+        n = self.i_lo.size // 2 * 2
+        a, b = slice(0, n, 2), slice(1, n, 2)
+        take_b = np.fmin(self.v_lo[a], self.v_lo[b]) == self.v_lo[b]
+        i_lo = np.where(take_b, self.i_lo[b], self.i_lo[a])
+        v_lo = np.where(take_b, self.v_lo[b], self.v_lo[a])
+        take_b = np.fmax(self.v_hi[a], self.v_hi[b]) == self.v_hi[b]
+        i_hi = np.where(take_b, self.i_hi[b], self.i_hi[a])
+        v_hi = np.where(take_b, self.v_hi[b], self.v_hi[a])
+        # an odd trailing block is kept as is
+        self.i_lo = np.concatenate((i_lo, self.i_lo[n:]))
+        self.i_hi = np.concatenate((i_hi, self.i_hi[n:]))
+        self.v_lo = np.concatenate((v_lo, self.v_lo[n:]))
+        self.v_hi = np.concatenate((v_hi, self.v_hi[n:]))
+        self.block *= 2
+
+    def data(self, vals):
+        """
+        Returns (x, y) for the envelope plus the not-yet-blocked tail.
+        """
+        swap = self.i_lo > self.i_hi
+        first_i = np.where(swap, self.i_hi, self.i_lo)
+        last_i = np.where(swap, self.i_lo, self.i_hi)
+        first_v = np.where(swap, self.v_hi, self.v_lo)
+        last_v = np.where(swap, self.v_lo, self.v_hi)
+        tail = vals[self.done:]
+        x = np.concatenate((
+            np.stack((first_i, last_i), axis=1).ravel(),
+            self.base + self.done + np.arange(tail.size),
+        ))
+        y = np.concatenate((np.stack((first_v, last_v), axis=1).ravel(), tail))
+        return x, y
@@ -0,0 +1,60 @@
+# profiles.py
+import math
+
+from helpers import parse_float_safe
+
+# Speed/accuracy presets per phase. "Custom" keeps whatever was typed in.
+SPEED_PROFILES = {
+    "Fast":    {"nplc": 0.01, "autozero": False, "filter_count": 0},
+    "Normal":  {"nplc": 1.0,  "autozero": True,  "filter_count": 0},
+    "Precise": {"nplc": 10.0, "autozero": True,  "filter_count": 0},
+}
+CUSTOM_PROFILE = "Custom"
+PROFILE_NAMES = tuple(SPEED_PROFILES) + (CUSTOM_PROFILE,)
+DEFAULT_PROFILE = "Normal"
+
+NPLC_MIN, NPLC_MAX = 0.0005, 12.0
+LINE_FREQ = 60.0          # Hz; aperture = NPLC / line frequency
+READ_OVERHEAD = 50e-6     # s per reading outside the integration window
+
+
+def clamp_profile(nplc, autozero, filter_count):
+    """
+    Normalizes user input into the instrument's limits. Returns a dict
+    with the keyword names configure_measure() takes.
+    """
+    nplc = parse_float_safe(str(nplc))
+    if math.isnan(nplc):
+        nplc = SPEED_PROFILES[DEFAULT_PROFILE]["nplc"]
+    try:
+        filter_count = int(filter_count)
+    except (TypeError, ValueError):
+        filter_count = 0
+    return {
+        "nplc": min(max(nplc, NPLC_MIN), NPLC_MAX),
+        "autozero": bool(autozero),
+        "filter_count": min(max(filter_count, 0), 100),
+    }
+
+
+def estimate_rate(nplc, autozero=True, filter_count=0, line_freq=LINE_FREQ):
+    """
+    Rough upper bound on readings/s for a profile: the integration time,
+    doubled when autozero takes its reference measurement, plus a fixed
+    per-reading overhead, times the repeat-filter count. Ignores autorange
+    and bus latency, so treat it as a ceiling, not a promise.
+    """
+    t = nplc / line_freq
+    if autozero:
+        t *= 2
+    t += READ_OVERHEAD
+    if filter_count > 1:
+        t *= filter_count
+    return 1.0 / t
+
+
+def describe_profile(nplc, autozero=True, filter_count=0, line_freq=LINE_FREQ):
+    rate = estimate_rate(nplc, autozero, filter_count, line_freq)
+    aperture = nplc / line_freq * 1e3
+    rate_txt = f"{rate / 1e3:.1f}k" if rate >= 1000 else f"{rate:.1f}"
+    return f"≈ {rate_txt} rdg/s, aperture {aperture:.3g} ms"
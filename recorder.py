@@ -0,0 +1,160 @@
+# recorder.py
+import os
+import json
+import time
+import threading
+import numpy as np
+
+from store import PHASE_CODES, CSV_HEADER, CSV_HEADER_SOURCES, csv_lines, csv_comments
+
+# Compact binary recording: magic header followed by packed 17-byte rows
+BIN_MAGIC = b"DMMREC1\n"
+BIN_DTYPE = np.dtype([("t", "<f8"), ("phase", "u1"), ("value", "<f8")])
+# Multi-instrument variant: a fixed-size JSON header naming the sources
+# (rewritten on close) and 18-byte rows carrying the source code
+BIN_MAGIC_SOURCES = b"DMMREC2\n"
+BIN_SOURCES_HEADER = 4096
+BIN_DTYPE_SOURCES = np.dtype([("t", "<f8"), ("phase", "u1"), ("source", "u1"), ("value", "<f8")])
+
+RECORD_FORMATS = ("CSV", "Binary")
+
+
+class StreamRecorder:
+    """
+    Appends readings to disk while a sequence runs. Rows are batched in
+    memory and flushed every `batch` rows or `flush_interval` seconds;
+    the file is fsync'ed every `fsync_interval` seconds so at most a few
+    seconds of data are lost on a crash or power failure.
+
+    With `sources` (the store's list of instrument names, shared by
+    reference so later additions are picked up) rows carry the instrument
+    they came from.
+    """
+
+    def __init__(self, path, fmt="CSV", batch=5000, flush_interval=1.0, fsync_interval=5.0,
+                 sources=None):
+        if fmt not in RECORD_FORMATS:
+            raise ValueError(f"Unknown record format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.rows_written = 0
+        self.sources = sources
+        self._dtype = BIN_DTYPE if sources is None else BIN_DTYPE_SOURCES
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_rows = 0
+        self._last_flush = self._last_fsync = time.monotonic()
+
+        if fmt == "CSV":
+            self._f = open(path, "w", newline="")
+            self._f.write(CSV_HEADER if sources is None else CSV_HEADER_SOURCES)
+        elif sources is None:
+            self._f = open(path, "wb")
+            self._f.write(BIN_MAGIC)
+        else:
+            self._f = open(path, "wb")
+            self._f.write(BIN_MAGIC_SOURCES)
+            self._write_sources_header()
+
+    def _write_sources_header(self):
+        head = json.dumps({"sources": list(self.sources)}).encode()
+        if len(head) > BIN_SOURCES_HEADER:
+            raise ValueError("Too many instrument names for the recording header")
+        self._f.write(head.ljust(BIN_SOURCES_HEADER))
+
+    def write(self, t, phase, vals, source=0):
+        vals = np.asarray(vals, dtype=np.float64).ravel()
+        if vals.size == 0:
+            return
+        rows = np.empty(vals.size, dtype=self._dtype)
+        rows["t"] = t
+        rows["phase"] = PHASE_CODES[phase]
+        if self.sources is not None:
+            rows["source"] = source
+        rows["value"] = vals
+        with self._lock:
+            if self._f is None:
+                return
+            self._pending.append(rows)
+            self._pending_rows += rows.size
+            now = time.monotonic()
+            if self._pending_rows >= self.batch or now - self._last_flush >= self.flush_interval:
+                self._flush(now)
+
+    def _flush(self, now):
+        if self._pending:
+            rows = np.concatenate(self._pending)
+            if self.fmt == "CSV" and self.sources is not None:
+                self._f.writelines(csv_lines(rows["t"], rows["phase"], rows["value"],
+                                             rows["source"], self.sources))
+            elif self.fmt == "CSV":
+                self._f.writelines(csv_lines(rows["t"], rows["phase"], rows["value"]))
+            else:
+                self._f.write(rows.tobytes())
+            self.rows_written += rows.size
+            self._pending = []
+            self._pending_rows = 0
+        self._f.flush()
+        self._last_flush = now
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._f.fileno())
+            self._last_fsync = now
+
+    def close(self, footer=()):
+        """
+        Flushes and closes the file. CSV recordings end with `footer` as
+        comment rows (the limit verdict); binary ones have no room for it.
+        """
+        with self._lock:
+            if self._f is None:
+                return
+            now = time.monotonic()
+            self._last_fsync = now - self.fsync_interval
+            if self.fmt == "CSV" and footer:
+                self._flush(now)
+                self._f.writelines(csv_comments(footer))
+            self._flush(now)
+            if self.fmt != "CSV" and self.sources is not None:
+                # instruments added while recording
+                self._f.seek(len(BIN_MAGIC_SOURCES))
+                self._write_sources_header()
+            self._f.close()
+            self._f = None
+
+
+def recording_sources(path):
+    """
+    Instrument names of a multi-instrument binary recording (index =
+    source code), or None for a single-instrument one.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(BIN_MAGIC))
+        if magic == BIN_MAGIC:
+            return None
+        if magic != BIN_MAGIC_SOURCES:
+            raise ValueError(f"Not a DMM recording: {path}")
+        return json.loads(f.read(BIN_SOURCES_HEADER))["sources"]
+
+
+def read_binary_recording(path):
+    """
+    Memory-maps a binary recording; returns a structured array with
+    fields t, phase and value (plus source for multi-instrument files,
+    see recording_sources).
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(BIN_MAGIC))
+    if magic == BIN_MAGIC:
+        dtype, offset = BIN_DTYPE, len(BIN_MAGIC)
+    elif magic == BIN_MAGIC_SOURCES:
+        dtype, offset = BIN_DTYPE_SOURCES, len(BIN_MAGIC_SOURCES) + BIN_SOURCES_HEADER
+    else:
+        raise ValueError(f"Not a DMM recording: {path}")
+    n = (os.path.getsize(path) - offset) // dtype.itemsize
+    if n == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(n,))
@@ -0,0 +1,94 @@
+# scheduler.py
+import time
+
+from stats import RunningStats
+
+SCHEDULE_POLICIES = ("Skip", "Catch up")
+
+
+class DeadlineScheduler:
+    """
+    Fixed-rate sample scheduler for one phase on the monotonic clock.
+
+    Sample k is due at t0 + k * interval, independent of how long each
+    query took, so the period does not drift. When a sample runs more than
+    one interval late, "Skip" drops the missed slots and realigns to the
+    grid, "Catch up" runs the missed slots back to back.
+
+    Waiting is done on events: `stop_event` cancels immediately and
+    `resume_event` (set while not paused) blocks without polling. Time
+    spent paused is added to the schedule so the phase keeps its length.
+    """
+
+    def __init__(self, interval, duration, stop_event, resume_event, policy="Skip"):
+        self.interval = max(float(interval), 0.0)
+        self.duration = float(duration)
+        self.stop_event = stop_event
+        self.resume_event = resume_event
+        self.policy = policy
+        self.k = 0
+        self.skipped = 0
+        self.lateness = RunningStats()
+        self.t0 = None
+        self.end = None
+
+    def _wait_resume(self):
+        if self.resume_event.is_set():
+            return not self.stop_event.is_set()
+        p0 = time.monotonic()
+        self.resume_event.wait()
+        if self.stop_event.is_set():
+            return False
+        paused = time.monotonic() - p0
+        self.t0 += paused
+        self.end += paused
+        return True
+
+    def wait(self):
+        """
+        Blocks until the next sample slot. Returns False when the phase is
+        over or the sequence was stopped.
+        """
+        if self.t0 is None:
+            self.t0 = time.monotonic()
+            self.end = self.t0 + self.duration
+        while True:
+            if not self._wait_resume():
+                return False
+            deadline = self.t0 + self.k * self.interval
+            if deadline >= self.end or time.monotonic() >= self.end:
+                return False
+            delay = deadline - time.monotonic()
+            if delay > 0 and self.stop_event.wait(delay):
+                return False
+            if self.resume_event.is_set():
+                break
+            # paused while waiting for the slot: re-plan after resume
+
+        lateness = time.monotonic() - deadline
+        self.lateness.update(lateness)
+        self.k += 1
+        if self.policy == "Skip" and self.interval > 0 and lateness > self.interval:
+            missed = int(lateness // self.interval)
+            self.k += missed
+            self.skipped += missed
+        return True
+
+    def hold(self, seconds):
+        """
+        Shifts the rest of the schedule by `seconds` (time lost outside the
+        phase, e.g. reconnecting), like a pause, so the phase keeps its length.
+        """
+        if self.t0 is not None:
+            self.t0 += seconds
+            self.end += seconds
+
+    def summary(self):
+        st = self.lateness
+        return {
+            "samples": st.count,
+            "skipped": self.skipped,
+            "lateness_mean_ms": st.mean * 1e3 if st.count else float("nan"),
+            "lateness_max_ms": st.max * 1e3 if st.count else float("nan"),
+            "jitter_ms": st.std * 1e3,
+        }
@@ -0,0 +1,557 @@
+# sequence.py
+import json
+import math
+import time
+import numpy as np
+
+from constants import (
+    LUA_MEAS_COUNT, LUA_BUFFER_MAKE, LUA_BUFFER_DELETE, LUA_BUFFER_CLEAR,
+    LUA_MEAS_READ_BUF, DEFAULT_BUFFERS, DEFAULT_BUFFER_CAPACITY, TRANSFER_FORMATS,
+)
+from helpers import parse_range, phase_order
+from limits import normalize_limits
+from profiles import SPEED_PROFILES, DEFAULT_PROFILE, clamp_profile, estimate_rate
+from scheduler import DeadlineScheduler, SCHEDULE_POLICIES
+from store import PHASES
+from tsp_script import compile_sequence, parse_data_line, SCRIPT_NAME, EMIT_PERIOD
+
+ORDERS = ("V->I", "I->V", "Alternating", "V only", "I only", "Digitize V", "Digitize I")
+
+SEQUENCE_DEFAULTS = {
+    "order": "V->I",
+    "cycles": 1,            # 0 = run until stopped
+    "buffered": False,
+    "burst": 100,
+    "buffer": "defbuffer1",
+    "transfer": "ASCII",
+    "on_instrument": False,
+    "timestamps": True,
+    "policy": SCHEDULE_POLICIES[0],
+    # stop an instrument's sequence at its first hard limit failure
+    "stop_on_fail": False,
+    # range None: use the digitized phase's range (digitize has no autorange)
+    "digitize": {"rate": 1000000, "count": 100000, "range": None},
+}
+
+# buffer room for the readings an on-instrument script takes between emits
+SCRIPT_BUFFER_MARGIN = 2.0
+
+# VISA timeout for a burst query: margin x estimated acquisition time + slack (ms)
+BURST_TIMEOUT_MARGIN = 2.0
+BURST_TIMEOUT_SLACK_MS = 5000
+
+PHASE_DEFAULTS = {"duration": 5.0, "interval": 0.5, "range": "Auto", "limits": None}
+
+
+def normalize_sequence(raw):
+    """
+    Fills in defaults and validates a sequence settings dict, as read from
+    a sequence file or built from the control panel widgets. Phases may
+    name a speed profile ("profile": "Fast") and override single values,
+    and carry pass/fail limits ("limits": {...}, see limits.py).
+    Raises ValueError on anything the runner cannot execute.
+    """
+    s = dict(SEQUENCE_DEFAULTS)
+    s.update({k: v for k, v in raw.items() if k not in ("phases", "digitize")})
+    s["digitize"] = dict(SEQUENCE_DEFAULTS["digitize"], **raw.get("digitize", {}))
+    d = s["digitize"]
+    d["rate"], d["count"] = float(d["rate"]), int(d["count"])
+    if isinstance(d["range"], str):
+        d["range"] = None if d["range"].lower() == "auto" else float(d["range"])
+    if s["order"] not in ORDERS:
+        raise ValueError(f"Unknown order: {s['order']} (expected one of {', '.join(ORDERS)})")
+    if str(s["transfer"]).upper() not in TRANSFER_FORMATS:
+        raise ValueError(f"Unknown transfer format: {s['transfer']}")
+    if s["policy"] not in SCHEDULE_POLICIES:
+        raise ValueError(f"Unknown late-sample policy: {s['policy']}")
+    s["transfer"] = str(s["transfer"]).upper()
+    s["cycles"] = int(s["cycles"])
+    s["burst"] = max(1, int(s["burst"]))
+    s["buffer"] = str(s["buffer"]).strip() or "defbuffer1"
+    if s["buffered"] and s["buffer"] in DEFAULT_BUFFERS and burst_readings(s) > DEFAULT_BUFFER_CAPACITY:
+        raise ValueError(f"Burst of {burst_readings(s)} readings exceeds {s['buffer']} "
+                         f"({DEFAULT_BUFFER_CAPACITY} readings)")
+    s["stop_on_fail"] = bool(s["stop_on_fail"])
+
+    phases = {}
+    for phase in PHASES:
+        p = dict(PHASE_DEFAULTS)
+        given = dict(raw.get("phases", {}).get(phase, {}))
+        profile = given.pop("profile", DEFAULT_PROFILE)
+        if profile not in SPEED_PROFILES:
+            raise ValueError(f"Unknown speed profile for {phase}: {profile}")
+        p.update(SPEED_PROFILES[profile])
+        p.update(given)
+        rng = p["range"]
+        p["range"] = parse_range(rng, phase) if isinstance(rng, str) else float(rng)
+        p["duration"] = float(p["duration"])
+        p["interval"] = max(float(p["interval"]), 0.0)
+        p.update(clamp_profile(p["nplc"], p["autozero"], p["filter_count"]))
+        p["limits"] = normalize_limits(p["limits"], phase)
+        phases[phase] = p
+    s["phases"] = phases
+    return s
+
+
+def burst_readings(settings):
+    """
+    Readings one buffered query leaves in the buffer: a V/I pair per burst
+    count in Alternating order, else the burst count.
+    """
+    burst = settings["burst"]
+    return 2 * burst if settings["order"] == "Alternating" else burst
+
+
+def sequence_phases(settings):
+    """
+    Phases that produce readings for a sequence, in measurement order.
+    """
+    order = settings["order"]
+    if order.startswith("Digitize"):
+        return ["VOLTAGE" if order == "Digitize V" else "CURRENT"]
+    if order == "Alternating":
+        return list(PHASES)
+    return phase_order(order)
+
+
+def limit_specs(settings):
+    """
+    {phase: limit spec} for the phases a sequence measures that have limits.
+    """
+    phases = settings["phases"]
+    return {phase: phases[phase]["limits"] for phase in sequence_phases(settings)
+            if phases[phase].get("limits")}
+
+
+def load_sequence(path):
+    with open(path) as f:
+        return normalize_sequence(json.load(f))
+
+
+class SequenceRunner:
+    """
+    GUI-free sequence engine: runs one normalized sequence (see
+    normalize_sequence) on a connected InstrumentManager and hands every
+    chunk of readings to `pipeline.put()`. The caller owns the consumer
+    side (GUI timer or headless drain loop) and the stop/resume events.
+
+    `log(msg, level)` receives progress messages. Digitize captures go
+    to `on_waveform(phase, vals, rate)` if given, otherwise into the
+    pipeline with sample-clock timestamps. Per-phase scheduler summaries
+    end up in `schedule_stats` (pass a dict to have them written somewhere
+    shared). `source` tags every reading with the instrument's store
+    source code, so several runners can share one pipeline.
+
+    Reads go through the instrument manager's health tracking. When the
+    link is lost mid-phase the runner reconnects (with backoff), re-arms
+    the phase, marks the gap in the pipeline and resumes the same phase
+    with its remaining duration.
+    """
+
+    def __init__(self, instrument, pipeline, settings, stop_event, resume_event,
+                 log=None, on_waveform=None, schedule_stats=None, source=0):
+        self.inst = instrument
+        self.pipeline = pipeline
+        self.settings = settings
+        self.stop_event = stop_event
+        self.resume_event = resume_event
+        self.log = log or (lambda msg, level="info": None)
+        self.on_waveform = on_waveform
+        self.schedule_stats = {} if schedule_stats is None else schedule_stats
+        self.source = source
+        self.timestamps = False
+
+    @property
+    def dmm(self):
+        return self.inst.dmm
+
+    def run(self):
+        """
+        Runs the whole sequence. Returns True if it completed, False if it
+        was stopped or could not run.
+        """
+        s = self.settings
+        order = s["order"]
+        cycles = s["cycles"] if s["cycles"] > 0 else float("inf")
+        buffered, burst, buf = s["buffered"], s["burst"], s["buffer"]
+        # every mode reads into `buf` (timestamps and the clock offset too)
+        self._prepare_buffer(buf, burst_readings(s) if buffered else 10)
+        timestamps = self.timestamps = self._setup_timestamps(buf)
+
+        if s["on_instrument"] and not order.startswith("Digitize"):
+            self._prepare_buffer(buf, self._script_buffer_capacity())
+            finished = self._run_on_instrument(buf, timestamps)
+            self._release_buffer(buf, True)
+            return finished
+
+        if order == "Alternating":
+            try:
+                self.inst.create_configlists(s)
+            except Exception as e:
+                self.log(f"Config list setup error: {e}", "err")
+                self._release_buffer(buf, buffered)
+                return False
+
+        c = 0
+        while c < cycles:
+            c += 1
+            if order == "Alternating":
+                if not self._alternating_phase(buf, burst if buffered else 1, timestamps):
+                    self._release_buffer(buf, buffered)
+                    return False
+                continue
+            if order.startswith("Digitize"):
+                if self.stop_event.is_set():
+                    self._release_buffer(buf, buffered)
+                    return False
+                self._digitize_phase("VOLTAGE" if order == "Digitize V" else "CURRENT")
+                continue
+            for phase in phase_order(order):
+                if self.stop_event.is_set():
+                    self._release_buffer(buf, buffered)
+                    return False
+                p = s["phases"][phase]
+
+                # configure through the instrument manager's cache: only changed settings are written
+                try:
+                    self.inst.configure_measure(phase, p["range"], p["nplc"], p["autozero"],
+                                                p["filter_count"])
+                except Exception as e:
+                    # log but continue; reading may still be possible
+                    self.log(f"Range/config write error: {e}", "warn")
+
+                if buffered:
+                    if not self._buffered_phase(phase, p["duration"], burst, buf, timestamps):
+                        self._release_buffer(buf, buffered)
+                        return False
+                    continue
+                if not self._interval_phase(phase, p["duration"], p["interval"], buf, timestamps):
+                    self._release_buffer(buf, buffered)
+                    return False
+
+        # finished cycles
+        self._release_buffer(buf, buffered)
+        return True
+
+    # -------------------------
+    # Phases
+    # -------------------------
+    def _interval_phase(self, phase, duration, interval, buf, timestamps):
+        # measurement loop for this phase, on a fixed-rate deadline grid
+        sched = DeadlineScheduler(interval, duration, self.stop_event,
+                                  self.resume_event, self.settings["policy"])
+        inst = self.inst
+        inst.health.reset_latency()
+        while sched.wait():
+            t = None
+            try:
+                if timestamps:
+                    t, val = inst.io(inst.read_single, buf)
+                    t = inst.to_host_time(t)
+                else:
+                    val = float(inst.io(lambda: self.dmm.query("print(dmm.measure.read())")))
+            except Exception:
+                val = float("nan")
+            self._record_readings(phase, [val], t)
+            if not self._recover(phase, sched):
+                break
+
+        if self.stop_event.is_set():
+            return False
+        self._log_schedule(phase, sched)
+        return True
+
+    def _run_on_instrument(self, buf, timestamps):
+        """
+        Compiles the sequence to a TSP script, loads it once and runs it on
+        the instrument; the host only parses the streamed buffer contents.
+        Returns True if the script ran to completion.
+        """
+        inst = self.inst
+        script = compile_sequence(self.settings, buf, timestamps)
+        try:
+            inst.load_script(SCRIPT_NAME, script)
+            inst.run_script(SCRIPT_NAME)
+        except Exception as e:
+            self.log(f"Script load/run error: {e}", "err")
+            return False
+        self.log(f"Sequence running on instrument ({len(script.splitlines())} TSP lines)")
+
+        phase = None
+        while not self.stop_event.is_set():
+            try:
+                line = inst.read_line()
+            except Exception as e:
+                self.log(f"Script read error: {e}", "err")
+                inst.abort_script()
+                return False
+            if line is None:
+                continue
+            if line == "END":
+                inst.invalidate_config()
+                inst.apply_transfer_format()
+                return True
+            if line.startswith("D,"):
+                code = line[2:]
+                # "A" marks interleaved V,I pairs from the alternating loop
+                phase = code if code == "A" else PHASES[int(code)]
+                continue
+            if phase is None:
+                self.log(f"Unexpected script output: {line[:80]}", "warn")
+                continue
+            t, vals = parse_data_line(line, timestamps)
+            if t is not None:
+                t = inst.to_host_time(t)
+            if phase == "A":
+                n = vals.size // 2 * 2
+                tv = ti = None
+                if t is not None:
+                    tv, ti = t[0:n:2], t[1:n:2]
+                self._record_readings("VOLTAGE", vals[0:n:2], tv)
+                self._record_readings("CURRENT", vals[1:n:2], ti)
+            else:
+                self._record_readings(phase, vals, t)
+            phase = None
+        inst.abort_script()
+        return False
+
+    def _alternating_phase(self, buf, pairs, timestamps):
+        """
+        Near-simultaneous V/I sampling: each tick recalls the stored voltage
+        and current configuration lists around two readings in a single
+        query (`pairs` back-to-back pairs per query in buffered mode). Uses
+        the voltage phase's duration and interval. Returns False if stopped.
+        """
+        s = self.settings["phases"]["VOLTAGE"]
+        interval = s["interval"] if pairs == 1 else 0
+        inst = self.inst
+        sched = DeadlineScheduler(interval, s["duration"], self.stop_event,
+                                  self.resume_event, self.settings["policy"])
+        inst.health.reset_latency()
+
+        def rearm():
+            self._prepare_buffer(buf, pairs * 2)
+            inst.create_configlists(self.settings)
+
+        inst.set_min_timeout(self._burst_timeout_ms({"VOLTAGE": pairs, "CURRENT": pairs}))
+        try:
+            while sched.wait():
+                try:
+                    t_v, volts, t_i, amps = inst.io(inst.read_pairs, buf, pairs, timestamps)
+                except Exception as e:
+                    self.log(f"Alternating read error: {e}", "warn")
+                    if not self._recover("VOLTAGE", sched, rearm):
+                        break
+                    continue
+                if timestamps:
+                    t_v, t_i = inst.to_host_time(t_v), inst.to_host_time(t_i)
+                self._record_readings("VOLTAGE", volts, t_v)
+                self._record_readings("CURRENT", amps, t_i)
+        finally:
+            inst.set_min_timeout(0)
+        if self.stop_event.is_set():
+            return False
+        self._log_schedule("VOLTAGE", sched)
+        return True
+
+    def _buffered_phase(self, phase, duration, burst, buf, timestamps=False):
+        """
+        Runs one phase in burst mode: the instrument fills `buf` with `burst`
+        readings per trigger and the host pulls each burst back with a single
+        printbuffer query. Returns False if the sequence was stopped.
+        """
+        inst = self.inst
+        try:
+            self.dmm.write(LUA_MEAS_COUNT.format(count=burst))
+        except Exception as e:
+            self.log(f"Buffer config error: {e}", "warn")
+
+        def rearm():
+            self._prepare_buffer(buf, burst)
+            self.dmm.write(LUA_MEAS_COUNT.format(count=burst))
+
+        # back-to-back bursts; the scheduler only bounds the phase and handles stop/pause
+        sched = DeadlineScheduler(0, duration, self.stop_event, self.resume_event)
+        inst.health.reset_latency()
+        # the printbuffer query only answers once the whole burst is measured
+        inst.set_min_timeout(self._burst_timeout_ms({phase: burst}))
+        try:
+            while sched.wait():
+                t = None
+                try:
+                    t, vals = inst.io(self._read_burst, buf, timestamps)
+                except Exception as e:
+                    self.log(f"Buffer read error: {e}", "warn")
+                    vals = [float("nan")]
+                if len(vals):
+                    self._record_readings(phase, vals, t)
+                if not self._recover(phase, sched, rearm):
+                    break
+        finally:
+            inst.set_min_timeout(0)
+        return not self.stop_event.is_set()
+
+    def _script_buffer_capacity(self):
+        """
+        Readings an on-instrument script leaves in its buffer between two
+        emits (tsp_script.EMIT_PERIOD) at the fastest phase's estimated
+        rate, or its interval if that is slower, with margin.
+        """
+        s = self.settings
+        phases = s["phases"]
+
+        def period(phase):
+            p = phases[phase]
+            return 1.0 / estimate_rate(p["nplc"], p["autozero"], p["filter_count"])
+
+        if s["order"] == "Alternating":
+            # a V/I pair per tick, paced by the voltage phase's interval
+            pair = max(period("VOLTAGE") + period("CURRENT"), phases["VOLTAGE"]["interval"])
+            rate = 2 / pair
+        else:
+            rate = max(1.0 / max(period(ph), phases[ph]["interval"]) for ph in phase_order(s["order"]))
+        return int(math.ceil(rate * EMIT_PERIOD * SCRIPT_BUFFER_MARGIN)) + 2
+
+    def _burst_timeout_ms(self, readings):
+        """
+        VISA timeout floor for one query that waits for `readings`
+        ({phase: count}) to be measured with the phases' speed profiles.
+        """
+        phases = self.settings["phases"]
+        acq_s = sum(n / estimate_rate(phases[phase]["nplc"], phases[phase]["autozero"],
+                                      phases[phase]["filter_count"])
+                    for phase, n in readings.items())
+        return int(acq_s * BURST_TIMEOUT_MARGIN * 1000) + BURST_TIMEOUT_SLACK_MS
+
+    def _read_burst(self, buf, timestamps):
+        # one triggered burst into `buf`, pulled back in a single printbuffer query
+        inst, dmm = self.inst, self.dmm
+        dmm.write(LUA_BUFFER_CLEAR.format(buf=buf))
+        dmm.write(LUA_MEAS_READ_BUF.format(buf=buf))
+        if timestamps:
+            t, vals = inst.read_buffer(buf, timestamps=True)
+            return inst.to_host_time(t), vals
+        # ASCII or REAL32/REAL64 depending on instrument.transfer_format
+        return None, inst.read_buffer(buf)
+
+    def _digitize_phase(self, phase):
+        """
+        One high-speed capture with dmm.digitize; the waveform goes to
+        `on_waveform` if set, else into the store like any other readings.
+        """
+        d = self.settings["digitize"]
+        rate, count = d["rate"], d["count"]
+        rng_val = d["range"]
+        if rng_val is None:
+            rng_val = self.settings["phases"][phase]["range"]
+        buf = self.settings["buffer"]
+
+        # resized to hold the capture; run() deletes it when the sequence ends
+        self._prepare_buffer(buf, count)
+        try:
+            self.log(f"Digitizing {phase.lower()}: {count} samples @ {rate:g} S/s")
+            t0 = time.time()
+            vals = self.inst.digitize_capture(phase, rate, count, rng_val, buf)
+            self.log(f"Capture transferred: {len(vals)} samples in {time.time() - t0:.2f} s")
+        except Exception as e:
+            self.log(f"Digitize error: {e}", "err")
+            return
+
+        if self.on_waveform is not None:
+            self.on_waveform(phase, vals, rate)
+        else:
+            # sample-clock timestamps ending at the transfer
+            n = len(vals)
+            self._record_readings(phase, vals, time.time() - (n - np.arange(n)) / rate)
+
+    # -------------------------
+    # Helpers
+    # -------------------------
+    def _setup_timestamps(self, buf):
+        """
+        Switches the instrument manager to timestamped transfers and
+        estimates the host/instrument clock offset. Returns True if readings
+        should carry instrument timestamps.
+        """
+        inst = self.inst
+        want = self.settings["timestamps"]
+        try:
+            inst.set_timestamps(want)
+            if not want:
+                return False
+            offset, unc = inst.estimate_clock_offset(buf)
+            self.log(f"Instrument clock offset {offset * 1e3:+.1f} ms (±{unc * 1e3:.1f} ms)")
+            return True
+        except Exception as e:
+            self.log(f"Timestamp setup failed, using host time: {e}", "warn")
+            try:
+                inst.set_timestamps(False)
+            except Exception:
+                pass
+            return False
+
+    def _recover(self, phase, sched, rearm=None):
+        """
+        Called after each read. Returns True at once while the link is not
+        considered lost (a single failure stays one NaN reading). Otherwise
+        reconnects, re-arms the phase (`rearm()`, clock offset), marks the
+        gap and holds `sched` for the time spent, so the phase resumes
+        with its remaining duration. Returns False if stopped meanwhile.
+        """
+        inst = self.inst
+        health = inst.health
+        if not health.failed:
+            return True
+        t_lost = health.failing_since
+        self.log(f"Connection lost during {phase} ({health.last_error}), reconnecting", "err")
+        m0 = time.monotonic()
+        if not inst.reconnect(self.stop_event):
+            return False
+        try:
+            if rearm is not None:
+                rearm()
+            if self.timestamps:
+                inst.estimate_clock_offset(self.settings["buffer"])
+        except Exception as e:
+            self.log(f"Phase re-arm error after reconnect: {e}", "warn")
+        t_back = time.time()
+        self.pipeline.mark_gap(t_lost, t_back, phase, self.source)
+        sched.hold(time.monotonic() - m0)
+        self.log(f"{phase} resumed after a {t_back - t_lost:.1f} s gap")
+        return True
+
+    def _log_schedule(self, phase, sched):
+        s = sched.summary()
+        self.schedule_stats[phase] = s
+        self.log(
+            f"{phase}: {s['samples']} samples, {s['skipped']} skipped, "
+            f"lateness avg {s['lateness_mean_ms']:.2f} ms / max {s['lateness_max_ms']:.2f} ms, "
+            f"jitter {s['jitter_ms']:.2f} ms"
+        )
+
+    def _prepare_buffer(self, buf, burst):
+        if buf in DEFAULT_BUFFERS:
+            return
+        try:
+            # buffer.make() needs a capacity of at least 10 readings
+            self.dmm.write(LUA_BUFFER_MAKE.format(buf=buf, capacity=max(10, burst)))
+        except Exception as e:
+            self.log(f"Buffer create error: {e}", "warn")
+
+    def _release_buffer(self, buf, buffered):
+        # the burst count only changes in buffered mode; a named buffer exists in every mode
+        try:
+            if buffered:
+                self.dmm.write(LUA_MEAS_COUNT.format(count=1))
+            if buf not in DEFAULT_BUFFERS:
+                self.dmm.write(LUA_BUFFER_DELETE.format(buf=buf))
+        except Exception:
+            pass
+
+    def _record_readings(self, phase, vals, t=None):
+        """
+        Hands a chunk of readings (one value in interval mode, a whole burst
+        in buffered mode) to the pipeline. `t` holds per-reading instrument
+        timestamps (host clock); without it the chunk is stamped on arrival.
+        """
+        self.pipeline.put(time.time() if t is None else t, phase, vals, self.source)
@@ -0,0 +1,983 @@
+# simulator.py
+import re
+import math
+import time
+import queue
+import random
+import threading
+import numpy as np
+from pyvisa import errors as visa_errors
+from pyvisa.constants import StatusCode
+
+from constants import SIM_RESOURCE_PREFIX, SIM_RESOURCE
+SIM_IDN = "KEITHLEY INSTRUMENTS,MODEL DMM6500,SIM0001,1.7.12b (simulated)"
+
+SIGNAL_SHAPES = ("dc", "sine", "square", "ramp")
+OVERFLOW = 9.9e37         # what the DMM reports for an over-range reading
+READ_OVERHEAD = 50e-6     # s per reading outside the integration window
+
+
+class SimSignal:
+    """
+    Simulated input for one measure function: offset + amplitude * shape
+    at `freq` Hz, plus Gaussian noise. `noise` is the standard deviation at
+    1 NPLC and shrinks with 1/sqrt(NPLC x filter count), like integration
+    noise on the real meter.
+    """
+
+    def __init__(self, shape="dc", offset=0.0, amplitude=0.0, freq=1.0, noise=0.0):
+        if shape not in SIGNAL_SHAPES:
+            raise ValueError(f"Unknown signal shape: {shape}")
+        self.shape = shape
+        self.offset = offset
+        self.amplitude = amplitude
+        self.freq = freq
+        self.noise = noise
+
+    def sample(self, t, nplc=1.0, avg=1, rng=None):
+        t = np.asarray(t, dtype=np.float64)
+        ph = (t * self.freq) % 1.0
+        if self.shape == "sine":
+            w = np.sin(2 * np.pi * ph)
+        elif self.shape == "square":
+            w = np.where(ph < 0.5, 1.0, -1.0)
+        elif self.shape == "ramp":
+            w = 2 * ph - 1
+        else:
+            w = np.zeros_like(t)
+        y = self.offset + self.amplitude * w
+        if self.noise:
+            rng = rng or np.random.default_rng()
+            y = y + rng.normal(0.0, self.noise / math.sqrt(max(nplc * avg, 1e-4)), t.shape)
+        return y
+
+
+# =========================
+# Minimal TSP (Lua subset) interpreter
+# =========================
+class TspError(Exception):
+    pass
+
+
+class _Abort(Exception):
+    pass
+
+
+class _Break(Exception):
+    pass
+
+
+class _Return(Exception):
+    def __init__(self, value):
+        self.value = value
+
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+|--[^\n]*)
+  | (?P<num>\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)
+  | (?P<str>"[^"]*"|'[^']*')
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op>==|~=|<=|>=|\.\.|[-+*/%^#<>=(),.;])
+""", re.X)
+
+_KEYWORDS = {
+    "and", "break", "do", "else", "elseif", "end", "false", "for", "function",
+    "if", "local", "nil", "not", "or", "return", "then", "true", "while",
+}
+
+# (left, right) binding power; ".." and "^" are right associative
+_BINARY = {
+    "or": (1, 1), "and": (2, 2),
+    "<": (3, 3), ">": (3, 3), "<=": (3, 3), ">=": (3, 3), "~=": (3, 3), "==": (3, 3),
+    "..": (9, 8), "+": (10, 10), "-": (10, 10),
+    "*": (11, 11), "/": (11, 11), "%": (11, 11), "^": (14, 13),
+}
+_UNARY_PRI = 12
+
+
+def _tokenize(src):
+    toks, pos = [], 0
+    while pos < len(src):
+        m = _TOKEN_RE.match(src, pos)
+        if not m:
+            raise TspError(f"unexpected symbol near '{src[pos:pos + 10]}'")
+        pos = m.end()
+        kind = m.lastgroup
+        val = m.group(kind)
+        if kind == "ws":
+            continue
+        if kind == "num":
+            val = float(val)
+        elif kind == "str":
+            val = val[1:-1]
+        elif kind == "name" and val in _KEYWORDS:
+            kind = "kw"
+        toks.append((kind, val))
+    toks.append(("eof", None))
+    return toks
+
+
+class _Parser:
+    """
+    Recursive-descent parser for the Lua subset the app sends: statements,
+    locals, functions, while/for/if/do blocks and the usual operators.
+    Produces nested tuples consumed by _Interp.
+    """
+
+    def __init__(self, src):
+        self.toks = _tokenize(src)
+        self.i = 0
+
+    def parse(self):
+        body = self.block()
+        self.expect("eof")
+        return body
+
+    # token helpers
+    def peek(self):
+        return self.toks[self.i]
+
+    def next(self):
+        tok = self.toks[self.i]
+        self.i += 1
+        return tok
+
+    def check(self, kind, val=None):
+        k, v = self.peek()
+        return k == kind and (val is None or v == val)
+
+    def accept(self, kind, val=None):
+        if self.check(kind, val):
+            return self.next()
+        return None
+
+    def expect(self, kind, val=None):
+        if not self.check(kind, val):
+            raise TspError(f"'{val or kind}' expected near '{self.peek()[1]}'")
+        return self.next()
+
+    # statements
+    def block(self):
+        stats = []
+        while not (self.check("eof") or self.check("kw", "end") or self.check("kw", "else")
+                   or self.check("kw", "elseif")):
+            if self.accept("op", ";"):
+                continue
+            stats.append(self.statement())
+        return stats
+
+    def statement(self):
+        if self.accept("kw", "local"):
+            if self.accept("kw", "function"):
+                name = self.expect("name")[1]
+                return ("local", [name], [self.funcbody()])
+            names = [self.expect("name")[1]]
+            while self.accept("op", ","):
+                names.append(self.expect("name")[1])
+            exps = self.explist() if self.accept("op", "=") else []
+            return ("local", names, exps)
+        if self.accept("kw", "function"):
+            target = ("name", self.expect("name")[1])
+            while self.accept("op", "."):
+                target = ("index", target, self.expect("name")[1])
+            return ("assign", [target], [self.funcbody()])
+        if self.accept("kw", "while"):
+            cond = self.expr()
+            self.expect("kw", "do")
+            body = self.block()
+            self.expect("kw", "end")
+            return ("while", cond, body)
+        if self.accept("kw", "if"):
+            arms = [(self.expr(), self._then_block())]
+            other = []
+            while True:
+                if self.accept("kw", "elseif"):
+                    arms.append((self.expr(), self._then_block()))
+                elif self.accept("kw", "else"):
+                    other = self.block()
+                else:
+                    break
+            self.expect("kw", "end")
+            return ("if", arms, other)
+        if self.accept("kw", "for"):
+            var = self.expect("name")[1]
+            self.expect("op", "=")
+            start = self.expr()
+            self.expect("op", ",")
+            stop = self.expr()
+            step = self.expr() if self.accept("op", ",") else ("const", 1.0)
+            self.expect("kw", "do")
+            body = self.block()
+            self.expect("kw", "end")
+            return ("for", var, start, stop, step, body)
+        if self.accept("kw", "do"):
+            body = self.block()
+            self.expect("kw", "end")
+            return ("do", body)
+        if self.accept("kw", "return"):
+            done = self.check("eof") or self.check("kw", "end") or self.check("op", ";")
+            return ("return", [] if done else self.explist())
+        if self.accept("kw", "break"):
+            return ("break",)
+
+        e = self.suffixed()
+        if self.check("op", "=") or self.check("op", ","):
+            targets = [e]
+            while self.accept("op", ","):
+                targets.append(self.suffixed())
+            self.expect("op", "=")
+            for t in targets:
+                if t[0] not in ("name", "index"):
+                    raise TspError("cannot assign to expression")
+            return ("assign", targets, self.explist())
+        if e[0] != "call":
+            raise TspError(f"syntax error near '{self.peek()[1]}'")
+        return ("exp", e)
+
+    def _then_block(self):
+        self.expect("kw", "then")
+        return self.block()
+
+    def funcbody(self):
+        self.expect("op", "(")
+        params = []
+        if not self.check("op", ")"):
+            params.append(self.expect("name")[1])
+            while self.accept("op", ","):
+                params.append(self.expect("name")[1])
+        self.expect("op", ")")
+        body = self.block()
+        self.expect("kw", "end")
+        return ("func", params, body)
+
+    # expressions
+    def explist(self):
+        exps = [self.expr()]
+        while self.accept("op", ","):
+            exps.append(self.expr())
+        return exps
+
+    def expr(self, limit=0):
+        k, v = self.peek()
+        if (k == "kw" and v == "not") or (k == "op" and v in ("-", "#")):
+            self.next()
+            e = ("un", v, self.expr(_UNARY_PRI))
+        else:
+            e = self.simple()
+        while True:
+            k, v = self.peek()
+            pri = _BINARY.get(v) if k in ("op", "kw") else None
+            if pri is None or pri[0] <= limit:
+                return e
+            self.next()
+            e = ("bin", v, e, self.expr(pri[1]))
+
+    def simple(self):
+        k, v = self.peek()
+        if k in ("num", "str"):
+            self.next()
+            return ("const", v)
+        if k == "kw" and v in ("nil", "true", "false"):
+            self.next()
+            return ("const", {"nil": None, "true": True, "false": False}[v])
+        if k == "kw" and v == "function":
+            self.next()
+            return self.funcbody()
+        return self.suffixed()
+
+    def suffixed(self):
+        if self.accept("op", "("):
+            e = ("paren", self.expr())
+            self.expect("op", ")")
+        else:
+            e = ("name", self.expect("name")[1])
+        while True:
+            if self.accept("op", "."):
+                e = ("index", e, self.expect("name")[1])
+            elif self.accept("op", "("):
+                args = [] if self.check("op", ")") else self.explist()
+                self.expect("op", ")")
+                e = ("call", e, args)
+            else:
+                return e
+
+
+class _Scope:
+    __slots__ = ("vars", "parent")
+
+    def __init__(self, parent=None):
+        self.vars = {}
+        self.parent = parent
+
+    def find(self, name):
+        s = self
+        while s is not None:
+            if name in s.vars:
+                return s
+            s = s.parent
+        return None
+
+
+class _Function:
+    def __init__(self, interp, params, body, scope):
+        self.interp = interp
+        self.params = params
+        self.body = body
+        self.scope = scope
+
+    def __call__(self, *args):
+        sc = _Scope(self.scope)
+        for i, p in enumerate(self.params):
+            sc.vars[p] = args[i] if i < len(args) else None
+        try:
+            self.interp.run_block(self.body, sc)
+        except _Return as r:
+            return r.value
+        return None
+
+
+def _truthy(v):
+    return v is not None and v is not False
+
+
+def _tostr(v):
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if v is None:
+        return "nil"
+    if isinstance(v, float):
+        if v.is_integer() and abs(v) < 1e15:
+            return str(int(v))
+        return f"{v:.14g}"
+    return str(v)
+
+
+class _Interp:
+    """
+    Tree-walking evaluator. Globals are the root scope; Python objects
+    stand in for TSP tables (attribute access for ".", plain calls).
+    """
+
+    def __init__(self, globals_, abort_event):
+        self.root = _Scope()
+        self.root.vars.update(globals_)
+        self.abort = abort_event
+        self._cache = {}
+
+    def compile(self, src):
+        tree = self._cache.get(src)
+        if tree is None:
+            tree = _Parser(src).parse()
+            if len(self._cache) > 256:
+                self._cache.clear()
+            self._cache[src] = tree
+        return tree
+
+    def execute(self, src):
+        try:
+            self.run_block(self.compile(src), self.root)
+        except _Return:
+            pass
+
+    def run_block(self, stats, sc):
+        for st in stats:
+            self.run(st, sc)
+
+    def run(self, st, sc):
+        op = st[0]
+        if op == "exp":
+            self.eval(st[1], sc)
+        elif op == "assign":
+            vals = [self.eval(e, sc) for e in st[2]]
+            for i, target in enumerate(st[1]):
+                v = vals[i] if i < len(vals) else None
+                if target[0] == "name":
+                    owner = sc.find(target[1]) or self.root
+                    owner.vars[target[1]] = v
+                else:
+                    setattr(self.eval(target[1], sc), target[2], v)
+        elif op == "local":
+            vals = [self.eval(e, sc) for e in st[2]]
+            for i, name in enumerate(st[1]):
+                sc.vars[name] = vals[i] if i < len(vals) else None
+        elif op == "while":
+            try:
+                while _truthy(self.eval(st[1], sc)):
+                    self._check_abort()
+                    self.run_block(st[2], _Scope(sc))
+            except _Break:
+                pass
+        elif op == "if":
+            for cond, body in st[1]:
+                if _truthy(self.eval(cond, sc)):
+                    self.run_block(body, _Scope(sc))
+                    return
+            self.run_block(st[2], _Scope(sc))
+        elif op == "for":
+            start, stop, step = (self.eval(e, sc) for e in st[2:5])
+            v = start
+            try:
+                while (step > 0 and v <= stop) or (step < 0 and v >= stop):
+                    self._check_abort()
+                    inner = _Scope(sc)
+                    inner.vars[st[1]] = v
+                    self.run_block(st[5], inner)
+                    v += step
+            except _Break:
+                pass
+        elif op == "do":
+            self.run_block(st[1], _Scope(sc))
+        elif op == "return":
+            vals = [self.eval(e, sc) for e in st[1]]
+            raise _Return(vals[0] if vals else None)
+        elif op == "break":
+            raise _Break()
+
+    def _check_abort(self):
+        if self.abort.is_set():
+            raise _Abort()
+
+    def eval(self, e, sc):
+        op = e[0]
+        if op == "const":
+            return e[1]
+        if op == "name":
+            owner = sc.find(e[1])
+            return owner.vars[e[1]] if owner else None
+        if op == "index":
+            obj = self.eval(e[1], sc)
+            if obj is None:
+                raise TspError(f"attempt to index a nil value (field '{e[2]}')")
+            return getattr(obj, e[2], None)
+        if op == "call":
+            f = self.eval(e[1], sc)
+            if not callable(f):
+                raise TspError("attempt to call a nil value")
+            return f(*[self.eval(a, sc) for a in e[2]])
+        if op == "paren":
+            return self.eval(e[1], sc)
+        if op == "func":
+            return _Function(self, e[1], e[2], sc)
+        if op == "un":
+            v = self.eval(e[2], sc)
+            if e[1] == "not":
+                return not _truthy(v)
+            if e[1] == "-":
+                return -v
+            return len(v)
+        # binary
+        o = e[1]
+        if o == "and":
+            a = self.eval(e[2], sc)
+            return self.eval(e[3], sc) if _truthy(a) else a
+        if o == "or":
+            a = self.eval(e[2], sc)
+            return a if _truthy(a) else self.eval(e[3], sc)
+        a, b = self.eval(e[2], sc), self.eval(e[3], sc)
+        if o == "..":
+            return _tostr(a) + _tostr(b)
+        if o == "+":
+            return a + b
+        if o == "-":
+            return a - b
+        if o == "*":
+            return a * b
+        if o == "/":
+            return a / b
+        if o == "%":
+            return a % b
+        if o == "^":
+            return a ** b
+        if o == "==":
+            return a == b
+        if o == "~=":
+            return a != b
+        if o == "<":
+            return a < b
+        if o == ">":
+            return a > b
+        if o == "<=":
+            return a <= b
+        return a >= b
+
+
+# =========================
+# Instrument model
+# =========================
+class _Ns:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class _Column:
+    def __init__(self, buf, name):
+        self.buf = buf
+        self.name = name
+
+
+class _Buffer:
+    """
+    Reading buffer: readings plus whole/fractional timestamp columns in
+    preallocated arrays. Fills continuously, dropping the oldest entries
+    when full, like the instrument's default fill mode.
+    """
+
+    def __init__(self, capacity=100000):
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        cap = max(int(capacity), 1)
+        self._r = np.empty(cap)
+        self._t = np.empty(cap)
+        self._n = 0
+
+    @property
+    def capacity(self):
+        return self._r.size
+
+    @capacity.setter
+    def capacity(self, value):
+        # resizing clears the buffer on the instrument too
+        self._alloc(value)
+
+    @property
+    def n(self):
+        return float(self._n)
+
+    def clear(self):
+        self._n = 0
+
+    @property
+    def readings(self):
+        return _Column(self, "readings")
+
+    @property
+    def seconds(self):
+        return _Column(self, "seconds")
+
+    @property
+    def fractionalseconds(self):
+        return _Column(self, "fractionalseconds")
+
+    def append(self, vals, t):
+        k = vals.size
+        cap = self.capacity
+        if k >= cap:
+            self._r[:] = vals[-cap:]
+            self._t[:] = t[-cap:]
+            self._n = cap
+            return
+        if self._n + k > cap:
+            keep = cap - k
+            self._r[:keep] = self._r[self._n - keep:self._n]
+            self._t[:keep] = self._t[self._n - keep:self._n]
+            self._n = keep
+        self._r[self._n:self._n + k] = vals
+        self._t[self._n:self._n + k] = t
+        self._n += k
+
+    def column(self, name, start, end):
+        start = max(int(start), 1)
+        end = min(int(end), self._n)
+        if end < start:
+            return np.empty(0)
+        t = self._t[start - 1:end]
+        if name == "readings":
+            return self._r[start - 1:end]
+        if name == "seconds":
+            return np.floor(t)
+        return t - np.floor(t)
+
+
+class _FuncSettings:
+    def __init__(self, rng):
+        self.range = rng
+        self.autorange = "ON"
+        self.nplc = 1.0
+        self.autozero = _Ns(enable="ON")
+        self.filter = _Ns(enable="OFF", count=10, type="FILTER_REPEAT_AVG")
+
+    def copy(self):
+        c = _FuncSettings(self.range)
+        c.autorange, c.nplc = self.autorange, self.nplc
+        c.autozero = _Ns(**vars(self.autozero))
+        c.filter = _Ns(**vars(self.filter))
+        return c
+
+
+class _Measure:
+    """
+    dmm.measure. Range, autorange, NPLC, autozero and filter are kept per
+    function, as on the DMM6500, and follow `func` when it changes.
+    """
+
+    _PER_FUNC = ("range", "autorange", "nplc", "autozero", "filter")
+
+    def __init__(self, sim):
+        d = self.__dict__
+        d["_sim"] = sim
+        d["_funcs"] = {
+            "FUNC_DC_VOLTAGE": _FuncSettings(1000.0),
+            "FUNC_DC_CURRENT": _FuncSettings(3.0),
+        }
+        d["func"] = "FUNC_DC_VOLTAGE"
+        d["count"] = 1.0
+        d["configlist"] = _ConfigLists(self)
+
+    def __getattr__(self, name):
+        if name in self._PER_FUNC:
+            return getattr(self._funcs[self.func], name)
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in self._PER_FUNC:
+            setattr(self._funcs[self.func], name, value)
+        elif name == "func" and value not in self._funcs:
+            raise TspError(f"unsupported measure function {value}")
+        else:
+            self.__dict__[name] = value
+
+    def read(self, buf=None):
+        return self._sim.measure(buf)
+
+
+class _ConfigLists:
+    def __init__(self, measure):
+        self._m = measure
+        self._lists = {}
+
+    def create(self, name):
+        if name in self._lists:
+            raise TspError(f"configuration list {name} already exists")
+        self._lists[name] = None
+
+    def delete(self, name):
+        if name not in self._lists:
+            raise TspError(f"configuration list {name} does not exist")
+        del self._lists[name]
+
+    def store(self, name):
+        if name not in self._lists:
+            raise TspError(f"configuration list {name} does not exist")
+        m = self._m
+        self._lists[name] = (m.func, m.count, m._funcs[m.func].copy())
+
+    def recall(self, name):
+        entry = self._lists.get(name)
+        if entry is None:
+            raise TspError(f"configuration list {name} is empty")
+        func, count, settings = entry
+        m = self._m
+        m.__dict__["func"] = func
+        m.__dict__["count"] = count
+        m._funcs[func] = settings.copy()
+
+
+class _Digitize:
+    def __init__(self, sim):
+        self._sim = sim
+        self.func = "FUNC_DIGITIZE_VOLTAGE"
+        self.samplerate = 1000000.0
+        self.count = 1.0
+        self.range = 10.0
+
+    def read(self, buf=None):
+        return self._sim.digitize(buf)
+
+
+class SimulatedDMM:
+    """
+    In-process stand-in for a DMM6500 VISA session. Accepts the same
+    write/query/read/query_binary_values/clear/close calls as a pyvisa
+    resource and runs every command through a small TSP interpreter, so
+    measure/buffer/printbuffer, binary formats, digitize, configuration
+    lists and loaded scripts behave like the instrument.
+
+    Commands are executed in order on a worker thread, as on the meter:
+    write() returns once the command is "sent" and output is picked up by
+    read(). Tuning:
+        latency      one-way bus delay per call (s)
+        bandwidth    read throughput in bytes/s (None = unlimited)
+        realtime     sleep for the integration/digitize time of readings
+        line_freq    mains frequency used for NPLC timing (Hz)
+        clock_skew   instrument clock minus host clock (s)
+        signals      {"VOLTAGE": SimSignal, "CURRENT": SimSignal}
+        timeout_rate probability that a response is lost (read times out)
+        error_rate   probability that a call fails with an I/O error
+        disconnect_after  calls before the session drops for good
+        seed         RNG seed for noise and faults
+    """
+
+    def __init__(self, latency=0.5e-3, bandwidth=1e6, realtime=True, line_freq=60.0,
+                 clock_skew=0.0, signals=None, timeout_rate=0.0, error_rate=0.0,
+                 disconnect_after=None, seed=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.realtime = realtime
+        self.line_freq = line_freq
+        self.clock_skew = clock_skew
+        self.signals = signals or {
+            "VOLTAGE": SimSignal("dc", offset=5.0, noise=20e-6),
+            "CURRENT": SimSignal("dc", offset=0.01, noise=50e-9),
+        }
+        self.timeout_rate = timeout_rate
+        self.error_rate = error_rate
+        self.disconnect_after = disconnect_after
+        self.timeout = 2000
+        self.calls = 0
+        self.errors = []
+        self._rng = np.random.default_rng(seed)
+        self._fault_rng = random.Random(seed)
+        self._t_origin = time.time()
+        self._abort = threading.Event()
+        self._in = queue.Queue()
+        self._out = queue.Queue()
+        self._loading = None
+        self._closed = False
+
+        self.defbuffer1 = _Buffer()
+        self.defbuffer2 = _Buffer()
+        self.dmm = _Ns(
+            ON="ON", OFF="OFF",
+            FUNC_DC_VOLTAGE="FUNC_DC_VOLTAGE", FUNC_DC_CURRENT="FUNC_DC_CURRENT",
+            FUNC_DIGITIZE_VOLTAGE="FUNC_DIGITIZE_VOLTAGE", FUNC_DIGITIZE_CURRENT="FUNC_DIGITIZE_CURRENT",
+            FILTER_REPEAT_AVG="FILTER_REPEAT_AVG", FILTER_MOVING_AVG="FILTER_MOVING_AVG",
+        )
+        self.dmm.measure = _Measure(self)
+        self.dmm.digitize = _Digitize(self)
+        self.format = _Ns(
+            ASCII="ASCII", REAL32="REAL32", REAL64="REAL64",
+            LITTLEENDIAN="LITTLEENDIAN", BIGENDIAN="BIGENDIAN",
+            data="ASCII", byteorder="BIGENDIAN", asciiprecision=0.0,
+        )
+        self._timer_t0 = time.monotonic()
+        self._interp = _Interp({
+            "dmm": self.dmm,
+            "format": self.format,
+            "defbuffer1": self.defbuffer1,
+            "defbuffer2": self.defbuffer2,
+            "buffer": _Ns(make=lambda cap=100000: _Buffer(cap), delete=lambda buf: None),
+            "timer": _Ns(cleartime=self._timer_clear, gettime=self._timer_get),
+            "localnode": _Ns(linefreq=line_freq, model="DMM6500"),
+            "print": self._print,
+            "printbuffer": self._printbuffer,
+            "delay": self._delay,
+            "pcall": self._pcall,
+        }, self._abort)
+
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    # -------------------------
+    # pyvisa resource API
+    # -------------------------
+    def write(self, cmd):
+        self._call()
+        self._in.put(cmd)
+        return len(cmd)
+
+    def read(self):
+        item = self._read_item()
+        if not isinstance(item, str):
+            item = ",".join(f"{v:.7g}" for v in item)
+        return item + "\n"
+
+    def query(self, cmd):
+        self.write(cmd)
+        return self.read()
+
+    def query_binary_values(self, cmd, datatype="f", is_big_endian=False, container=list):
+        self.write(cmd)
+        item = self._read_item()
+        if isinstance(item, str):
+            raise ValueError("Expected a binary block, got ASCII data (check format.data)")
+        vals = item.astype(datatype)
+        return vals if container is np.array else container(vals)
+
+    def clear(self):
+        """
+        Device clear: aborts the running command/script and drops pending
+        input and output.
+        """
+        self._call()
+        self._abort.set()
+        self._drain(self._in)
+        self._in.join()
+        self._drain(self._out)
+        self._abort.clear()
+        self._loading = None
+
+    def close(self):
+        self._closed = True
+        self._abort.set()
+        self._in.put(None)
+
+    # -------------------------
+    # Transport behaviour
+    # -------------------------
+    def _call(self):
+        if self._closed:
+            raise visa_errors.InvalidSession()
+        self.calls += 1
+        if self.disconnect_after is not None and self.calls > self.disconnect_after:
+            raise visa_errors.VisaIOError(StatusCode.error_connection_lost)
+        if self.error_rate and self._fault_rng.random() < self.error_rate:
+            raise visa_errors.VisaIOError(StatusCode.error_io)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _read_item(self):
+        self._call()
+        try:
+            item = self._out.get(timeout=self.timeout / 1000)
+        except queue.Empty:
+            raise visa_errors.VisaIOError(StatusCode.error_timeout)
+        if self.timeout_rate and self._fault_rng.random() < self.timeout_rate:
+            time.sleep(self.timeout / 1000)
+            raise visa_errors.VisaIOError(StatusCode.error_timeout)
+        if self.bandwidth:
+            size = len(item) if isinstance(item, str) else item.nbytes
+            time.sleep(size / self.bandwidth)
+        return item
+
+    @staticmethod
+    def _drain(q):
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                return
+            q.task_done()
+
+    # -------------------------
+    # Command processor
+    # -------------------------
+    def _run(self):
+        while True:
+            cmd = self._in.get()
+            try:
+                if cmd is None:
+                    return
+                self._process(cmd)
+            except _Abort:
+                pass
+            except Exception as e:
+                # the meter logs errors to its event log and sends nothing back
+                self.errors.append(f"{type(e).__name__}: {e} [{cmd[:60]}]")
+            finally:
+                self._in.task_done()
+
+    def _process(self, cmd):
+        line = cmd.strip()
+        if self._loading is not None:
+            if line == "endscript":
+                name, body = self._loading
+                self._loading = None
+                tree = self._interp.compile("\n".join(body))
+                self._interp.root.vars[name] = _Function(self._interp, [], tree, self._interp.root)
+            else:
+                self._loading[1].append(cmd)
+            return
+        if line.startswith("loadscript "):
+            self._loading = (line.split(None, 1)[1].strip(), [])
+            return
+        if line.startswith("*"):
+            if line.upper() == "*IDN?":
+                self._out.put(SIM_IDN)
+            return
+        if self._abort.is_set():
+            return
+        self._interp.execute(line)
+
+    # -------------------------
+    # TSP functions
+    # -------------------------
+    def _clock(self):
+        return time.time() + self.clock_skew
+
+    def _sleep(self, seconds):
+        if seconds > 0 and self._abort.wait(seconds):
+            raise _Abort()
+
+    def _timer_clear(self):
+        self._timer_t0 = time.monotonic()
+
+    def _timer_get(self):
+        return time.monotonic() - self._timer_t0
+
+    def _delay(self, seconds):
+        self._sleep(float(seconds))
+
+    def _pcall(self, f, *args):
+        try:
+            f(*args)
+            return True
+        except _Abort:
+            raise
+        except Exception:
+            return False
+
+    def _print(self, *args):
+        self._out.put("\t".join(_tostr(a) for a in args))
+
+    def _printbuffer(self, start, end, *cols):
+        arrs = [c.buf.column(c.name, start, end) for c in cols]
+        data = np.stack(arrs, axis=1).ravel() if arrs else np.empty(0)
+        fmt = self.format.data
+        if fmt == "ASCII":
+            # 0 = automatic: enough digits that whole-second timestamps survive
+            prec = int(self.format.asciiprecision) or 15
+            spec = f"%.{prec}g"
+            self._out.put(",".join(spec % v for v in data.tolist()))
+        else:
+            self._out.put(data.astype(np.float32 if fmt == "REAL32" else np.float64))
+
+    def _phase(self, func):
+        return "CURRENT" if "CURRENT" in func else "VOLTAGE"
+
+    def measure(self, buf=None):
+        m = self.dmm.measure
+        avg = int(m.filter.count) if m.filter.enable == "ON" else 1
+        per = m.nplc / self.line_freq * (2 if m.autozero.enable == "ON" else 1) * avg + READ_OVERHEAD
+        n = max(int(m.count), 1)
+        if self.realtime:
+            self._sleep(per * n)
+        t = self._clock() - per * np.arange(n - 1, -1, -1)
+        vals = self.signals[self._phase(m.func)].sample(t - self._t_origin, m.nplc, avg, self._rng)
+        if m.autorange != "ON":
+            vals = np.where(np.abs(vals) > float(m.range) * 1.2, OVERFLOW, vals)
+        (buf or self.defbuffer1).append(vals, t)
+        return float(vals[-1])
+
+    def digitize(self, buf=None):
+        d = self.dmm.digitize
+        rate = float(d.samplerate)
+        n = max(int(d.count), 1)
+        if self.realtime:
+            self._sleep(n / rate)
+        t = self._clock() - np.arange(n - 1, -1, -1) / rate
+        vals = self.signals[self._phase(d.func)].sample(
+            t - self._t_origin, self.line_freq / rate, 1, self._rng)
+        (buf or self.defbuffer1).append(vals, t)
+        return float(vals[-1])
+
+
+class SimResourceManager:
+    """
+    Drop-in for pyvisa.ResourceManager exposing a single simulated
+    DMM6500. Keyword arguments are passed on to SimulatedDMM.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+
+    def list_resources(self, query="?*::INSTR"):
+        return (SIM_RESOURCE,)
+
+    def open_resource(self, resource, **kwargs):
+        if not resource.startswith(SIM_RESOURCE_PREFIX):
+            raise visa_errors.VisaIOError(StatusCode.error_resource_not_found)
+        return SimulatedDMM(**self.options)
+
+    def close(self):
+        pass
@@ -0,0 +1,82 @@
+# stats.py
+import math
+import numpy as np
+
+
+class RunningStats:
+    """
+    O(1)-per-sample statistics for one phase (Welford mean/variance plus
+    min, max, count and RMS). NaN readings are ignored.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sum_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, x):
+        x = float(x)
+        if math.isnan(x):
+            return
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.sum_sq += x * x
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def update_many(self, vals):
+        """
+        Folds a whole chunk in at once (Chan et al. parallel merge), so a
+        buffered burst costs one vectorized pass instead of a Python loop.
+        """
+        a = np.asarray(vals, dtype=np.float64)
+        a = a[~np.isnan(a)]
+        if a.size == 0:
+            return
+        mean_b = float(a.mean())
+        self.merge(a.size, mean_b, float(((a - mean_b) ** 2).sum()), float(np.dot(a, a)),
+                   float(a.min()), float(a.max()))
+
+    def merge(self, count, mean, m2, sum_sq, vmin, vmax):
+        """
+        Folds in the summary of another set of samples (count, mean, sum of
+        squared deviations, sum of squares, min, max), e.g. per-chunk stats
+        stored in a session journal.
+        """
+        if count == 0:
+            return
+        n_a = self.count
+        n = n_a + count
+        delta = mean - self.mean
+        self.mean += delta * count / n
+        self.m2 += m2 + delta * delta * n_a * count / n
+        self.count = n
+        self.sum_sq += sum_sq
+        self.min = min(self.min, vmin)
+        self.max = max(self.max, vmax)
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return float("nan")
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance) if self.count >= 2 else float("nan")
+
+    @property
+    def rms(self):
+        if self.count == 0:
+            return float("nan")
+        return math.sqrt(self.sum_sq / self.count)
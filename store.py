@@ -0,0 +1,209 @@
+# store.py
+import threading
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+
+PHASES = ("VOLTAGE", "CURRENT")
+PHASE_CODES = {name: code for code, name in enumerate(PHASES)}
+
+# instrument a reading came from: index into MeasurementStore.source_names
+DEFAULT_SOURCE = "DMM"
+MAX_SOURCES = 256
+
+# a stretch without readings (lost link): absolute store row where it
+# sits, start/end epoch seconds, phase and source code
+Gap = namedtuple("Gap", "row t0 t1 phase source")
+
+
+class MeasurementStore:
+    """
+    Columnar, append-only storage for readings: float64 timestamps (epoch
+    seconds), uint8 phase codes, uint8 source (instrument) codes and
+    float64 values, 18 bytes per reading. Source 0 is the single connected
+    instrument; fleet members register further names with add_source().
+    `gaps` lists the stretches where a source had no readings (see Gap).
+
+    Columns grow geometrically so appends are amortized O(1); `columns()`
+    returns zero-copy views that stay valid after later appends.
+
+    With `max_rows` set the store becomes a rolling window: once full, the
+    oldest half is dropped (used while streaming to disk, where the file
+    holds the complete run). `offset` counts the rows dropped so far.
+    """
+
+    def __init__(self, capacity=65536, max_rows=None):
+        self._lock = threading.Lock()
+        self._capacity = max(int(capacity), 16)
+        self._alloc(self._capacity)
+        self.n = 0
+        self.offset = 0
+        self.max_rows = max_rows
+        # timestamp of the first reading since the last clear (plot time axis)
+        self.t_origin = None
+        self.source_names = [DEFAULT_SOURCE]
+        self.gaps = []
+
+    def _alloc(self, capacity):
+        self._t = np.empty(capacity, dtype=np.float64)
+        self._p = np.empty(capacity, dtype=np.uint8)
+        self._s = np.empty(capacity, dtype=np.uint8)
+        self._v = np.empty(capacity, dtype=np.float64)
+
+    def add_source(self, name):
+        """
+        Returns the source code for instrument `name`, registering it on
+        first use. Codes stay valid across clear().
+        """
+        with self._lock:
+            if name in self.source_names:
+                return self.source_names.index(name)
+            if len(self.source_names) >= MAX_SOURCES:
+                raise ValueError(f"More than {MAX_SOURCES} instruments")
+            self.source_names.append(name)
+            return len(self.source_names) - 1
+
+    def add_gap(self, t0, t1, phase, source=0):
+        # marked at the current end of the store, between the readings around it
+        with self._lock:
+            self.gaps.append(Gap(self.offset + self.n, t0, t1, phase, source))
+
+    @property
+    def multi_source(self):
+        return len(self.source_names) > 1
+
+    def _drop_oldest(self, d):
+        # copy into fresh columns so views handed out earlier stay intact
+        keep = self.n - d
+        t, p, src, v = self._t, self._p, self._s, self._v
+        self._alloc(max(self._t.size, self._capacity))
+        self._t[:keep] = t[d:self.n]
+        self._p[:keep] = p[d:self.n]
+        self._s[:keep] = src[d:self.n]
+        self._v[:keep] = v[d:self.n]
+        self.n = keep
+        self.offset += d
+
+    def _reserve(self, extra):
+        need = self.n + extra
+        cap = self._t.size
+        if need <= cap:
+            return
+        while cap < need:
+            cap *= 2
+        t, p, src, v = self._t, self._p, self._s, self._v
+        self._alloc(cap)
+        self._t[:self.n] = t[:self.n]
+        self._p[:self.n] = p[:self.n]
+        self._s[:self.n] = src[:self.n]
+        self._v[:self.n] = v[:self.n]
+
+    def __len__(self):
+        return self.n
+
+    def append(self, t, phase, value):
+        self.extend(t, phase, (value,))
+
+    def extend(self, t, phase, values, source=0):
+        """
+        Appends a chunk of readings of one phase from one source. `t` is
+        either one timestamp shared by the chunk or an array with one
+        timestamp per reading.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        k = values.size
+        if k == 0:
+            return
+        with self._lock:
+            if self.max_rows and self.n + k > self.max_rows:
+                if k > self.max_rows:
+                    skip = k - self.max_rows
+                    values = values[skip:]
+                    if np.ndim(t):
+                        t = t[skip:]
+                    self.offset += skip
+                    k = values.size
+                keep = min(self.n, self.max_rows // 2, self.max_rows - k)
+                self._drop_oldest(self.n - keep)
+            self._reserve(k)
+            if self.t_origin is None:
+                self.t_origin = float(np.ravel(t)[0])
+            i, j = self.n, self.n + k
+            self._t[i:j] = t
+            self._p[i:j] = PHASE_CODES[phase]
+            self._s[i:j] = source
+            self._v[i:j] = values
+            self.n = j
+
+    def columns(self, start=0, end=None):
+        """
+        Returns (timestamps, phase_codes, values) views for rows [start, end).
+        """
+        with self._lock:
+            n = self.n if end is None else min(end, self.n)
+            return self._t[start:n], self._p[start:n], self._v[start:n]
+
+    def source_codes(self, start=0, end=None):
+        """
+        Source code view for rows [start, end), aligned with columns().
+        """
+        with self._lock:
+            n = self.n if end is None else min(end, self.n)
+            return self._s[start:n]
+
+    def values(self, phase=None):
+        t, p, v = self.columns()
+        if phase is None:
+            return v
+        return v[p == PHASE_CODES[phase]]
+
+    def clear(self):
+        with self._lock:
+            # give back memory grown during a long run
+            self._alloc(self._capacity)
+            self.n = 0
+            self.offset = 0
+            self.t_origin = None
+            self.gaps = []
+
+    def to_csv(self, file, chunk=100000, footer=()):
+        # the Instrument column only appears once a second instrument exists
+        names = self.source_names if self.multi_source else None
+        with open(file, "w", newline="") as f:
+            f.write(CSV_HEADER_SOURCES if names else CSV_HEADER)
+            for start in range(0, self.n, chunk):
+                src = self.source_codes(start, start + chunk) if names else None
+                f.writelines(csv_lines(*self.columns(start, start + chunk), src, names))
+            f.writelines(csv_comments(footer))
+
+    @property
+    def nbytes(self):
+        return self._t.nbytes + self._p.nbytes + self._s.nbytes + self._v.nbytes
+
+
+CSV_HEADER = "Timestamp,Phase,Value\n"
+CSV_HEADER_SOURCES = "Timestamp,Instrument,Phase,Value\n"
+
+
+def csv_comments(lines):
+    """
+    Lines (e.g. the limit verdict) as "# " comment rows after the data.
+    """
+    return [f"# {line}\n" for line in lines]
+
+
+def csv_lines(t, p, v, src=None, names=None):
+    """
+    Formats a block of columns as CSV lines (full-precision values). With
+    source codes and their names an Instrument column is included.
+    """
+    out = []
+    if src is None:
+        for ts, code, val in zip(t.tolist(), p.tolist(), v.tolist()):
+            stamp = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S.%f")
+            out.append(f"{stamp},{PHASES[code]},{val!r}\n")
+        return out
+    for ts, code, s, val in zip(t.tolist(), p.tolist(), src.tolist(), v.tolist()):
+        stamp = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S.%f")
+        out.append(f"{stamp},{names[s]},{PHASES[code]},{val!r}\n")
+    return out
@@ -0,0 +1,156 @@
+# tsp_script.py
+import numpy as np
+
+from helpers import phase_order, parse_reading_list
+from store import PHASES, PHASE_CODES
+from constants import (
+    MEASURE_FUNCS, LUA_SET_NPLC, LUA_AUTOZERO, LUA_FILTER_ON, LUA_FILTER_OFF, CONFIGLIST_NAMES, LUA_CONFIGLIST_CREATE, LUA_CONFIGLIST_DELETE,
+    LUA_CONFIGLIST_STORE, LUA_CONFIGLIST_RECALL,
+)
+
+SCRIPT_NAME = "AteSequence"
+
+# seconds between data emissions while a phase runs
+EMIT_PERIOD = 0.5
+
+
+def compile_sequence(settings, buf="defbuffer1", timestamps=True):
+    """
+    Turns the sequence settings into a TSP script body that runs the whole
+    sequence on the instrument (order, cycles, per-phase duration, interval
+    and range). Sample timing comes from the instrument timer, so it no
+    longer depends on host scheduling or VISA latency.
+
+    `settings` is the dict built by the control panel / sequence file:
+        {"order": "V->I", "cycles": 1,
+         "phases": {"VOLTAGE": {"duration": 5, "interval": 0.5, "range": "Auto"}, ...}}
+
+    Output protocol (ASCII lines): "D,<phase code>" followed by one
+    printbuffer line (reading[, seconds, fractional] per entry), and
+    "END" when the sequence completes. "Alternating" recalls stored
+    configuration lists and emits "D,A" with interleaved V,I entries;
+    it runs for the voltage phase's duration and interval.
+    """
+    cols = f"{buf}.readings"
+    if timestamps:
+        cols += f", {buf}.seconds, {buf}.fractionalseconds"
+
+    cycles = int(settings.get("cycles", 1))
+    lines = []
+    if settings["order"] == "Alternating":
+        lines += configlist_lines(settings)
+    lines += [
+        "format.data = format.ASCII",
+        "format.asciiprecision = 12",
+        f"{buf}.clear()",
+        "local function emit(code)",
+        f"  if {buf}.n > 0 then",
+        f"    print(\"D,\" .. code)",
+        f"    printbuffer(1, {buf}.n, {cols})",
+        f"    {buf}.clear()",
+        "  end",
+        "end",
+        "local c = 0",
+        f"while {'true' if cycles <= 0 else f'c < {cycles}'} do",
+        "  c = c + 1",
+    ]
+    if settings["order"] == "Alternating":
+        # both setups stored once, then recalled with one command per switch
+        v = settings["phases"]["VOLTAGE"]
+        lines += ["  do", "  dmm.measure.count = 1"]
+        lines += _timed_loop(v["duration"], v["interval"], alternating_read_lines(buf), '"A"', buf)
+        lines += ["  end"]
+    else:
+        for phase in phase_order(settings["order"]):
+            p = settings["phases"][phase]
+            lines += ["  do"]
+            lines += ["  " + ln for ln in measure_config_lines(phase, p)]
+            lines += ["  dmm.measure.count = 1"]
+            lines += _timed_loop(p["duration"], p["interval"],
+                                 [f"dmm.measure.read({buf})"], PHASE_CODES[phase], buf)
+            lines += ["  end"]
+    lines += ["end", "print(\"END\")"]
+    return "\n".join(lines)
+
+
+def measure_config_lines(phase, p):
+    """
+    TSP statements selecting the measure function, range and, when the
+    phase settings carry them, the speed profile (NPLC, autozero, filter).
+    """
+    lines = [f"dmm.measure.func = dmm.{MEASURE_FUNCS[phase]}"]
+    if p.get("range", "Auto") == "Auto":
+        lines.append("dmm.measure.autorange = dmm.ON")
+    else:
+        lines.append("dmm.measure.autorange = dmm.OFF")
+        lines.append(f"dmm.measure.range = {p['range']}")
+    if p.get("nplc") is not None:
+        lines.append(LUA_SET_NPLC.format(nplc=p["nplc"]))
+    if p.get("autozero") is not None:
+        lines.append(LUA_AUTOZERO.format(state="ON" if p["autozero"] else "OFF"))
+    if p.get("filter_count") is not None:
+        n = int(p["filter_count"])
+        lines.append(LUA_FILTER_ON.format(count=n) if n > 1 else LUA_FILTER_OFF)
+    return lines
+
+
+def configlist_lines(settings):
+    """
+    TSP statements that (re)create one measure configuration list per phase
+    holding that phase's function/range setup and a count of one, for
+    fast recall.
+    """
+    lines = []
+    for phase in PHASES:
+        name = CONFIGLIST_NAMES[phase]
+        lines.append(LUA_CONFIGLIST_DELETE.format(name=name))
+        lines.append(LUA_CONFIGLIST_CREATE.format(name=name))
+        lines += measure_config_lines(phase, settings["phases"][phase])
+        # recall also restores the count, whatever a burst setup left behind
+        lines.append("dmm.measure.count = 1")
+        lines.append(LUA_CONFIGLIST_STORE.format(name=name))
+    return lines
+
+
+def alternating_read_lines(buf):
+    # one V and one I reading, each after a single-command config recall
+    return [
+        LUA_CONFIGLIST_RECALL.format(name=CONFIGLIST_NAMES["VOLTAGE"]),
+        f"dmm.measure.read({buf})",
+        LUA_CONFIGLIST_RECALL.format(name=CONFIGLIST_NAMES["CURRENT"]),
+        f"dmm.measure.read({buf})",
+    ]
+
+
+def _timed_loop(duration, interval, read_lines, code, buf):
+    lines = [
+        "  timer.cleartime()",
+        "  local k, last = 0, 0",
+        f"  while timer.gettime() < {float(duration)} do",
+        f"    local w = k * {float(interval)} - timer.gettime()",
+        "    if w > 0 then delay(w) end",
+    ]
+    lines += ["    " + ln for ln in read_lines]
+    lines += [
+        "    k = k + 1",
+        # also emit before a V/I pair could wrap the buffer, whatever the reading rate
+        f"    if timer.gettime() - last >= {EMIT_PERIOD} or {buf}.n + 2 > {buf}.capacity then",
+        f"      emit({code})",
+        "      last = timer.gettime()",
+        "    end",
+        "  end",
+        f"  emit({code})",
+    ]
+    return lines
+
+
+def parse_data_line(line, timestamps=True):
+    """
+    Splits one printbuffer line from the script into (t, values); t is
+    None when the script was compiled without timestamps.
+    """
+    a = np.asarray(parse_reading_list(line), dtype=np.float64)
+    if not timestamps:
+        return None, a
+    a = a[: a.size // 3 * 3].reshape(-1, 3)
+    return a[:, 1] + a[:, 2], a[:, 0]
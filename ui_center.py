@@ -1,9 +1,30 @@
 # ui_center.py
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import os
+import time
+import numpy as np
 import customtkinter as ctk
 from tkinter import filedialog
-from helpers import parse_float_safe
+from helpers import format_reading
+from stats import RunningStats
+from store import MeasurementStore, PHASES
+from journal import JournalReader, JOURNAL_EXT, SESSION_DIR
+from limits import PASS, FAIL
+from plotting import minmax_indices, MinMaxEnvelope
+from ui_table import VirtualTable
+from ui_fleet import FleetPanel
+from ui_diagnostics import DiagnosticsPanel
+
+# GUI consumer frame period (ms) for draining the reading pipeline
+FRAME_MS = 50
+
+# live plot view modes -> rolling window length (None = whole run)
+PLOT_VIEWS = {"All": None, "Last 1k": 1000, "Last 10k": 10000, "Last 100k": 100000}
+
+# replay: above this many readings in view, draw the chunk-index envelope instead
+REPLAY_MAX_POINTS = 2_000_000
+
+# limit verdict label colors
+VERDICT_COLORS = {PASS: "#2e7d32", FAIL: "#c62828"}
 
 class CenterPanel:
     """
@@ -14,14 +35,13 @@ class CenterPanel:
     def __init__(self, app):
         self.app = app
         self.parent = app.center_frame
+        self._diag = getattr(app, "diagnostics", None)
 
         # ensure minimal attributes
-        if not hasattr(self.app, "plot_data_x"):
-            self.app.plot_data_x = []
-        if not hasattr(self.app, "plot_data_y"):
-            self.app.plot_data_y = []
-        if not hasattr(self.app, "records"):
-            self.app.records = []
+        if not hasattr(self.app, "store"):
+            self.app.store = MeasurementStore()
+        if not hasattr(self.app, "stats"):
+            self.app.stats = {"VOLTAGE": RunningStats(), "CURRENT": RunningStats()}
 
         self._build_center_panel()
         # small redraw loop for canvas
@@ -29,12 +49,22 @@ class CenterPanel:
             self.app.after(200, self._plot_update_loop)
         except Exception:
             pass
+        # fixed-rate consumer for the acquisition pipeline
+        self._frame_due = None
+        self._metrics_t = 0.0
+        try:
+            self.app.after(FRAME_MS, self._consume_loop)
+        except Exception:
+            pass
 
     def _build_center_panel(self):
         self.tabs = ctk.CTkTabview(self.parent)
         self.tabs.pack(fill="both", expand=True)
         self.tabs.add("Dashboard")
         self.tabs.add("Raw Data")
+        self.tabs.add("Waveform")
+        self.tabs.add("Fleet")
+        self.tabs.add("Diagnostics")
 
         dash = self.tabs.tab("Dashboard")
         dash.grid_columnconfigure(0, weight=1)
@@ -45,22 +75,46 @@ class CenterPanel:
         stat_fr.grid(row=0, column=0, sticky="ew", padx=5, pady=5)
         self.status_lbl = ctk.CTkLabel(stat_fr, text="Status: IDLE", font=("Arial", 16, "bold"))
         self.status_lbl.pack(side="left", padx=20)
+        self.verdict_lbl = ctk.CTkLabel(stat_fr, text="", font=("Arial", 16, "bold"))
+        self.verdict_lbl.pack(side="left", padx=10)
         self.live_val_lbl = ctk.CTkLabel(stat_fr, text="---", font=("Consolas", 24, "bold"), text_color="#1f6aa5")
         self.live_val_lbl.pack(side="right", padx=20)
         self.live_phase_lbl = ctk.CTkLabel(stat_fr, text="", font=("Arial", 12))
         self.live_phase_lbl.pack(side="right", padx=5)
+        self.metrics_lbl = ctk.CTkLabel(stat_fr, text="", font=("Consolas", 10), text_color="gray")
+        self.metrics_lbl.pack(side="left", padx=10)
 
         # Plot area
         self.plot_frame = ctk.CTkFrame(dash)
         self.plot_frame.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
-        self.fig, self.ax = plt.subplots(figsize=(6, 4), dpi=100)
-        self.ax.set_title("Real-time Measurement")
-        self.ax.set_xlabel("Samples")
-        self.ax.set_ylabel("Amplitude")
-        self.ax.grid(True, linestyle='--', alpha=0.6)
-        self.line, = self.ax.plot([], [], linewidth=1.5)
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
-        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        view_fr = ctk.CTkFrame(self.plot_frame, fg_color="transparent")
+        view_fr.pack(fill="x")
+        self.view_var = ctk.StringVar(value="All")
+        ctk.CTkOptionMenu(view_fr, values=list(PLOT_VIEWS), variable=self.view_var, width=100,
+                          command=lambda _: self._follow_live()).pack(side="left", padx=5)
+        ctk.CTkButton(view_fr, text="Follow", width=70, command=self._follow_live).pack(side="left", padx=5)
+        self.replay_btn = ctk.CTkButton(view_fr, text="Replay...", width=80, command=self._toggle_replay)
+        self.replay_btn.pack(side="left", padx=5)
+        self.xaxis_var = ctk.StringVar(value="Samples")
+        ctk.CTkOptionMenu(view_fr, values=["Samples", "Time (s)"], variable=self.xaxis_var, width=100,
+                          command=self._set_xaxis).pack(side="right", padx=5)
+        # the figure is built once the window is up (matplotlib import is most of startup)
+        self.fig = self.ax = None
+        self.envelope = MinMaxEnvelope()
+        self.follow = True
+        self._bg = None
+        # markers for connection gaps (store.gaps) already on the plot
+        self._gap_artists = []
+        # session journal being replayed (journal.JournalReader), see open_replay
+        self.replay = None
+        self._replay_t0 = 0.0
+        self._live_stats = None
+        self._auto_limits = False
+        self._force_limits = False
+        try:
+            self.app.after_idle(self._build_plot)
+        except Exception:
+            self._build_plot()
 
         # Cards frame
         card_fr = ctk.CTkFrame(dash, height=120)
@@ -70,19 +124,74 @@ class CenterPanel:
         self.card_i = self._create_stat_card(card_fr, "Current Summary", 1, "#fbe9e7", "black")
 
         # Raw Data tab
-        self.data_text = ctk.CTkTextbox(self.tabs.tab("Raw Data"), font=("Consolas", 11))
-        self.data_text.pack(fill="both", expand=True, padx=5, pady=5)
+        self.table = VirtualTable(self.app, self.tabs.tab("Raw Data"))
         btn_fr = ctk.CTkFrame(self.tabs.tab("Raw Data"))
         btn_fr.pack(fill="x", pady=5)
         ctk.CTkButton(btn_fr, text="Export CSV", command=self._export_csv).pack(side="right", padx=10)
         ctk.CTkButton(btn_fr, text="Clear Data", command=self._clear_data).pack(side="right", padx=10)
 
+        # Waveform tab (digitize captures); its figure is created on the first capture
+        wf_tab = self.tabs.tab("Waveform")
+        self.wf_canvas = None
+        wf_btn_fr = ctk.CTkFrame(wf_tab)
+        wf_btn_fr.pack(side="bottom", fill="x", pady=5)
+        self.wf_info_lbl = ctk.CTkLabel(wf_btn_fr, text="No capture")
+        self.wf_info_lbl.pack(side="left", padx=10)
+        ctk.CTkButton(wf_btn_fr, text="Export Waveform", command=self._export_waveform).pack(side="right", padx=10)
+        self.waveform = None
+
+        # Fleet tab (further instruments acquiring concurrently)
+        self.fleet_panel = FleetPanel(self.app, self.tabs.tab("Fleet"))
+
+        # Diagnostics tab (VISA latency histograms, stage timing, metrics endpoint)
+        self.diag_panel = DiagnosticsPanel(self.app, self.tabs.tab("Diagnostics"),
+                                           visible=lambda: self.tabs.get() == "Diagnostics")
+
+    def _build_plot(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+        # Figure instead of pyplot: no global figure manager or pyplot backend setup
+        self.fig = Figure(figsize=(6, 4), dpi=100)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_title("Real-time Measurement")
+        self.ax.set_xlabel(self.xaxis_var.get())
+        self.ax.set_ylabel("Amplitude")
+        self.ax.grid(True, linestyle='--', alpha=0.6)
+        # animated: drawn by blitting on top of the cached background
+        self.line, = self.ax.plot([], [], linewidth=1.5, animated=True)
+        # limits are managed by _update_limits; a deferred autoscale on the
+        # first draw would look like a user zoom and turn following off
+        self.ax.set_autoscale_on(False)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
+        toolbar = NavigationToolbar2Tk(self.canvas, self.plot_frame, pack_toolbar=False)
+        toolbar.update()
+        toolbar.pack(side="bottom", fill="x")
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.ax.callbacks.connect("xlim_changed", self._on_xlim_changed)
+
+    def _build_waveform_plot(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.wf_fig = Figure(figsize=(6, 4), dpi=100)
+        self.wf_ax = self.wf_fig.add_subplot()
+        self.wf_ax.set_title("Digitized Waveform")
+        self.wf_ax.set_xlabel("Time (ms)")
+        self.wf_ax.set_ylabel("Amplitude")
+        self.wf_ax.grid(True, linestyle='--', alpha=0.6)
+        self.wf_line, = self.wf_ax.plot([], [], linewidth=1.0)
+        self.wf_canvas = FigureCanvasTkAgg(self.wf_fig, master=self.tabs.tab("Waveform"))
+        self.wf_canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
+
     def _create_stat_card(self, parent, title, col, bg_color, txt_color):
         f = ctk.CTkFrame(parent, fg_color=bg_color)
         f.grid(row=0, column=col, sticky="nsew", padx=5, pady=5)
         ctk.CTkLabel(f, text=title, text_color=txt_color, font=("Arial", 12, "bold")).pack(pady=5)
         lbls = {}
-        for k in ["Min", "Max", "Avg"]:
+        for k in ["Min", "Max", "Avg", "Std", "RMS"]:
             r = ctk.CTkFrame(f, fg_color="transparent", height=20)
             r.pack(fill="x", padx=10)
             ctk.CTkLabel(r, text=k, text_color=txt_color).pack(side="left")
@@ -93,19 +202,85 @@ class CenterPanel:
         setattr(self, f"lbls_{title.split()[0].lower()}", lbls)
         return f
 
+    # -------------------------
+    # Pipeline consumer (GUI thread)
+    # -------------------------
+    def _consume_loop(self):
+        now = time.monotonic()
+        pipe = getattr(self.app, "pipeline", None)
+        if pipe is not None:
+            # a frame that fires more than one period late counts as dropped
+            if self._frame_due is not None:
+                late = now - self._frame_due
+                if late > FRAME_MS / 1000.0:
+                    pipe.dropped_frames += int(late * 1000 // FRAME_MS)
+            try:
+                latest = pipe.drain()
+                t0 = time.perf_counter()
+                for phase, val in latest.items():
+                    self.update_cards(phase)
+                if latest:
+                    phase, val = list(latest.items())[-1]
+                    self.live_val_lbl.configure(text=format_reading(val, phase))
+                    self.live_phase_lbl.configure(text=phase)
+                    if self._diag is not None:
+                        self._diag.observe("stage_seconds", "gui_cards", time.perf_counter() - t0)
+                if pipe.last_error:
+                    self.app._log(pipe.last_error, "err")
+                    pipe.last_error = None
+                if self.replay is None:
+                    self._show_verdict()
+                if now - self._metrics_t >= 1.0:
+                    self._metrics_t = now
+                    m = pipe.metrics()
+                    self.metrics_lbl.configure(
+                        text=f"Q {m['queue_depth']}/{m['queue_max_depth']}  "
+                             f"drop {m['dropped_frames']}  {m['readings_per_sec']:.0f} rdg/s")
+            except Exception:
+                pass
+        self._frame_due = time.monotonic() + FRAME_MS / 1000.0
+        try:
+            self.app.after(FRAME_MS, self._consume_loop)
+        except Exception:
+            pass
+
+    def _run_active(self):
+        fleet = getattr(self.app, "fleet", None)
+        return getattr(self.app, "running", False) or (fleet is not None and fleet.running)
+
+    def _show_verdict(self, verdict=None, stopped=False):
+        """
+        Limit verdict in the status row: the live one (app.limits, final
+        once nothing runs any more) unless `verdict` is given.
+        """
+        if verdict is None:
+            limits = getattr(self.app, "limits", None)
+            if limits is None:
+                verdict = ""
+            else:
+                verdict, stopped = limits.verdict(final=not self._run_active()), limits.stopped_early
+        text = ""
+        if verdict:
+            # PENDING: running, nothing out of limits yet
+            text = f"Limits: {verdict if verdict in VERDICT_COLORS else 'OK'}"
+            if stopped:
+                text += " (stopped)"
+        if text != self.verdict_lbl.cget("text"):
+            self.verdict_lbl.configure(text=text, text_color=VERDICT_COLORS.get(verdict, "gray"))
+
     # -------------------------
     # Plot update loop
     # -------------------------
     def _plot_update_loop(self):
         try:
-            if len(self.app.plot_data_x) > 0:
-                self.line.set_data(self.app.plot_data_x, self.app.plot_data_y)
-                self.ax.relim()
-                self.ax.autoscale_view()
-                try:
-                    self.canvas.draw_idle()
-                except Exception:
-                    pass
+            if self.follow and self.ax is not None and self.replay is None and len(self.app.store) > 0:
+                t0 = time.perf_counter()
+                x, y = self._live_data()
+                self._show_line(x, y)
+                if self._diag is not None:
+                    self._diag.observe("stage_seconds", "gui_plot", time.perf_counter() - t0)
+            if self.ax is not None and self.replay is None and len(self.app.store.gaps) > len(self._gap_artists):
+                self._draw_gaps()
         except Exception:
             pass
         try:
@@ -113,11 +288,306 @@ class CenterPanel:
         except Exception:
             pass
 
+    def _pixel_bins(self):
+        return max(int(self.ax.bbox.width), 100)
+
+    def _live_data(self):
+        """
+        Decimated (x, y) for the live view. "All" uses the incremental
+        envelope; rolling windows decimate only the last N readings.
+        """
+        store = self.app.store
+        t, _, vals = store.columns()
+        window = PLOT_VIEWS.get(self.view_var.get())
+        if window is None:
+            self.envelope.target_bins = self._pixel_bins()
+            self.envelope.update(vals, store.offset)
+            x, y = self.envelope.data(vals)
+        else:
+            start = max(0, vals.size - window)
+            seg = vals[start:]
+            idx = minmax_indices(seg, self._pixel_bins())
+            x, y = store.offset + start + idx, seg[idx]
+        return self._to_x(x, t), y
+
+    def _draw_gaps(self):
+        # lost-connection gaps: shaded span on the time axis, dotted line at the row otherwise
+        store = self.app.store
+        if store.t_origin is None:
+            return
+        for g in store.gaps[len(self._gap_artists):]:
+            if self._time_axis():
+                a = self.ax.axvspan(g.t0 - store.t_origin, g.t1 - store.t_origin,
+                                    color="red", alpha=0.15, linewidth=0)
+            else:
+                a = self.ax.axvline(g.row, color="red", linestyle=":", linewidth=1)
+            self._gap_artists.append(a)
+        self.canvas.draw_idle()
+
+    def _clear_gaps(self):
+        for a in self._gap_artists:
+            a.remove()
+        self._gap_artists = []
+
+    def _time_axis(self):
+        return self.xaxis_var.get() != "Samples"
+
+    def _to_x(self, rows, t):
+        # absolute row numbers -> plot x (sample index or seconds since start)
+        if not self._time_axis():
+            return rows
+        return t[rows - self.app.store.offset] - self.app.store.t_origin
+
+    def _show_line(self, x, y):
+        self.line.set_data(x, y)
+        if self._update_limits(x, y):
+            # limits moved: full redraw, _on_draw re-caches the background
+            self.canvas.draw_idle()
+        elif self._bg is not None:
+            self.canvas.restore_region(self._bg)
+            self.ax.draw_artist(self.line)
+            self.canvas.blit(self.ax.bbox)
+        else:
+            self.canvas.draw_idle()
+
+    def _update_limits(self, x, y):
+        """
+        Grows the axes in steps with headroom so most frames fit inside the
+        current limits and only need a blit. Returns True if limits changed.
+        """
+        finite = y[np.isfinite(y)]
+        if x.size == 0 or finite.size == 0:
+            return False
+        x0, x1 = float(x[0]), float(x[-1])
+        window = PLOT_VIEWS.get(self.view_var.get())
+        if window is None:
+            store = self.app.store
+            x0 = float(self._to_x(np.array([store.offset]), store.columns(0, 1)[0])[0])
+        y0, y1 = float(finite.min()), float(finite.max())
+        cx0, cx1 = self.ax.get_xlim()
+        cy0, cy1 = self.ax.get_ylim()
+        changed = False
+        self._auto_limits = True
+        try:
+            if x1 > cx1 or x0 < cx0 or (window is None and x0 > cx0):
+                span = max(x1 - x0, 1.0 if self._time_axis() else 10)
+                self.ax.set_xlim(x0, x0 + span * 1.25)
+                changed = True
+            if y0 < cy0 or y1 > cy1 or self._force_limits:
+                pad = (y1 - y0) * 0.1 or abs(y1) * 0.1 or 1e-9
+                self.ax.set_ylim(y0 - pad, y1 + pad)
+                changed = True
+        finally:
+            self._auto_limits = False
+            self._force_limits = False
+        return changed
+
+    def _on_draw(self, event):
+        self._bg = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.ax.bbox)
+
+    def _on_xlim_changed(self, ax):
+        if self._auto_limits:
+            return
+        if self.replay is not None:
+            self._render_replay(*ax.get_xlim())
+            return
+        # user zoom/pan: stop following and show the visible range at full resolution
+        self.follow = False
+        self._render_range(*ax.get_xlim())
+
+    def _render_range(self, x0, x1):
+        store = self.app.store
+        t, _, vals = store.columns()
+        if self._time_axis():
+            a = int(np.searchsorted(t, store.t_origin + x0))
+            b = int(np.searchsorted(t, store.t_origin + x1, side="right"))
+        else:
+            a = max(int(np.floor(x0)) - store.offset, 0)
+            b = min(int(np.ceil(x1)) - store.offset + 1, vals.size)
+        if b <= a:
+            self.line.set_data([], [])
+        else:
+            seg = vals[a:b]
+            idx = minmax_indices(seg, self._pixel_bins())
+            self.line.set_data(self._to_x(store.offset + a + idx, t), seg[idx])
+        self.canvas.draw_idle()
+
+    def _set_xaxis(self, choice):
+        if self.ax is None:
+            return
+        if self.replay is not None:
+            # journal chunks are indexed by time
+            self.xaxis_var.set("Time (s)")
+            return
+        self.ax.set_xlabel(choice)
+        # gap markers are redrawn in the new axis units
+        self._clear_gaps()
+        self._follow_live()
+        self.canvas.draw_idle()
+
+    def _follow_live(self):
+        if self.replay is not None:
+            self._replay_full()
+            return
+        self.follow = True
+        self._force_limits = True
+        if self.ax is None:
+            return
+        self._auto_limits = True
+        try:
+            self.ax.set_xlim(0, 1)  # forces the next frame to re-fit x
+        finally:
+            self._auto_limits = False
+
+    # -------------------------
+    # Session replay
+    # -------------------------
+    def _toggle_replay(self):
+        if self.replay is not None:
+            self.close_replay()
+            return
+        if getattr(self.app, "running", False) or getattr(self.app.fleet, "running", False):
+            self.app._log("Stop the measurement before opening a session", "warn")
+            return
+        file = filedialog.askopenfilename(
+            initialdir=SESSION_DIR if os.path.isdir(SESSION_DIR) else None,
+            filetypes=[("Session Journals", f"*{JOURNAL_EXT}"), ("All Files", "*.*")])
+        if file:
+            self.open_replay(file)
+
+    def open_replay(self, path):
+        """
+        Shows a session journal in the plot and cards. Nothing is loaded
+        up front: the cards come from the per-chunk statistics in the
+        index and the plot reads only the chunks of the visible range.
+        """
+        if self.ax is None:
+            return
+        try:
+            reader = JournalReader(path)
+        except (OSError, ValueError) as e:
+            self.app._log(f"Replay error: {e}", "err")
+            return
+        self.close_replay()
+        if not len(reader):
+            reader.close()
+            self.app._log(f"Session has no readings: {path}", "warn")
+            return
+        self.replay = reader
+        self._replay_t0 = reader.t_range[0]
+        self._live_stats = self.app.stats
+        self.app.stats = {phase: reader.stats(phase) for phase in PHASES}
+        self.follow = False
+        self.xaxis_var.set("Time (s)")
+        self.ax.set_xlabel("Time (s)")
+        self._clear_gaps()
+        for g in reader.gaps:
+            self._gap_artists.append(self.ax.axvspan(
+                g["t0"] - self._replay_t0, g["t1"] - self._replay_t0,
+                color="red", alpha=0.15, linewidth=0))
+        self._blank_cards()
+        for phase in PHASES:
+            self.update_cards(phase)
+        self.status_lbl.configure(text="Status: REPLAY")
+        # verdict recorded with the session, if it had limits
+        limits = reader.meta.get("limits") or {}
+        self._show_verdict(limits.get("verdict", ""), limits.get("stopped_early", False))
+        self.replay_btn.configure(text="Live")
+        self._replay_full()
+        note = " (recovered, session did not close cleanly)" if reader.recovered else ""
+        self.app._log(f"Replaying {path}: {len(reader)} readings in {reader.index.size} chunks{note}")
+        if reader.meta.get("idn"):
+            self.app._log(f"Session instrument: {reader.meta['idn']}")
+
+    def close_replay(self):
+        if self.replay is None:
+            return
+        self.replay.close()
+        self.replay = None
+        self.app.stats = self._live_stats
+        self._live_stats = None
+        self._clear_gaps()
+        self.line.set_data([], [])
+        self.status_lbl.configure(text="Status: IDLE")
+        self.replay_btn.configure(text="Replay...")
+        self._blank_cards()
+        for phase in PHASES:
+            self.update_cards(phase)
+        self._follow_live()
+        self.canvas.draw_idle()
+
+    def _replay_full(self):
+        ix = self.replay.index
+        t0, t1 = self.replay.t_range
+        valid = ix[ix["valid"] > 0]
+        self._auto_limits = True
+        try:
+            self.ax.set_xlim(0, max(t1 - t0, 1e-3))
+            if valid.size:
+                y0, y1 = float(valid["min"].min()), float(valid["max"].max())
+                pad = (y1 - y0) * 0.1 or abs(y1) * 0.1 or 1e-9
+                self.ax.set_ylim(y0 - pad, y1 + pad)
+        finally:
+            self._auto_limits = False
+        self._render_replay(*self.ax.get_xlim())
+
+    def _render_replay(self, x0, x1):
+        r = self.replay
+        t0, t1 = self._replay_t0 + x0, self._replay_t0 + x1
+        if int(r.index["n"][r.select(t0, t1)].sum()) > REPLAY_MAX_POINTS:
+            x, y = r.overview(t0, t1)
+        else:
+            t, _, vals = r.window(t0, t1)
+            idx = minmax_indices(vals, self._pixel_bins())
+            x, y = t[idx], vals[idx]
+        self.line.set_data(x - self._replay_t0, y)
+        self.canvas.draw_idle()
+
+    # -------------------------
+    # Waveform (digitize) view
+    # -------------------------
+    def show_waveform(self, phase, vals, rate):
+        """
+        Renders a digitize capture against its sample-clock time axis.
+        Call from the GUI thread.
+        """
+        self.waveform = (phase, vals, rate)
+        if self.wf_canvas is None:
+            self._build_waveform_plot()
+        idx = minmax_indices(np.asarray(vals, dtype=np.float64), 4000)
+        self.wf_line.set_data(idx * (1000.0 / rate), vals[idx])
+        self.wf_ax.set_ylabel("Voltage (V)" if phase == "VOLTAGE" else "Current (A)")
+        self.wf_ax.relim()
+        self.wf_ax.autoscale_view()
+        self.wf_info_lbl.configure(text=f"{phase}: {len(vals)} samples @ {rate:g} S/s")
+        try:
+            self.wf_canvas.draw_idle()
+            self.tabs.set("Waveform")
+        except Exception:
+            pass
+
+    def _export_waveform(self):
+        if self.waveform is None:
+            return
+        file = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV Files", "*.csv")])
+        if not file:
+            return
+        phase, vals, rate = self.waveform
+        try:
+            t_s = np.arange(len(vals)) / rate
+            np.savetxt(file, np.column_stack((t_s, vals)), delimiter=",",
+                       header=f"Time (s),{phase}", comments="", fmt="%.9g")
+            self.app._log(f"Waveform exported: {file}")
+        except Exception as e:
+            self.app._log(f"Waveform export error: {e}", "err")
+
     # -------------------------
     # CSV / Raw data helpers
     # -------------------------
     def _export_csv(self):
-        if not getattr(self.app, "records", []):
+        if not len(self.app.store):
             try:
                 ctk.CTkMessageBox(title="Export", message="No data to export.")
             except Exception:
@@ -126,12 +596,7 @@ class CenterPanel:
         file = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV Files", "*.csv")])
         if file:
             try:
-                with open(file, "w", newline="") as f:
-                    import csv
-                    writer = csv.writer(f)
-                    writer.writerow(["Timestamp", "Phase", "Value"])
-                    for r in self.app.records:
-                        writer.writerow(r)
+                self.app.store.to_csv(file, footer=self.app.controls.limit_report(final=not self._run_active()))
                 # log via app
                 try:
                     self.app._log(f"Data exported: {file}")
@@ -144,14 +609,25 @@ class CenterPanel:
                     pass
 
     def _clear_data(self):
-        self.app.records.clear()
+        self.close_replay()
+        self.app.store.clear()
         try:
-            self.data_text.delete("1.0", "end")
+            self.table.reset()
         except Exception:
             pass
-        self.app.plot_data_x.clear()
-        self.app.plot_data_y.clear()
-        # update cards to blank
+        for st in self.app.stats.values():
+            st.reset()
+        getattr(self.app, "source_stats", {}).clear()
+        if getattr(self.app, "limits", None) is not None:
+            self.app.limits.reset()
+        self.envelope.reset()
+        if self.ax is not None:
+            self.line.set_data([], [])
+            self._clear_gaps()
+        self._follow_live()
+        self._blank_cards()
+
+    def _blank_cards(self):
         for attr in ("lbls_voltage", "lbls_current"):
             if hasattr(self, attr):
                 lbls = getattr(self, attr)
@@ -162,16 +638,9 @@ class CenterPanel:
     # Card updater (call from worker)
     # -------------------------
     def update_cards(self, phase):
-        # gather numeric values from records for this phase
-        vals = []
-        for r in self.app.records:
-            if r[1] == phase:
-                # r[2] is formatted like "1.23 V" or "---"
-                first_tok = str(r[2]).split()[0]
-                v = parse_float_safe(first_tok)
-                if not (v != v):  # not NaN
-                    vals.append(v)
-        if not vals:
+        # O(1): read the running statistics kept by the worker
+        st = self.app.stats.get(phase)
+        if st is None or st.count == 0:
             return
         if phase == "VOLTAGE":
             lbls = getattr(self, "lbls_voltage", None)
@@ -182,8 +651,10 @@ class CenterPanel:
             return
 
         try:
-            lbls["min"].configure(text=f"{min(vals):.3g}")
-            lbls["max"].configure(text=f"{max(vals):.3g}")
-            lbls["avg"].configure(text=f"{sum(vals)/len(vals):.3g}")
+            lbls["min"].configure(text=format_reading(st.min, phase))
+            lbls["max"].configure(text=format_reading(st.max, phase))
+            lbls["avg"].configure(text=format_reading(st.mean, phase))
+            lbls["std"].configure(text=format_reading(st.std, phase))
+            lbls["rms"].configure(text=format_reading(st.rms, phase))
         except Exception:
             pass
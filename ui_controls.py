@@ -1,13 +1,31 @@
 # ui_controls.py
-import time
 import threading
 from queue import Queue
 from datetime import datetime
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
 
-from constants import LUA_AUTORANGE_ON, LUA_AUTORANGE_OFF, LUA_SET_FUNC, LUA_SET_RANGE
-from helpers import parse_range, format_reading, parse_float_safe
+from constants import TRANSFER_FORMATS
+from helpers import parse_range
+from stats import RunningStats
+from store import MeasurementStore
+from recorder import StreamRecorder, RECORD_FORMATS
+from journal import SessionJournal, session_path
+from limits import LimitTester
+from pipeline import ReadingPipeline
+from scheduler import SCHEDULE_POLICIES
+from sequence import SequenceRunner, ORDERS, normalize_sequence, limit_specs
+from instrument import IDN_FILTER, SCAN_CACHE_S
+from profiles import (
+    SPEED_PROFILES, PROFILE_NAMES, CUSTOM_PROFILE, DEFAULT_PROFILE, clamp_profile, describe_profile,
+)
+from store import PHASES
+
+# widget name prefix per phase (v_dur_entry, i_range_var, ...)
+PHASE_PREFIX = {"VOLTAGE": "v", "CURRENT": "i"}
+
+# readings kept in memory while recording to file
+RECORD_WINDOW_ROWS = 1_000_000
 
 
 class ControlPanel:
@@ -19,6 +37,8 @@ class ControlPanel:
     def __init__(self, app):
         self.app = app
         self.parent = app.ctrl_frame
+        # instrument names to stop on a limit failure, acted on by the Tk update loop
+        self._stop_requests = Queue()
 
         # ensure runtime attributes on app for compatibility
         self._ensure_app_runtime_attrs()
@@ -30,6 +50,11 @@ class ControlPanel:
             self.app.after(100, self._ui_update_loop)
         except Exception:
             pass
+        # fill the device list in the background once the window is up
+        try:
+            self.app.after(500, lambda: self._scan_visa(max_age=SCAN_CACHE_S))
+        except Exception:
+            pass
 
     def _ensure_app_runtime_attrs(self):
         a = self.app
@@ -50,14 +75,30 @@ class ControlPanel:
         if not hasattr(a, "pause_event"):
             import threading
             a.pause_event = threading.Event()
+        if not hasattr(a, "resume_event"):
+            # set while not paused, so the worker can block on it instead of polling
+            a.resume_event = threading.Event()
+            a.resume_event.set()
         if not hasattr(a, "worker_thread"):
             a.worker_thread = None
-        if not hasattr(a, "records"):
-            a.records = []
-        if not hasattr(a, "plot_data_x"):
-            a.plot_data_x = []
-        if not hasattr(a, "plot_data_y"):
-            a.plot_data_y = []
+        if not hasattr(a, "store"):
+            a.store = MeasurementStore()
+        if not hasattr(a, "stats"):
+            a.stats = {"VOLTAGE": RunningStats(), "CURRENT": RunningStats()}
+        if not hasattr(a, "source_stats"):
+            # per-instrument stats for fleet runs, filled by the pipeline
+            a.source_stats = {}
+        if not hasattr(a, "schedule_stats"):
+            a.schedule_stats = {}
+        if not hasattr(a, "recorder"):
+            a.recorder = None
+        if not hasattr(a, "journal"):
+            a.journal = None
+        if not hasattr(a, "limits"):
+            # limits.LimitTester of the current/last run, None without limits
+            a.limits = None
+        if not hasattr(a, "pipeline"):
+            a.pipeline = ReadingPipeline(a)
         if not hasattr(a, "log_queue"):
             a.log_queue = Queue()
 
@@ -91,7 +132,8 @@ class ControlPanel:
         btn_row = ctk.CTkFrame(conn_box, fg_color="transparent")
         btn_row.pack(fill="x", pady=5)
 
-        ctk.CTkButton(btn_row, text="Scan", width=80, command=self._scan_visa).pack(side="left", padx=5)
+        self.scan_btn = ctk.CTkButton(btn_row, text="Scan", width=80, command=self._scan_visa)
+        self.scan_btn.pack(side="left", padx=5)
 
         self.connect_btn = ctk.CTkButton(
             btn_row,
@@ -101,6 +143,8 @@ class ControlPanel:
             fg_color="green"
         )
         self.connect_btn.pack(side="right", padx=5)
+        self.scan_filter_var = ctk.BooleanVar(value=True)
+        ctk.CTkCheckBox(conn_box, text=f"{IDN_FILTER} only", variable=self.scan_filter_var).pack(pady=(0, 5))
 
 
         # Sequence settings
@@ -108,7 +152,7 @@ class ControlPanel:
         sett_box.grid(row=2, column=0, padx=10, pady=10, sticky="ew")
         ctk.CTkLabel(sett_box, text="Sequence Settings", font=("Roboto", 12, "bold")).pack(pady=5)
         self.order_var = ctk.StringVar(value="V->I")
-        ctk.CTkOptionMenu(sett_box, values=["V->I", "I->V", "Alternating", "V only", "I only"], variable=self.order_var).pack(fill="x", padx=5, pady=5)
+        ctk.CTkOptionMenu(sett_box, values=list(ORDERS), variable=self.order_var).pack(fill="x", padx=5, pady=5)
         row_cyc = ctk.CTkFrame(sett_box, fg_color="transparent")
         row_cyc.pack(fill="x", padx=5)
         ctk.CTkLabel(row_cyc, text="Cycles (0=Inf):").pack(side="left")
@@ -116,6 +160,46 @@ class ControlPanel:
         self.cycles_entry.insert(0, "1")
         self.cycles_entry.pack(side="right")
 
+        # Buffered (burst) acquisition
+        self.buffered_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(sett_box, text="Buffered (burst)", variable=self.buffered_var).pack(pady=5)
+        self._add_param_row(sett_box, "Burst size:", "burst", "100")
+        self._add_param_row(sett_box, "Buffer:", "buffer", "defbuffer1")
+        row_fmt = ctk.CTkFrame(sett_box, fg_color="transparent")
+        row_fmt.pack(fill="x", padx=5, pady=1)
+        ctk.CTkLabel(row_fmt, text="Transfer:").pack(side="left")
+        self.transfer_var = ctk.StringVar(value="ASCII")
+        ctk.CTkOptionMenu(row_fmt, values=list(TRANSFER_FORMATS), variable=self.transfer_var, width=90).pack(side="right")
+
+        self.on_instrument_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(sett_box, text="Run on instrument (TSP)", variable=self.on_instrument_var).pack(pady=5)
+        self.timestamps_var = ctk.BooleanVar(value=True)
+        ctk.CTkCheckBox(sett_box, text="Instrument timestamps", variable=self.timestamps_var).pack(pady=5)
+
+        # Late-sample policy for the interval scheduler
+        row_pol = ctk.CTkFrame(sett_box, fg_color="transparent")
+        row_pol.pack(fill="x", padx=5, pady=1)
+        ctk.CTkLabel(row_pol, text="Late samples:").pack(side="left")
+        self.policy_var = ctk.StringVar(value=SCHEDULE_POLICIES[0])
+        ctk.CTkOptionMenu(row_pol, values=list(SCHEDULE_POLICIES), variable=self.policy_var, width=90).pack(side="right")
+        self.stop_on_fail_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(sett_box, text="Stop on limit failure", variable=self.stop_on_fail_var).pack(pady=5)
+
+        # Streaming record-to-file
+        row_rec = ctk.CTkFrame(sett_box, fg_color="transparent")
+        row_rec.pack(fill="x", padx=5, pady=1)
+        self.record_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(row_rec, text="Record to file", variable=self.record_var).pack(side="left")
+        self.record_fmt_var = ctk.StringVar(value="CSV")
+        ctk.CTkOptionMenu(row_rec, values=list(RECORD_FORMATS), variable=self.record_fmt_var, width=90).pack(side="right")
+        # append-only session journal (readings, settings, IDN, event log) for replay
+        self.journal_var = ctk.BooleanVar(value=True)
+        ctk.CTkCheckBox(sett_box, text="Session journal", variable=self.journal_var).pack(pady=5)
+
+        # Digitize capture (used by the "Digitize V/I" sequences)
+        self._add_param_row(sett_box, "Dig. rate (S/s):", "dig_rate", "1000000")
+        self._add_param_row(sett_box, "Dig. count:", "dig_count", "100000")
+
         # Voltage box
         v_box = ctk.CTkFrame(f, border_width=1, border_color="gray")
         v_box.grid(row=3, column=0, padx=10, pady=5, sticky="ew")
@@ -129,6 +213,8 @@ class ControlPanel:
         self.v_range_menu.pack(fill="x", padx=5, pady=5)
         self.v_autorange = ctk.BooleanVar(value=True)
         ctk.CTkCheckBox(v_box, text="Autorange", variable=self.v_autorange).pack(pady=5)
+        self._add_profile_rows(v_box, "v")
+        self._add_limit_rows(v_box, "v")
 
         # Current box
         i_box = ctk.CTkFrame(f, border_width=1, border_color="gray")
@@ -143,6 +229,8 @@ class ControlPanel:
         self.i_range_menu.pack(fill="x", padx=5, pady=5)
         self.i_autorange = ctk.BooleanVar(value=True)
         ctk.CTkCheckBox(i_box, text="Autorange", variable=self.i_autorange).pack(pady=5)
+        self._add_profile_rows(i_box, "i")
+        self._add_limit_rows(i_box, "i")
 
         # Actions
         act_box = ctk.CTkFrame(f, fg_color="transparent")
@@ -161,6 +249,94 @@ class ControlPanel:
         self.theme_sw = ctk.CTkSwitch(bot_box, text="Dark Mode", command=self._toggle_theme)
         self.theme_sw.pack()
 
+    def _add_profile_rows(self, box, pre):
+        """
+        Speed/accuracy profile for one phase box. Picking a preset fills in
+        NPLC/autozero/filter; editing any of them switches to "Custom".
+        The label shows the estimated reading rate for the current values.
+        """
+        row = ctk.CTkFrame(box, fg_color="transparent")
+        row.pack(fill="x", padx=5, pady=1)
+        ctk.CTkLabel(row, text="Profile:").pack(side="left")
+        var = ctk.StringVar(value=DEFAULT_PROFILE)
+        ctk.CTkOptionMenu(row, values=list(PROFILE_NAMES), variable=var, width=90,
+                          command=lambda name: self._apply_profile(pre, name)).pack(side="right")
+        setattr(self, f"{pre}_profile_var", var)
+
+        preset = SPEED_PROFILES[DEFAULT_PROFILE]
+        self._add_param_row(box, "NPLC:", f"{pre}_nplc", str(preset["nplc"]))
+        self._add_param_row(box, "Filter count:", f"{pre}_filter", str(preset["filter_count"]))
+        az = ctk.BooleanVar(value=preset["autozero"])
+        ctk.CTkCheckBox(box, text="Autozero", variable=az,
+                        command=lambda: self._profile_edited(pre)).pack(pady=2)
+        setattr(self, f"{pre}_autozero", az)
+        for tag in ("nplc", "filter"):
+            getattr(self, f"{pre}_{tag}_entry").bind("<KeyRelease>", lambda _: self._profile_edited(pre))
+
+        lbl = ctk.CTkLabel(box, text="", font=("Roboto", 11), text_color="gray")
+        lbl.pack(pady=(0, 4))
+        setattr(self, f"{pre}_rate_lbl", lbl)
+        self._update_rate_label(pre)
+
+    def _apply_profile(self, pre, name):
+        preset = SPEED_PROFILES.get(name)
+        if preset is not None:
+            for tag, key in (("nplc", "nplc"), ("filter", "filter_count")):
+                entry = getattr(self, f"{pre}_{tag}_entry")
+                entry.delete(0, "end")
+                entry.insert(0, str(preset[key]))
+            getattr(self, f"{pre}_autozero").set(preset["autozero"])
+        self._update_rate_label(pre)
+
+    def _profile_edited(self, pre):
+        getattr(self, f"{pre}_profile_var").set(CUSTOM_PROFILE)
+        self._update_rate_label(pre)
+
+    def _update_rate_label(self, pre):
+        p = self._phase_profile(pre)
+        getattr(self, f"{pre}_rate_lbl").configure(text=describe_profile(**p))
+
+    def _phase_profile(self, pre):
+        """
+        NPLC/autozero/filter for a phase box, clamped to instrument limits.
+        """
+        return clamp_profile(getattr(self, f"{pre}_nplc_entry").get(),
+                             getattr(self, f"{pre}_autozero").get(),
+                             getattr(self, f"{pre}_filter_entry").get())
+
+    def _add_limit_rows(self, box, pre):
+        """
+        Pass/fail limits for one phase box, two entries per row; blank
+        entries are not checked.
+        """
+        for label, tags in (("Low / high:", ("low", "high")),
+                            ("Nominal / ±tol:", ("nominal", "tol")),
+                            ("Max std / exc.:", ("max_std", "max_exc"))):
+            fr = ctk.CTkFrame(box, fg_color="transparent")
+            fr.pack(fill="x", padx=5, pady=1)
+            ctk.CTkLabel(fr, text=label).pack(side="left")
+            for tag in reversed(tags):
+                entry = ctk.CTkEntry(fr, width=60)
+                entry.pack(side="right", padx=(2, 0))
+                setattr(self, f"{pre}_{tag}_entry", entry)
+        getattr(self, f"{pre}_tol_entry").configure(placeholder_text="abs or %")
+
+    def _phase_limits(self, pre):
+        """
+        Limit spec of a phase box as entered (see limits.normalize_limits).
+        A "%" suffix makes the tolerance relative to the nominal value.
+        """
+        def get(tag):
+            return getattr(self, f"{pre}_{tag}_entry").get().strip()
+        raw = {"low": get("low"), "high": get("high"), "nominal": get("nominal"),
+               "max_std": get("max_std"), "max_excursions": get("max_exc")}
+        tol = get("tol")
+        if tol.endswith("%"):
+            raw["tolerance_pct"] = tol[:-1]
+        else:
+            raw["tolerance"] = tol
+        return {key: val for key, val in raw.items() if val}
+
     def _add_param_row(self, parent, label, tag, default):
         fr = ctk.CTkFrame(parent, fg_color="transparent")
         fr.pack(fill="x", padx=5, pady=1)
@@ -181,6 +357,11 @@ class ControlPanel:
                 self.app._log(msg)
             except Exception:
                 print(msg)
+        while not self._stop_requests.empty():
+            self._stop_on_limit(self._stop_requests.get())
+        if getattr(self.app, "running", False) and not self._worker_alive():
+            # the worker finished or failed on its own: back to idle
+            self._stop_sequence()
         # schedule next run
         try:
             self.app.after(200, self._ui_update_loop)
@@ -190,17 +371,39 @@ class ControlPanel:
     # -------------------------
     # VISA Scan / Connect
     # -------------------------
-    def _scan_visa(self):
+    def _scan_visa(self, max_age=0):
+        """
+        Starts a background discovery; the device list is filled in from
+        the Tk loop when it completes. The Scan button always rescans,
+        the startup scan reuses a recent result.
+        """
+        inst = self.app.instrument
+        if not inst:
+            return
+        started = inst.scan_async(lambda res: self.app.after(0, lambda: self._scan_done(res)),
+                                  identify=self.scan_filter_var.get(), max_age=max_age)
+        if started:
+            self.scan_btn.configure(state="disabled", text="Scanning")
+            self._log("Scanning for instruments...")
+
+    def _scan_done(self, resources):
+        self.scan_btn.configure(state="normal", text="Scan")
+        inst = self.app.instrument
+        if inst.scan_error:
+            self._log(f"VISA Scan Error: {inst.scan_error}", "err")
         try:
-            if self.app.instrument:
-                resources = self.app.instrument.scan()
-            else:
-                resources = []
             if resources:
                 self.device_combo.configure(values=resources)
-                if not self.device_combo.get() and resources:
+                if self.device_combo.get() not in resources:
                     self.device_combo.set(resources[0])
                 self._log(f"Found {len(resources)} devices")
+                try:
+                    self.app.center.fleet_panel.set_resources(resources)
+                except Exception:
+                    pass
+                for r in resources:
+                    if r in inst.idn_cache:
+                        self._log(f"  {r}: {inst.idn_cache[r]}")
             else:
                 self.device_combo.configure(values=["No Devices"])
                 self.device_combo.set("No Devices")
@@ -240,6 +443,8 @@ class ControlPanel:
                         self._log(f"Connected: {idn}")
                     else:
                         self.app.connected = False
+                        messagebox.showerror("Connection Error",
+                                             self.app.instrument.last_error or f"Could not open {addr}")
             except Exception as e:
                 self._log(f"Connection failed: {e}", "err")
                 messagebox.showerror("Connection Error", str(e))
@@ -259,10 +464,37 @@ class ControlPanel:
             return
         if getattr(self.app, "running", False):
             return
+        if self._worker_alive():
+            self._log("Previous sequence is still stopping", "warn")
+            return
+        try:
+            # back to the live view; a replay has swapped in its own stats
+            self.app.center.close_replay()
+        except Exception:
+            pass
+        try:
+            self._settings = self._sequence_settings()
+        except ValueError as e:
+            messagebox.showwarning("Warning", f"Invalid sequence settings: {e}")
+            return
+        try:
+            if self.app.instrument:
+                self.app.instrument.set_transfer_format(self.transfer_var.get())
+        except Exception as e:
+            self._log(f"Transfer format error: {e}", "warn")
+        if self.record_var.get() and not self._open_recorder():
+            return
+        if self.journal_var.get():
+            self._open_journal(self._settings)
+        self._open_limits(self._settings)
+        self.app.pipeline.reset_metrics()
         self.app.running = True
         self.app.stop_event.clear()
         self.app.pause_event.clear()
-        self.app.worker_thread = threading.Thread(target=self._worker_task, daemon=True)
+        self.app.resume_event.set()
+        # the worker closes the files of its own run, whatever app.recorder/journal are by then
+        self.app.worker_thread = threading.Thread(
+            target=self._worker_main, args=(self.app.recorder, self.app.journal), daemon=True)
         self.app.worker_thread.start()
         self.start_btn.configure(state="disabled")
         self.pause_btn.configure(state="normal")
@@ -272,117 +504,228 @@ class ControlPanel:
     def _pause_resume(self):
         if self.app.pause_event.is_set():
             self.app.pause_event.clear()
+            self.app.resume_event.set()
             self.pause_btn.configure(text="Pause")
             self._log("Resumed")
         else:
             self.app.pause_event.set()
+            self.app.resume_event.clear()
             self.pause_btn.configure(text="Resume")
             self._log("Paused")
 
     def _stop_sequence(self):
         self.app.stop_event.set()
+        # wake a paused worker so it sees the stop
+        self.app.resume_event.set()
         self.app.running = False
-        self.start_btn.configure(state="normal")
         self.pause_btn.configure(state="disabled", text="Pause")
         self.stop_btn.configure(state="disabled")
         self._log("Measurement stopped")
+        self._enable_start()
+
+    def _worker_alive(self):
+        worker = getattr(self.app, "worker_thread", None)
+        return worker is not None and worker.is_alive()
+
+    def _enable_start(self):
+        # Start stays disabled until the stopped worker has handed off its files
+        if self._worker_alive():
+            self.app.after(100, self._enable_start)
+        elif not getattr(self.app, "running", False):
+            self.start_btn.configure(state="normal")
+
+    def _open_recorder(self):
+        fmt = self.record_fmt_var.get()
+        ext = ".csv" if fmt == "CSV" else ".dmmrec"
+        file = filedialog.asksaveasfilename(
+            defaultextension=ext, filetypes=[(f"{fmt} Files", f"*{ext}")]
+        )
+        if not file:
+            return False
+        try:
+            # always tagged: fleet members may be added while recording
+            self.app.recorder = StreamRecorder(file, fmt, sources=self.app.store.source_names)
+        except Exception as e:
+            self._log(f"Recorder error: {e}", "err")
+            return False
+        # the file holds the full run; keep only a rolling window in memory
+        self.app.store.max_rows = RECORD_WINDOW_ROWS
+        self._log(f"Recording to {file}")
+        return True
+
+    def _close_recorder(self, rec=None):
+        # closes `rec` (default: the current recorder); app.recorder may already belong to a newer run
+        if rec is None:
+            rec = getattr(self.app, "recorder", None)
+        if rec is None:
+            return
+        if self.app.recorder is rec:
+            self.app.recorder = None
+            self.app.store.max_rows = None
+        footer = self.limit_report()
+
+        def close():
+            # on the pipeline's writer thread, behind the run's last writes
+            try:
+                rec.close(footer=footer)
+                self._log(f"Recording closed: {rec.rows_written} readings in {rec.path}")
+            except Exception as e:
+                self._log(f"Recorder close error: {e}", "err")
+        self.app.pipeline.in_writer(close)
+
+    def _open_journal(self, settings):
+        # one journal per run, named by its start time, in journal.SESSION_DIR
+        inst = self.app.instrument
+        meta = {"settings": settings, "sources": self.app.store.source_names}
+        if inst is not None and inst.connected:
+            meta.update(resource=inst.resource, idn=inst.idn)
+        fleet = getattr(self.app, "fleet", None)
+        if fleet is not None and fleet.members:
+            meta["fleet"] = {m.name: {"resource": m.resource, "idn": m.idn}
+                             for m in fleet.members.values()}
+        try:
+            self.app.journal = SessionJournal(session_path(), meta)
+        except Exception as e:
+            self._log(f"Journal error: {e}", "err")
+            return
+        self._log(f"Session journal: {self.app.journal.path}")
+
+    def _close_journal(self, journal=None):
+        if journal is None:
+            journal = getattr(self.app, "journal", None)
+        if journal is None:
+            return
+        if self.app.journal is journal:
+            self.app.journal = None
+        limits = getattr(self.app, "limits", None)
+        summary = limits.summary(self.app.store.source_names, final=True) if limits is not None else None
+
+        def close():
+            try:
+                if summary is not None:
+                    journal.meta(limits=summary)
+                journal.close()
+                self._log(f"Session journal closed: {journal.rows_written} readings in {journal.path}")
+            except Exception as e:
+                self._log(f"Journal close error: {e}", "err")
+        self.app.pipeline.in_writer(close)
+
+    def _open_limits(self, settings):
+        # a fresh tester per run; the last one stays for export until the next start
+        specs = limit_specs(settings)
+        self.app.limits = LimitTester(specs, settings["stop_on_fail"], self._limit_failed) if specs else None
+
+    def _limit_failed(self, source, phase, reason):
+        # called by the pipeline drain (Tk loop, or the worker's final drain):
+        # only logs and queues the stop for the Tk update loop
+        store = self.app.store
+        name = store.source_names[source]
+        self._log(f"{name + ' ' if store.multi_source else ''}limit failure: {reason}", "err")
+        limits = getattr(self.app, "limits", None)
+        if limits is not None and limits.stop_on_fail:
+            self._stop_requests.put(name)
+
+    def _stop_on_limit(self, name):
+        fleet = getattr(self.app, "fleet", None)
+        member = fleet.members.get(name) if fleet is not None else None
+        if member is not None and member.running:
+            member.stop()
+        elif getattr(self.app, "running", False) and name == self.app.store.source_names[0]:
+            self._log("Stopping on limit failure", "warn")
+            self._stop_sequence()
+
+    def limit_report(self, final=True):
+        """
+        Verdict lines of the current/last run's limits, for logs and exports.
+        """
+        limits = getattr(self.app, "limits", None)
+        if limits is None:
+            return []
+        return limits.report(self.app.store.source_names, final)
+
+    def _log_verdict(self):
+        for i, line in enumerate(self.limit_report()):
+            self._log(line, "info" if i or line.endswith("PASS") else "err")
 
     # -------------------------
     # Worker thread - performs measurements
     # -------------------------
+    def _worker_main(self, recorder=None, journal=None):
+        try:
+            self._worker_task()
+        finally:
+            # sink whatever the GUI consumer has not drained yet before closing the file
+            self.app.pipeline.drain()
+            fleet = getattr(self.app, "fleet", None)
+            if fleet is None or not fleet.running:
+                # otherwise the fleet panel closes them when the fleet is done
+                self._log_verdict()
+                if recorder is not None:
+                    self._close_recorder(recorder)
+                if journal is not None:
+                    self._close_journal(journal)
+
     def _worker_task(self):
-        order = self.order_var.get()
+        runner = SequenceRunner(
+            self.app.instrument, self.app.pipeline, self._settings,
+            self.app.stop_event, self.app.resume_event,
+            log=self._log, on_waveform=self._show_waveform,
+            schedule_stats=self.app.schedule_stats,
+        )
         try:
-            cycles = int(self.cycles_entry.get())
-        except Exception:
-            cycles = 1
-        if cycles == 0:
-            cycles = float("inf")
-
-        for c in range(cycles):
-            for phase in ["VOLTAGE", "CURRENT"]:
-                if self.app.stop_event.is_set():
-                    return
-                if (order == "V only" and phase == "CURRENT") or (order == "I only" and phase == "VOLTAGE"):
-                    continue
-
-                dur_entry = getattr(self, f"{phase[0].lower()}_dur_entry")
-                int_entry = getattr(self, f"{phase[0].lower()}_int_entry")
-                try:
-                    duration = float(dur_entry.get())
-                except:
-                    duration = 5.0
-                try:
-                    interval = float(int_entry.get())
-                except:
-                    interval = 0.5
+            runner.run()
+        except Exception as e:
+            self._log(f"Sequence error: {e}", "err")
 
-                rng_var = getattr(self, f"{phase[0].lower()}_range_var")
-                autorange = getattr(self, f"{phase[0].lower()}_autorange")
-                rng_val = parse_range(rng_var.get(), phase)
+    def _sequence_settings(self):
+        """
+        Snapshot of the sequence widgets as a normalized settings dict, the
+        same shape a sequence file loads into (see sequence.py). Raises
+        ValueError for entries that do not parse.
+        """
+        def entry(name, default):
+            return getattr(self, f"{name}_entry").get().strip() or default
+
+        phases = {}
+        for phase in PHASES:
+            pre = PHASE_PREFIX[phase]
+            rng = getattr(self, f"{pre}_range_var").get()
+            if getattr(self, f"{pre}_autorange").get():
+                rng = "Auto"
+            phases[phase] = {"duration": entry(f"{pre}_dur", "5"),
+                             "interval": entry(f"{pre}_int", "0.5"),
+                             "range": rng,
+                             "limits": self._phase_limits(pre)}
+            phases[phase].update(self._phase_profile(pre))
 
-                # configure instrument via instrument manager or direct dmm
-                try:
-                    dmm = getattr(self.app, "dmm", None)
-                    if autorange.get() or rng_val == "Auto":
-                        # autorange on
-                        if dmm:
-                            dmm.write(LUA_AUTORANGE_ON)
-                    else:
-                        if dmm:
-                            dmm.write(LUA_AUTORANGE_OFF)
-                            dmm.write(LUA_SET_FUNC.format(func=phase.lower()))
-                            dmm.write(LUA_SET_RANGE.format(rng=rng_val))
-                except Exception as e:
-                    # log but continue; reading may still be possible
-                    self._log(f"Range/config write error: {e}", "warn")
-
-                # measurement loop for this phase
-                t0 = time.time()
-                while time.time() - t0 < duration:
-                    if self.app.stop_event.is_set():
-                        return
-                    while self.app.pause_event.is_set():
-                        time.sleep(0.1)
-                    try:
-                        dmm = getattr(self.app, "dmm", None)
-                        if dmm:
-                            val = float(dmm.query("print(dmm.measure.read())"))
-                        else:
-                            # no instrument: produce NaN
-                            val = float("nan")
-                    except Exception:
-                        val = float("nan")
-
-                    val_txt = format_reading(val, phase)
-                    # update center panel live labels if exists
-                    try:
-                        self.app.center.live_val_lbl.configure(text=val_txt)
-                        self.app.center.live_phase_lbl.configure(text=phase)
-                    except Exception:
-                        pass
-
-                    ts = datetime.now().strftime("%H:%M:%S")
-                    self.app.records.append([ts, phase, val_txt])
-                    # raw text if center has data_text
-                    try:
-                        self.app.center.data_text.insert("end", f"{ts}\t{phase}\t{val_txt}\n")
-                        self.app.center.data_text.see("end")
-                    except Exception:
-                        pass
-
-                    self.app.plot_data_x.append(len(self.app.plot_data_x))
-                    self.app.plot_data_y.append(val)
-                    # update cards
-                    try:
-                        self.app.center.update_cards(phase)
-                    except Exception:
-                        pass
-
-                    time.sleep(interval)
-
-        # finished cycles
-        self._stop_sequence()
+        order = self.order_var.get()
+        digitize = {"rate": entry("dig_rate", "1e6"), "count": entry("dig_count", "100000")}
+        if order.startswith("Digitize"):
+            # digitize has no autorange; use the range menu even with autorange ticked
+            phase = "VOLTAGE" if order == "Digitize V" else "CURRENT"
+            digitize["range"] = parse_range(getattr(self, f"{PHASE_PREFIX[phase]}_range_var").get(), phase)
+        raw = {
+            "order": order,
+            "cycles": entry("cycles", "1"),
+            "buffered": self.buffered_var.get(),
+            "burst": entry("burst", "100"),
+            "buffer": entry("buffer", "defbuffer1"),
+            "transfer": self.transfer_var.get(),
+            "on_instrument": self.on_instrument_var.get(),
+            "timestamps": self.timestamps_var.get(),
+            "policy": self.policy_var.get(),
+            "stop_on_fail": self.stop_on_fail_var.get(),
+            "digitize": digitize,
+            "phases": phases,
+        }
+        return normalize_sequence(raw)
+
+    def _show_waveform(self, phase, vals, rate):
+        # called on the worker thread; the plot is updated from the Tk loop
+        try:
+            self.app.after(0, lambda: self.app.center.show_waveform(phase, vals, rate))
+        except Exception:
+            pass
 
     # -------------------------
     # Card update helper exposed for other modules
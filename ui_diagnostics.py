@@ -0,0 +1,119 @@
+# ui_diagnostics.py
+import customtkinter as ctk
+from tkinter import filedialog
+
+from diagnostics import DiagnosticsServer, METRICS_PORT
+
+# refresh period of the diagnostics view (ms)
+REFRESH_MS = 1000
+
+# histogram rows: (metric, label) title
+_TITLES = {"visa_seconds": "VISA", "stage_seconds": "Stage"}
+
+
+class DiagnosticsPanel:
+    """
+    Diagnostics tab: live table of the app's metrics registry (VISA call
+    latency per operation, host-side stage timing, bytes moved, pipeline
+    gauges), JSON export and the local metrics endpoint
+    (Prometheus text at /metrics, JSON at /metrics.json).
+    """
+
+    def __init__(self, app, parent, visible=None):
+        self.app = app
+        self.server = None
+        # only render while the tab is shown
+        self._visible = visible or (lambda: True)
+        self._build(parent)
+        try:
+            self.app.after(REFRESH_MS, self._refresh_loop)
+        except Exception:
+            pass
+
+    @property
+    def diag(self):
+        return self.app.diagnostics
+
+    def _build(self, parent):
+        bar = ctk.CTkFrame(parent, fg_color="transparent")
+        bar.pack(fill="x", padx=5, pady=(5, 0))
+        ctk.CTkLabel(bar, text="Port:").pack(side="left", padx=(5, 0))
+        self.port_entry = ctk.CTkEntry(bar, width=60)
+        self.port_entry.insert(0, str(METRICS_PORT))
+        self.port_entry.pack(side="left", padx=5)
+        self.serve_btn = ctk.CTkButton(bar, text="Start endpoint", width=110, command=self._toggle_server)
+        self.serve_btn.pack(side="left", padx=5)
+        self.url_lbl = ctk.CTkLabel(bar, text="", font=("Consolas", 11))
+        self.url_lbl.pack(side="left", padx=5)
+        ctk.CTkButton(bar, text="Reset", width=60, fg_color="gray",
+                      command=self.diag.reset).pack(side="right", padx=5)
+        ctk.CTkButton(bar, text="Export JSON", width=100, command=self._export_json).pack(side="right", padx=5)
+
+        self.text = ctk.CTkTextbox(parent, font=("Consolas", 11), wrap="none")
+        self.text.pack(fill="both", expand=True, padx=5, pady=5)
+
+    def _toggle_server(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+            self.serve_btn.configure(text="Start endpoint")
+            self.url_lbl.configure(text="")
+            self.app._log("Metrics endpoint stopped")
+            return
+        try:
+            port = int(self.port_entry.get())
+            self.server = DiagnosticsServer(self.diag, port)
+        except (ValueError, OSError) as e:
+            self.app._log(f"Metrics endpoint error: {e}", "err")
+            return
+        self.serve_btn.configure(text="Stop endpoint")
+        self.url_lbl.configure(text=self.server.url)
+        self.app._log(f"Metrics endpoint at {self.server.url}")
+
+    def _export_json(self):
+        file = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON Files", "*.json")])
+        if not file:
+            return
+        try:
+            with open(file, "w") as f:
+                f.write(self.diag.to_json())
+            self.app._log(f"Diagnostics exported: {file}")
+        except Exception as e:
+            self.app._log(f"Diagnostics export error: {e}", "err")
+
+    def _render(self):
+        snap = self.diag.snapshot()
+        lines = [f"{'':<7}{'':<13}{'count':>9}{'mean ms':>10}{'p50 ms':>10}"
+                 f"{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'total s':>10}"]
+
+        def ms(v):
+            return f"{v:>10.3f}" if v is not None else f"{'-':>10}"
+        for name, title in _TITLES.items():
+            for label, h in snap["histograms"].get(name, {}).items():
+                lines.append(f"{title:<7}{label:<13}{h['count']:>9}{ms(h['mean_ms'])}{ms(h['p50_ms'])}"
+                             f"{ms(h['p90_ms'])}{ms(h['p99_ms'])}{ms(h['max_ms'])}{h['total_s']:>10.2f}")
+        lines.append("")
+        up = max(snap["uptime_s"], 1e-9)
+        io = snap["counters"].get("visa_bytes_total", {})
+        errors = snap["counters"].get("visa_errors_total", {})
+        lines.append(f"Bytes in  {io.get('in', 0):>14,}  ({io.get('in', 0) / up / 1e3:,.1f} kB/s)")
+        lines.append(f"Bytes out {io.get('out', 0):>14,}  ({io.get('out', 0) / up / 1e3:,.1f} kB/s)")
+        if errors:
+            lines.append("VISA errors " + ", ".join(f"{op} {n}" for op, n in errors.items()))
+        lines.append("")
+        for key, val in snap["gauges"].items():
+            lines.append(f"{key:<22}{val:>14.6g}" if isinstance(val, float) else f"{key:<22}{val:>14}")
+        lines.append(f"\nsince reset {snap['uptime_s']:.0f} s")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", "\n".join(lines))
+
+    def _refresh_loop(self):
+        try:
+            if self._visible():
+                self._render()
+        except Exception:
+            pass
+        try:
+            self.app.after(REFRESH_MS, self._refresh_loop)
+        except Exception:
+            pass
@@ -0,0 +1,184 @@
+# ui_fleet.py
+import time
+import threading
+import customtkinter as ctk
+from tkinter import messagebox
+
+from helpers import format_reading
+from store import PHASES
+
+# refresh period of the per-instrument rows (ms)
+REFRESH_MS = 1000
+
+
+class FleetPanel:
+    """
+    Fleet tab: connects further instruments next to the main one and runs
+    the current sequence settings on them concurrently (one worker thread
+    per instrument, see fleet.py). Each row shows the instrument's state,
+    limit verdict, reading count, rate and latest means, with its own
+    Start/Stop.
+    """
+
+    def __init__(self, app, parent):
+        self.app = app
+        self.rows = {}
+        self._counts = {}
+        self._count_t = time.monotonic()
+        self._was_running = False
+        self._build(parent)
+        try:
+            self.app.after(REFRESH_MS, self._refresh_loop)
+        except Exception:
+            pass
+
+    @property
+    def fleet(self):
+        return self.app.fleet
+
+    def _build(self, parent):
+        bar = ctk.CTkFrame(parent, fg_color="transparent")
+        bar.pack(fill="x", padx=5, pady=(5, 0))
+        self.resource_combo = ctk.CTkComboBox(bar, values=[], width=240)
+        self.resource_combo.set("")
+        self.resource_combo.pack(side="left", padx=5)
+        ctk.CTkLabel(bar, text="Name:").pack(side="left")
+        self.name_entry = ctk.CTkEntry(bar, width=80, placeholder_text="auto")
+        self.name_entry.pack(side="left", padx=5)
+        self.add_btn = ctk.CTkButton(bar, text="Add", width=60, command=self._add)
+        self.add_btn.pack(side="left", padx=5)
+        ctk.CTkButton(bar, text="Stop all", width=80, fg_color="red",
+                      command=self.fleet.stop).pack(side="right", padx=5)
+        ctk.CTkButton(bar, text="Start all", width=80, fg_color="green",
+                      command=lambda: self._start(None)).pack(side="right", padx=5)
+
+        self.total_lbl = ctk.CTkLabel(parent, text="No instruments", font=("Consolas", 11))
+        self.total_lbl.pack(fill="x", padx=10, pady=(5, 0))
+        self.list_fr = ctk.CTkScrollableFrame(parent)
+        self.list_fr.pack(fill="both", expand=True, padx=5, pady=5)
+
+    def set_resources(self, resources):
+        # called with each discovery result from the control panel
+        self.resource_combo.configure(values=list(resources))
+
+    def _add(self):
+        resource = self.resource_combo.get().strip()
+        if not resource:
+            messagebox.showwarning("Warning", "No device selected.")
+            return
+        name = self.name_entry.get().strip() or None
+        # opening the resource and *IDN? can take seconds: off the Tk thread
+        self.add_btn.configure(state="disabled", text="Adding")
+        threading.Thread(target=self._add_worker, args=(resource, name), daemon=True).start()
+
+    def _add_worker(self, resource, name):
+        try:
+            member, error = self.fleet.add(resource, name), None
+        except ValueError as e:
+            member, error = None, e
+        self.app.after(0, lambda: self._add_done(resource, member, error))
+
+    def _add_done(self, resource, member, error):
+        self.add_btn.configure(state="normal", text="Add")
+        if error is not None:
+            messagebox.showwarning("Warning", str(error))
+            return
+        if member is None:
+            messagebox.showerror("Connection Error", f"Could not open {resource}")
+            return
+        self.name_entry.delete(0, "end")
+        self._add_row(member)
+
+    def _add_row(self, member):
+        name = member.name
+        fr = ctk.CTkFrame(self.list_fr)
+        fr.pack(fill="x", padx=5, pady=2)
+        ctk.CTkLabel(fr, text=name, width=60, font=("Arial", 12, "bold")).pack(side="left", padx=5)
+        info = ctk.CTkLabel(fr, text="", font=("Consolas", 11), anchor="w")
+        info.pack(side="left", fill="x", expand=True, padx=5)
+        ctk.CTkButton(fr, text="Remove", width=60, fg_color="gray",
+                      command=lambda: self._remove(name)).pack(side="right", padx=2)
+        ctk.CTkButton(fr, text="Stop", width=50, fg_color="red",
+                      command=lambda: self.fleet.stop([name])).pack(side="right", padx=2)
+        ctk.CTkButton(fr, text="Start", width=50, fg_color="green",
+                      command=lambda: self._start([name])).pack(side="right", padx=2)
+        self.rows[name] = {"frame": fr, "info": info}
+        self._render_row(member, 0.0)
+
+    def _remove(self, name):
+        row = self.rows.pop(name, None)
+        if row is not None:
+            row["frame"].destroy()
+        # stopping the member's worker (join) and disconnecting: off the Tk thread
+        threading.Thread(target=self.fleet.remove, args=(name,), daemon=True).start()
+
+    def _start(self, names):
+        try:
+            settings = self.app.controls._sequence_settings()
+        except ValueError as e:
+            messagebox.showwarning("Warning", f"Invalid sequence settings: {e}")
+            return
+        if self.app.controls._worker_alive() and not getattr(self.app, "running", False):
+            self.app.controls._log("Previous sequence is still stopping", "warn")
+            return
+        if not self.fleet.running and not getattr(self.app, "running", False):
+            self.app.center.close_replay()
+            # a fresh fleet run records like a main run does
+            if self.app.controls.record_var.get() and self.app.recorder is None:
+                if not self.app.controls._open_recorder():
+                    return
+            if self.app.controls.journal_var.get() and self.app.journal is None:
+                self.app.controls._open_journal(settings)
+            self.app.controls._open_limits(settings)
+        started = self.fleet.start(settings, names)
+        if started:
+            self.app.controls._log(f"Fleet sequence started on {', '.join(started)}")
+
+    def _render_row(self, member, rate):
+        stats = self.app.source_stats.get(member.source, {})
+        means = []
+        for phase in PHASES:
+            st = stats.get(phase)
+            if st is not None and st.count:
+                means.append(f"{phase[0]} {format_reading(st.mean, phase)}")
+        count = self.app.pipeline.source_readings.get(member.source, 0)
+        limits = getattr(self.app, "limits", None)
+        # only instruments that took part in the run
+        verdict = limits.verdict(member.source, final=not member.running) if limits is not None and count else ""
+        self.rows[member.name]["info"].configure(
+            text=f"{member.status:<9} {verdict:<7} {count:>9} rdg  {rate:>8.1f}/s  "
+                 f"{'  '.join(means)}  {member.resource}")
+
+    def _refresh_loop(self):
+        try:
+            now = time.monotonic()
+            dt = max(now - self._count_t, 1e-6)
+            counts = self.app.pipeline.source_readings
+            total = 0.0
+            for name, member in list(self.fleet.members.items()):
+                if name not in self.rows:
+                    continue
+                n = counts.get(member.source, 0)
+                rate = max(n - self._counts.get(name, n), 0) / dt
+                self._counts[name] = n
+                total += rate
+                self._render_row(member, rate)
+            self._count_t = now
+            members = len(self.fleet.members)
+            self.total_lbl.configure(
+                text=f"{members} instrument(s), {sum(m.running for m in self.fleet.members.values())} running, "
+                     f"{total:.1f} rdg/s total" if members else "No instruments")
+            running = self.fleet.running
+            if self._was_running and not running and not getattr(self.app, "running", False):
+                # fleet run over: flush what is queued and close its recording and journal
+                self.app.pipeline.drain()
+                self.app.controls._log_verdict()
+                self.app.controls._close_recorder()
+                self.app.controls._close_journal()
+            self._was_running = running
+        except Exception:
+            pass
+        try:
+            self.app.after(REFRESH_MS, self._refresh_loop)
+        except Exception:
+            pass
@@ -1,4 +1,5 @@
 import customtkinter as ctk
+from tkinter import filedialog
 from datetime import datetime
 
 class LogPanel:
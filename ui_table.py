@@ -0,0 +1,190 @@
+# ui_table.py
+import tkinter as tk
+from datetime import datetime
+import numpy as np
+import customtkinter as ctk
+
+from helpers import format_reading
+from store import PHASES, PHASE_CODES
+
+
+class VirtualTable:
+    """
+    Raw Data view that only renders the rows currently on screen.
+    Rows come straight from `app.store`; values are formatted lazily with
+    format_reading, so the cost of a refresh depends on the window height,
+    not on the number of readings.
+    """
+
+    ROW_H = 18
+
+    def __init__(self, app, parent):
+        self.app = app
+        self.top = 0            # first visible row (in filtered row space)
+        self.follow = True      # stick to the newest reading
+        self._filt_idx = np.empty(0, dtype=np.int64)
+        self._filt_done = 0
+        self._filt_base = 0
+        self._items = []
+        self._build(parent)
+        try:
+            self.app.after(250, self._refresh_loop)
+        except Exception:
+            pass
+
+    def _build(self, parent):
+        bar = ctk.CTkFrame(parent, fg_color="transparent")
+        bar.pack(fill="x", padx=5, pady=(5, 0))
+        ctk.CTkLabel(bar, text="Phase:").pack(side="left")
+        self.filter_var = ctk.StringVar(value="All")
+        ctk.CTkOptionMenu(bar, values=["All"] + list(PHASES), variable=self.filter_var, width=110,
+                          command=lambda _: self.reset()).pack(side="left", padx=5)
+        ctk.CTkLabel(bar, text="Jump to (HH:MM:SS):").pack(side="left", padx=(15, 0))
+        self.jump_entry = ctk.CTkEntry(bar, width=90)
+        self.jump_entry.pack(side="left", padx=5)
+        self.jump_entry.bind("<Return>", lambda _: self.jump_to_time(self.jump_entry.get()))
+        ctk.CTkButton(bar, text="Go", width=40,
+                      command=lambda: self.jump_to_time(self.jump_entry.get())).pack(side="left")
+        ctk.CTkButton(bar, text="Tail", width=50, command=self._follow_tail).pack(side="right")
+        self.count_lbl = ctk.CTkLabel(bar, text="0 rows")
+        self.count_lbl.pack(side="right", padx=10)
+
+        body = ctk.CTkFrame(parent)
+        body.pack(fill="both", expand=True, padx=5, pady=5)
+        self.canvas = tk.Canvas(body, highlightthickness=0, bg="white")
+        self.scroll = ctk.CTkScrollbar(body, command=self._on_scroll)
+        self.scroll.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.bind("<Configure>", lambda _: self.render())
+        self.canvas.bind("<MouseWheel>", lambda e: self._scroll_by(-1 if e.delta > 0 else 1, 3))
+        self.canvas.bind("<Button-4>", lambda _: self._scroll_by(-1, 3))
+        self.canvas.bind("<Button-5>", lambda _: self._scroll_by(1, 3))
+
+    # -------------------------
+    # Row model
+    # -------------------------
+    def _rows(self):
+        """
+        Store row indices for the current filter; None means all rows.
+        The filtered index is extended incrementally as data arrives.
+        """
+        phase = self.filter_var.get()
+        if phase == "All":
+            return None
+        store = self.app.store
+        _, p, _ = store.columns()
+        if store.offset != self._filt_base or p.size < self._filt_done:
+            self._filt_idx = np.empty(0, dtype=np.int64)
+            self._filt_done = 0
+            self._filt_base = store.offset
+        new = np.flatnonzero(p[self._filt_done:] == PHASE_CODES[phase]) + self._filt_done
+        if new.size:
+            self._filt_idx = np.concatenate((self._filt_idx, new))
+        self._filt_done = p.size
+        return self._filt_idx
+
+    def _row_count(self, rows):
+        return len(self.app.store) if rows is None else rows.size
+
+    def _visible(self):
+        return max(self.canvas.winfo_height() // self.ROW_H, 1)
+
+    # -------------------------
+    # Rendering
+    # -------------------------
+    def render(self):
+        rows = self._rows()
+        total = self._row_count(rows)
+        vis = self._visible()
+        if self.follow:
+            self.top = max(total - vis, 0)
+        self.top = min(max(self.top, 0), max(total - vis, 0))
+
+        while len(self._items) < vis:
+            y = len(self._items) * self.ROW_H + 2
+            self._items.append(self.canvas.create_text(
+                6, y, anchor="nw", font=("Consolas", 11), text=""))
+
+        store = self.app.store
+        t, p, v = store.columns()
+        # instrument names only once a fleet member has registered
+        src = store.source_codes() if store.multi_source else None
+        for k, item in enumerate(self._items):
+            r = self.top + k
+            if k >= vis or r >= total:
+                self.canvas.itemconfigure(item, text="")
+                continue
+            i = r if rows is None else rows[r]
+            phase = PHASES[p[i]]
+            ts = datetime.fromtimestamp(t[i]).strftime("%H:%M:%S.%f")[:-3]
+            name = "" if src is None else f"{store.source_names[src[i]]:<8} "
+            self.canvas.itemconfigure(
+                item, text=f"{store.offset + i:>10}  {ts}  {name}{phase:<8} {format_reading(v[i], phase)}")
+
+        self.count_lbl.configure(text=f"{total} rows")
+        if total:
+            self.scroll.set(self.top / total, min((self.top + vis) / total, 1.0))
+        else:
+            self.scroll.set(0, 1)
+
+    def _refresh_loop(self):
+        try:
+            self.render()
+        except Exception:
+            pass
+        try:
+            self.app.after(250, self._refresh_loop)
+        except Exception:
+            pass
+
+    # -------------------------
+    # Navigation
+    # -------------------------
+    def _scroll_by(self, direction, step):
+        self.top += direction * step
+        total = self._row_count(self._rows())
+        self.follow = self.top + self._visible() >= total
+        self.render()
+
+    def _on_scroll(self, *args):
+        total = self._row_count(self._rows())
+        vis = self._visible()
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = vis if args[2] == "pages" else 1
+            self.top += int(args[1]) * step
+        self.follow = self.top + vis >= total
+        self.render()
+
+    def _follow_tail(self):
+        self.follow = True
+        self.render()
+
+    def jump_to_time(self, text):
+        """
+        Scrolls to the first reading at or after HH:MM:SS on the day of the
+        first reading in memory.
+        """
+        t, _, _ = self.app.store.columns()
+        if t.size == 0:
+            return
+        try:
+            hms = datetime.strptime(text.strip(), "%H:%M:%S").time()
+        except ValueError:
+            self.app._log(f"Invalid time: {text}", "warn")
+            return
+        day = datetime.fromtimestamp(t[0]).date()
+        target = datetime.combine(day, hms).timestamp()
+        i = int(np.searchsorted(t, target))
+        rows = self._rows()
+        self.top = i if rows is None else int(np.searchsorted(rows, i))
+        self.follow = False
+        self.render()
+
+    def reset(self):
+        self._filt_idx = np.empty(0, dtype=np.int64)
+        self._filt_done = 0
+        self.top = 0
+        self.follow = True
+        self.render()